@@ -1,10 +1,21 @@
 # backend/app.py
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, request, stream_with_context
 from flask_cors import CORS
 from services.cloud_factory import CloudProviderFactory
 from services.auth_manager import AuthManager
+from services.concurrency import fan_out
+from services.metrics_collector import MetricsCollector, TIMESERIES_FIELDS
+from services.cost_cube import CostCube, CubeLoading, parse_filters
+from services.forecasting import CostForecaster
+from services.export import EXPORT_FORMATS, EXPORT_PAGE_SIZE, export_period, prime, stream_export
+from services.streaming import Broadcaster
+from services.aggregation import downsample_timeseries
+from services.responses import json_response
+from services import instrumentation
 from dotenv import load_dotenv
+from functools import partial
 import os
+import time
 
 # Load environment variables
 load_dotenv()
@@ -14,20 +25,140 @@ CORS(app)  # Enable CORS for React frontend
 
 auth_manager = AuthManager()
 
+# Provider SDKs are imported only for configured providers; by default up front,
+# so the first request does not pay for the import
+PRELOAD_PROVIDERS = os.getenv("PRELOAD_PROVIDERS", "true").lower() == "true"
+
+# Per-provider deadline for the unified summary; slower providers are reported as timeouts
+SUMMARY_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_TIMEOUT_SECONDS", "10"))
+
+# Limits for /api/batch
+BATCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_TIMEOUT_SECONDS", "15"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
+
+# Background poller feeding live metrics and timeseries from memory
+metrics_collector = MetricsCollector(auth_manager)
+
+# Shared producers for the server-push stream
+broadcaster = Broadcaster(auth_manager, metrics_collector)
+
+# Normalized cost records of all providers, queried locally by /api/costs/query
+cost_cube = CostCube(auth_manager)
+
+# Month-end forecasts and cost anomalies, precomputed in the background
+forecaster = CostForecaster(auth_manager)
+
+@app.before_request
+def start_background_workers():
+    # Started on first request rather than at import so the debug reloader's
+    # parent process does not poll the clouds too
+    metrics_collector.ensure_started()
+    cost_cube.ensure_started()
+    forecaster.ensure_started()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    instrumentation.start_request_timing()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = request.endpoint or 'unmatched'
+        instrumentation.http_request_seconds.observe(elapsed, route, request.method, str(response.status_code))
+        if instrumentation.SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = instrumentation.server_timing_header(elapsed)
+    return response
+
+def get_cloud(provider):
+    return CloudProviderFactory.get(provider, auth_manager.get_config(provider))
+
+def load_live_metrics(provider):
+    """Latest collector sample, or a direct provider call before the first one"""
+    data = metrics_collector.latest(provider)
+    if data is None:
+        data = get_cloud(provider).get_live_metrics()
+    return data
+
+def load_timeseries(provider, metric_type='cpu', minutes=30, points=None):
+    """Timeseries from the collector's ring buffers, falling back to the provider"""
+    data = metrics_collector.timeseries(provider, metric_type, minutes)
+    if data is None:
+        data = get_cloud(provider).get_timeseries(metric_type, minutes)
+    if points:
+        data = downsample_timeseries(data, points)
+    return data
+
+def int_param(params, name, default=None):
+    """Positive integer parameter (given as a number or a string), raising ValueError when invalid"""
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a positive integer")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive integer")
+    if number <= 0 or number != float(value):
+        raise ValueError(f"{name} must be a positive integer")
+    return number
+
+def timeseries_params(params):
+    metric_type = params.get('type', 'cpu')
+    if metric_type not in TIMESERIES_FIELDS:
+        raise ValueError(f"Unsupported metric type: {metric_type}")
+    return {
+        'metric_type': metric_type,
+        'minutes': int_param(params, 'minutes', 30),
+        'points': int_param(params, 'points'),
+    }
+
+# Resources available through /api/batch: name -> (params parser, loader(provider, parsed params)).
+# Parsers raise ValueError for invalid params, which fails only that item with a 400.
+BATCH_RESOURCES = {
+    'costs/mtd': (lambda params: {}, lambda provider, p: get_cloud(provider).get_mtd_costs()),
+    'costs/total': (lambda params: {}, lambda provider, p: get_cloud(provider).get_mtd_total()),
+    'costs/daily': (
+        lambda params: {'days': int_param(params, 'days', 30)},
+        lambda provider, p: get_cloud(provider).get_daily_costs(p['days'])
+    ),
+    'metrics/live': (lambda params: {}, lambda provider, p: load_live_metrics(provider)),
+    'metrics/timeseries': (timeseries_params, lambda provider, p: load_timeseries(provider, **p)),
+}
+
 print("\n" + "="*60)
 print("Starting Multi-Cloud Intelligence Dashboard Backend")
 print("="*60)
 
+if PRELOAD_PROVIDERS:
+    startup_started = time.perf_counter()
+    for entry in CloudProviderFactory.preload(p['name'] for p in auth_manager.get_active_providers()):
+        if entry.get('error'):
+            print(f"⚠ {entry['provider']}: failed to load after {entry['seconds']:.2f}s ({entry['error']})")
+        elif 'seconds' in entry:
+            print(f"✓ {entry['provider']}: loaded in {entry['seconds']:.2f}s")
+        elif not entry['loaded']:
+            print(f"  {entry['provider']}: not configured, SDK not loaded")
+    print(f"Provider startup: {time.perf_counter() - startup_started:.2f}s")
+
 # --- Health check ---
 @app.route("/api/health")
 def health():
-    return jsonify({"ok": True, "service": "multi-cloud-dashboard"})
+    return json_response({"ok": True, "service": "multi-cloud-dashboard"})
+
+# --- Prometheus metrics: upstream latency, call counts, cache hit rate, bytes scanned ---
+@app.route("/api/metrics")
+def prometheus_metrics():
+    return Response(instrumentation.render(), mimetype="text/plain; version=0.0.4")
 
 # --- Get connected providers ---
 @app.route("/api/providers")
 def get_providers():
     """Returns list of configured cloud providers"""
-    return jsonify(auth_manager.get_active_providers())
+    return json_response(auth_manager.get_active_providers())
 
 # --- Provider-specific month-to-date costs ---
 @app.route("/api/<provider>/costs/mtd")
@@ -35,28 +166,96 @@ def provider_mtd_costs(provider):
     """Get MTD costs by project/service for specific provider"""
     try:
         if not auth_manager.is_provider_configured(provider):
-            return jsonify({"error": f"{provider} not configured"}), 404
+            return json_response({"error": f"{provider} not configured"}, 404)
         
-        cloud = CloudProviderFactory.create(provider, auth_manager.get_config(provider))
+        cloud = CloudProviderFactory.get(provider, auth_manager.get_config(provider))
         data = cloud.get_mtd_costs()
-        return jsonify(data)
+        return json_response(data)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 # --- Provider-specific daily costs trend ---
 @app.route("/api/<provider>/costs/daily")
 def provider_daily_costs(provider):
     """Get daily cost trend for specific provider"""
     try:
-        days = int(request.args.get('days', 30))
+        try:
+            days = int_param(request.args, 'days', 30)
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
         if not auth_manager.is_provider_configured(provider):
-            return jsonify({"error": f"{provider} not configured"}), 404
+            return json_response({"error": f"{provider} not configured"}, 404)
         
-        cloud = CloudProviderFactory.create(provider, auth_manager.get_config(provider))
+        cloud = CloudProviderFactory.get(provider, auth_manager.get_config(provider))
         data = cloud.get_daily_costs(days)
-        return jsonify(data)
+        return json_response(data)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+# --- Provider-specific month-end forecast ---
+@app.route("/api/<provider>/costs/forecast")
+def provider_cost_forecast(provider):
+    """Projected month-end spend (total and per service) from the precomputed seasonal model"""
+    try:
+        if not auth_manager.is_provider_configured(provider):
+            return json_response({"error": f"{provider} not configured"}, 404)
+        
+        return json_response(forecaster.forecast(provider))
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+# --- Provider-specific cost anomalies ---
+@app.route("/api/<provider>/costs/anomalies")
+def provider_cost_anomalies(provider):
+    """Days whose cost deviates from the seasonal baseline (?days=30, ?service=<name> or * for the total)"""
+    try:
+        try:
+            days = int_param(request.args, 'days', 30)
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
+        
+        if not auth_manager.is_provider_configured(provider):
+            return json_response({"error": f"{provider} not configured"}, 404)
+        
+        return json_response(forecaster.anomalies(provider, days, request.args.get('service')))
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
+
+# --- Provider-specific line-item export (streamed NDJSON or CSV) ---
+@app.route("/api/<provider>/costs/export")
+def provider_cost_export(provider):
+    """
+    Stream billing line items for ?start=YYYY-MM-DD&end=YYYY-MM-DD (end exclusive,
+    default month to date) as ?format=ndjson|csv, one upstream page at a time
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return json_response({"error": f"Unsupported format: {fmt}"}, 400)
+        start, end = export_period(request.args.get('start'), request.args.get('end'))
+        
+        if not auth_manager.is_provider_configured(provider):
+            return json_response({"error": f"{provider} not configured"}, 404)
+        
+        # The first page is fetched before the 200 goes out; later failures end the body with an error record
+        rows = prime(get_cloud(provider).export_line_items(start, end, EXPORT_PAGE_SIZE))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except NotImplementedError as e:
+        return json_response({"error": str(e)}, 501)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+    
+    filename = f"{provider}-costs-{start.isoformat()}-{end.isoformat()}.{fmt}"
+    return Response(
+        stream_with_context(stream_export(rows, provider, fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        }
+    )
 
 # --- Provider-specific live metrics ---
 @app.route("/api/<provider>/metrics/live")
@@ -64,59 +263,157 @@ def provider_live_metrics(provider):
     """Get live metrics (CPU, traffic, disk) for specific provider"""
     try:
         if not auth_manager.is_provider_configured(provider):
-            return jsonify({"error": f"{provider} not configured"}), 404
+            return json_response({"error": f"{provider} not configured"}, 404)
         
-        cloud = CloudProviderFactory.create(provider, auth_manager.get_config(provider))
-        data = cloud.get_live_metrics()
-        return jsonify(data)
+        return json_response(load_live_metrics(provider))
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
+
+# --- Provider-specific live metrics stream (Server-Sent Events) ---
+@app.route("/api/<provider>/metrics/stream")
+def provider_metrics_stream(provider):
+    """Push live metric and MTD cost changes to the client as they happen"""
+    if not auth_manager.is_provider_configured(provider):
+        return json_response({"error": f"{provider} not configured"}, 404)
+    
+    return Response(
+        stream_with_context(broadcaster.stream(provider)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # --- Provider-specific time series ---
 @app.route("/api/<provider>/metrics/timeseries")
 def provider_timeseries(provider):
     """Get time series data for charts"""
     try:
-        metric_type = request.args.get('type', 'cpu')
-        minutes = int(request.args.get('minutes', 30))
+        try:
+            params = timeseries_params(request.args)
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
         
         if not auth_manager.is_provider_configured(provider):
-            return jsonify({"error": f"{provider} not configured"}), 404
+            return json_response({"error": f"{provider} not configured"}, 404)
         
-        cloud = CloudProviderFactory.create(provider, auth_manager.get_config(provider))
-        data = cloud.get_timeseries(metric_type, minutes)
-        return jsonify(data)
+        return json_response(load_timeseries(provider, **params))
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 # --- Unified view across all providers ---
 @app.route("/api/costs/summary")
 def unified_costs_summary():
-    """Get cost summary across all configured providers"""
+    """Get cost summary across all configured providers (queried in parallel)"""
     try:
-        providers = auth_manager.get_active_providers()
-        summary = []
+        try:
+            timeout = float(request.args.get('timeout', SUMMARY_TIMEOUT_SECONDS))
+        except ValueError:
+            return json_response({"error": "timeout must be a number of seconds"}, 400)
+        providers = [p['name'] for p in auth_manager.get_active_providers()]
         
-        for provider_info in providers:
-            provider = provider_info['name']
-            try:
-                cloud = CloudProviderFactory.create(provider, auth_manager.get_config(provider))
-                mtd = cloud.get_mtd_total()
+        def mtd_total(provider):
+            return lambda: get_cloud(provider).get_mtd_total()
+        
+        results = fan_out({provider: mtd_total(provider) for provider in providers}, timeout=timeout)
+        
+        summary = []
+        for provider in providers:
+            result = results[provider]
+            if result['status'] == 'ok':
                 summary.append({
                     "provider": provider,
-                    "mtd_cost": mtd,
+                    "mtd_cost": result['value'],
                     "status": "active"
                 })
-            except Exception as e:
+            else:
                 summary.append({
                     "provider": provider,
-                    "error": str(e),
-                    "status": "error"
+                    "error": result['error'],
+                    "status": result['status']
                 })
         
-        return jsonify(summary)
+        return json_response(summary)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+# --- Cost cube: group-by/filter queries across providers, answered from memory ---
+@app.route("/api/costs/query")
+def query_costs():
+    """
+    Slice the cost cube without calling the clouds.
+    ?group_by=provider,service&filter=region:us-east1|eu-west1&filter=provider:gcp&start=2024-05-01&end=2024-06-01&limit=50
+    Dimensions: provider, account, service, region, tag, day. `end` is exclusive.
+    """
+    try:
+        group_by = [d.strip().lower() for d in request.args.get('group_by', 'provider').split(',') if d.strip()]
+        filters = parse_filters(request.args.getlist('filter'))
+        limit = int_param(request.args, 'limit', 1000)
+        result = cost_cube.query(
+            group_by, filters,
+            request.args.get('start'), request.args.get('end'), limit
+        )
+        return json_response(result)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except CubeLoading as e:
+        return json_response({"error": str(e)}, 503)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+# --- Batch: fetch a whole dashboard in one request ---
+@app.route("/api/batch", methods=["POST"])
+def batch():
+    """
+    Run several provider queries concurrently and return them together.
+    Body: {"queries": [{"id": "gcp-mtd", "provider": "gcp", "resource": "costs/mtd", "params": {}}, ...]}
+    Each result carries its own HTTP-style status, so one failing item does not fail the batch.
+    """
+    try:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('queries'), list):
+            return json_response({"error": "Expected {\"queries\": [...]}"}, 400)
+        queries = body['queries']
+        if len(queries) > BATCH_MAX_QUERIES:
+            return json_response({"error": f"At most {BATCH_MAX_QUERIES} queries per batch"}, 400)
+        try:
+            timeout = float(body.get('timeout', BATCH_TIMEOUT_SECONDS))
+        except (TypeError, ValueError):
+            return json_response({"error": "timeout must be a number of seconds"}, 400)
+        
+        results = [None] * len(queries)
+        calls = {}
+        for i, query in enumerate(queries):
+            query = query if isinstance(query, dict) else {}
+            provider = str(query.get('provider', '')).lower()
+            resource = query.get('resource')
+            item = {"id": query.get('id', i), "provider": provider, "resource": resource}
+            if resource not in BATCH_RESOURCES:
+                results[i] = {**item, "status": 400, "error": f"Unsupported resource: {resource}"}
+            elif not auth_manager.is_provider_configured(provider):
+                results[i] = {**item, "status": 404, "error": f"{provider} not configured"}
+            else:
+                parse, load = BATCH_RESOURCES[resource]
+                params = query.get('params') or {}
+                try:
+                    if not isinstance(params, dict):
+                        raise ValueError("params must be an object")
+                    parsed = parse(params)
+                except ValueError as e:
+                    results[i] = {**item, "status": 400, "error": str(e)}
+                    continue
+                results[i] = item
+                calls[i] = partial(load, provider, parsed)
+        
+        # Identical queries share provider instances, cached results and in-flight loads
+        outcomes = fan_out(calls, timeout=timeout)
+        for i, outcome in outcomes.items():
+            if outcome['status'] == 'ok':
+                results[i].update(status=200, data=outcome['value'])
+            else:
+                results[i].update(status=504 if outcome['status'] == 'timeout' else 500, error=outcome['error'])
+        
+        return json_response({"results": results})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 if __name__ == "__main__":
     print("=" * 50)
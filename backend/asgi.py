@@ -0,0 +1,186 @@
+# backend/asgi.py
+# Async entry point: uvicorn asgi:app --port 5000
+#
+# Provider routes are served natively on the event loop through the async
+# provider contract, so one process can keep hundreds of cloud calls in flight.
+# Any other path is handed to the Flask app (requires asgiref).
+import asyncio
+import re
+import time
+from urllib.parse import parse_qs
+from app import (
+    app as flask_app, auth_manager, metrics_collector, cost_cube, forecaster,
+    int_param, timeseries_params, SUMMARY_TIMEOUT_SECONDS
+)
+from services.cloud_factory import CloudProviderFactory
+from services.aggregation import downsample_timeseries
+from services.responses import encode_json
+from services import instrumentation
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    wsgi_fallback = WsgiToAsgi(flask_app)
+except ImportError:
+    wsgi_fallback = None
+
+# Background services app.py starts on the first Flask request; started here at lifespan startup
+BACKGROUND_SERVICES = (metrics_collector, cost_cube, forecaster)
+
+async def send_json(send, data, status=200, scope=None, started=None):
+    request_headers = dict(scope.get('headers', [])) if scope else {}
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1')) if scope else {}
+    status, headers, body = encode_json(
+        data, status,
+        accept_encoding=request_headers.get(b'accept-encoding', b'').decode('latin-1'),
+        if_none_match=request_headers.get(b'if-none-match', b'').decode('latin-1'),
+        columnar=query.get('format', [''])[0] == 'columnar'
+    )
+    headers['Content-Length'] = str(len(body))
+    headers['Access-Control-Allow-Origin'] = '*'
+    if started is not None and instrumentation.SERVER_TIMING_ENABLED:
+        headers['Server-Timing'] = f"total;dur={(time.perf_counter() - started) * 1000:.1f}"
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+    # HEAD gets the GET headers (including Content-Length) without the body
+    head = scope is not None and scope.get('method') == 'HEAD'
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+    return status
+
+def get_cloud(provider):
+    return CloudProviderFactory.get_async(provider, auth_manager.get_config(provider))
+
+# --- Query parameter parsers (shared with app.py); ValueError answers 400 ---
+def no_params(args):
+    return {}
+
+def daily_params(args):
+    return {'days': int_param(args, 'days', 30)}
+
+def summary_params(args):
+    try:
+        return {'timeout': float(args.get('timeout', SUMMARY_TIMEOUT_SECONDS))}
+    except ValueError:
+        raise ValueError("timeout must be a number of seconds")
+
+# --- Route handlers (mirror app.py) ---
+async def health():
+    return {"ok": True, "service": "multi-cloud-dashboard"}
+
+async def get_providers():
+    return auth_manager.get_active_providers()
+
+async def provider_mtd_costs(provider):
+    return await get_cloud(provider).get_mtd_costs()
+
+async def provider_daily_costs(provider, days):
+    return await get_cloud(provider).get_daily_costs(days)
+
+async def provider_live_metrics(provider):
+    data = metrics_collector.latest(provider)
+    if data is None:
+        data = await get_cloud(provider).get_live_metrics()
+    return data
+
+async def provider_timeseries(provider, metric_type, minutes, points):
+    data = metrics_collector.timeseries(provider, metric_type, minutes)
+    if data is None:
+        data = await get_cloud(provider).get_timeseries(metric_type, minutes)
+    if points:
+        data = downsample_timeseries(data, points)
+    return data
+
+async def unified_costs_summary(timeout):
+    providers = [p['name'] for p in auth_manager.get_active_providers()]
+
+    async def mtd_total(provider):
+        try:
+            mtd = await asyncio.wait_for(get_cloud(provider).get_mtd_total(), timeout)
+            return {"provider": provider, "mtd_cost": mtd, "status": "active"}
+        except asyncio.TimeoutError:
+            return {"provider": provider, "error": f"timed out after {timeout}s", "status": "timeout"}
+        except Exception as e:
+            return {"provider": provider, "error": str(e), "status": "error"}
+
+    return list(await asyncio.gather(*(mtd_total(p) for p in providers)))
+
+# (path pattern, handler, query parser, needs a configured provider)
+ROUTES = [
+    (re.compile(r'^/api/health$'), health, no_params, False),
+    (re.compile(r'^/api/providers$'), get_providers, no_params, False),
+    (re.compile(r'^/api/costs/summary$'), unified_costs_summary, summary_params, False),
+    (re.compile(r'^/api/(?P<provider>[^/]+)/costs/mtd$'), provider_mtd_costs, no_params, True),
+    (re.compile(r'^/api/(?P<provider>[^/]+)/costs/daily$'), provider_daily_costs, daily_params, True),
+    (re.compile(r'^/api/(?P<provider>[^/]+)/metrics/live$'), provider_live_metrics, no_params, True),
+    (re.compile(r'^/api/(?P<provider>[^/]+)/metrics/timeseries$'), provider_timeseries, timeseries_params, True),
+]
+
+def match_route(path):
+    for pattern, handler, parse, needs_provider in ROUTES:
+        match = pattern.match(path)
+        if match:
+            return handler, parse, needs_provider, match.groupdict()
+    return None, None, False, {}
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if wsgi_fallback is None:
+                    # Every route without a native handler would answer 404
+                    await send({
+                        'type': 'lifespan.startup.failed',
+                        'message': "asgiref not installed. Run: pip install asgiref",
+                    })
+                    return
+                for service in BACKGROUND_SERVICES:
+                    service.ensure_started()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for service in BACKGROUND_SERVICES:
+                    service.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler, parse, needs_provider, params = (None, None, False, {})
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        handler, parse, needs_provider, params = match_route(scope['path'])
+
+    if handler is None:
+        if wsgi_fallback is None:
+            return await send_json(send, {"error": "asgiref not installed"}, 500)
+        return await wsgi_fallback(scope, receive, send)
+
+    started = time.perf_counter()
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    args = {key: values[0] for key, values in query.items()}
+    response = {'status': None}
+
+    async def tracked_send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        await send(message)
+
+    try:
+        try:
+            kwargs = parse(args)
+        except ValueError as e:
+            await send_json(tracked_send, {"error": str(e)}, 400, scope, started)
+        else:
+            if needs_provider and not auth_manager.is_provider_configured(params['provider']):
+                await send_json(tracked_send, {"error": f"{params['provider']} not configured"}, 404, scope, started)
+            else:
+                data = await handler(**params, **kwargs)
+                await send_json(tracked_send, data, 200, scope, started)
+    except Exception as e:
+        if response['status'] is None:
+            await send_json(tracked_send, {"error": str(e)}, 500, scope, started)
+        else:
+            # Headers already went out (e.g. the client went away mid-body); a second start is invalid
+            print(f"⚠ {scope['path']}: failed after the response started: {e}")
+    status = response['status'] or 500
+    # Handlers share their Flask view names, so both servers report the same route labels
+    instrumentation.http_request_seconds.observe(time.perf_counter() - started, handler.__name__, scope['method'], str(status))
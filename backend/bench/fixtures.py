@@ -0,0 +1,128 @@
+import json
+import random
+import sys
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any
+
+# Timeseries captured by `record` and replayed by bench.replay_provider
+TIMESERIES_TYPES = ('cpu', 'traffic', 'disk')
+REGIONS = ('us-east1', 'us-west2', 'europe-west1', 'asia-east1')
+
+def generate(provider: str, services: int = 10, instances: int = 50, days: int = 90,
+             minutes: int = 360, seed: int = 0) -> Dict[str, Any]:
+    """
+    Synthetic responses shaped like the real provider's output: `services`
+    MTD rows (GCP rows also carry a project), one cost record per MTD row
+    spread over the last 31 days, `days` of daily costs, live metrics over
+    `instances` instances and one-minute timeseries.
+    """
+    rng = random.Random(f"{provider}:{seed}")
+
+    mtd = []
+    for i in range(services):
+        row = {'service': f"{provider}-service-{i:06d}", 'cost': round(rng.lognormvariate(3, 2), 2)}
+        if provider == 'gcp':
+            row = {'project': f"project-{i % 20:02d}", **row}
+        mtd.append(row)
+    mtd.sort(key=lambda row: row['cost'], reverse=True)
+
+    today = date.today()
+    records = [
+        {
+            'date': (today - timedelta(days=rng.randrange(31))).isoformat(),
+            'account': row.get('project', f"{provider}-account-{i % 5}"),
+            'service': row['service'],
+            'region': rng.choice(REGIONS),
+            'tag': f"team=team-{i % 8}",
+            'cost': row['cost'],
+        }
+        for i, row in enumerate(mtd)
+    ]
+    daily = [
+        {'date': (today - timedelta(days=days - i)).isoformat(), 'cost': round(rng.uniform(50, 150), 2)}
+        for i in range(days)
+    ]
+
+    cpu = [rng.uniform(1, 95) for _ in range(instances)]
+    top = sorted(range(instances), key=lambda i: cpu[i], reverse=True)[:10]
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    live = {
+        'updated_at': now.isoformat(),
+        'cpu_percent': round(sum(cpu) / max(instances, 1), 1),
+        'cpu_p50': round(sorted(cpu)[instances // 2], 1) if instances else 0.0,
+        'cpu_p95': round(sorted(cpu)[int(instances * 0.95)], 1) if instances else 0.0,
+        'cpu_max': round(max(cpu), 1) if instances else 0.0,
+        'mbps_in': round(rng.uniform(10, 500), 3),
+        'mbps_out': round(rng.uniform(10, 500), 3),
+        'instances_monitored': instances,
+        'top_instances': [
+            {'instance': f"{provider}-vm-{i:05d}", 'mean': round(cpu[i], 2), 'max': round(min(cpu[i] * 1.2, 100), 2)}
+            for i in top
+        ],
+    }
+
+    ts = [(now - timedelta(minutes=minutes - i)).isoformat() for i in range(minutes)]
+    timeseries = {
+        'cpu': {
+            'ts': ts,
+            'cpu_percent': [round(rng.uniform(20, 60), 2) for _ in ts],
+            'cpu_p95': [round(rng.uniform(60, 95), 2) for _ in ts],
+        },
+        'traffic': {
+            'ts': ts,
+            'mbps_in': [round(rng.uniform(10, 500), 3) for _ in ts],
+            'mbps_out': [round(rng.uniform(10, 500), 3) for _ in ts],
+        },
+        'disk': {
+            'ts': ts,
+            'disk_read_mbps': [round(rng.uniform(1, 200), 3) for _ in ts],
+            'disk_write_mbps': [round(rng.uniform(1, 200), 3) for _ in ts],
+        },
+    }
+
+    return {
+        'mtd_costs': mtd,
+        'mtd_total': round(sum(row['cost'] for row in mtd), 2),
+        'cost_records': records,
+        'daily_costs': daily,
+        'live_metrics': live,
+        'timeseries': timeseries,
+    }
+
+def record(provider: str, days: int = 90, minutes: int = 360) -> Dict[str, Any]:
+    """Capture one response per method from a configured, live provider"""
+    from services.auth_manager import AuthManager
+    from services.cloud_factory import CloudProviderFactory
+
+    auth_manager = AuthManager()
+    if not auth_manager.is_provider_configured(provider):
+        raise ValueError(f"{provider} not configured")
+    cloud = CloudProviderFactory.create(provider, auth_manager.get_config(provider))
+    return {
+        'mtd_costs': cloud.get_mtd_costs(),
+        'mtd_total': cloud.get_mtd_total(),
+        'cost_records': cloud.get_cost_records(31),
+        'daily_costs': cloud.get_daily_costs(days),
+        'live_metrics': cloud.get_live_metrics(),
+        'timeseries': {t: cloud.get_timeseries(t, minutes) for t in TIMESERIES_TYPES},
+    }
+
+def load(path: str) -> Dict[str, Dict[str, Any]]:
+    """Recorded fixtures file: {provider: {method: response}}"""
+    with open(path) as f:
+        return json.load(f)
+
+def save(fixtures: Dict[str, Dict[str, Any]], path: str):
+    with open(path, 'w') as f:
+        json.dump(fixtures, f, default=str)
+
+if __name__ == "__main__":
+    # python -m bench.fixtures <output.json> gcp aws azure
+    if len(sys.argv) < 3:
+        print("Usage: python -m bench.fixtures <output.json> <provider> [<provider> ...]")
+        sys.exit(2)
+    from dotenv import load_dotenv
+    load_dotenv()
+    output, providers = sys.argv[1], sys.argv[2:]
+    save({p: record(p) for p in providers}, output)
+    print(f"Recorded {', '.join(providers)} to {output}")
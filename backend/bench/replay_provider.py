@@ -0,0 +1,65 @@
+import random
+import time
+from datetime import date
+from typing import List, Dict, Any, Iterator
+from services.base_provider import BaseCloudProvider
+from services.instrumentation import count_upstream
+
+def replay_provider(provider: str, fixtures: Dict[str, Any], latency_ms: float = 0.0, jitter_ms: float = 0.0):
+    """
+    BaseCloudProvider subclass that answers as `provider` from recorded
+    fixtures after a simulated upstream delay of latency_ms + U(0, jitter_ms).
+    Being a real subclass, it goes through the same caching and
+    instrumentation as the cloud providers.
+    """
+
+    class ReplayProvider(BaseCloudProvider):
+        name = provider
+
+        def _validate_config(self):
+            pass
+
+        def _upstream(self) -> None:
+            count_upstream(f"replay_{provider}")
+            delay = latency_ms + random.uniform(0, jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+
+        def get_mtd_costs(self) -> List[Dict[str, Any]]:
+            self._upstream()
+            return fixtures['mtd_costs']
+
+        def get_mtd_total(self) -> float:
+            self._upstream()
+            return fixtures['mtd_total']
+
+        def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
+            self._upstream()
+            return fixtures['daily_costs'][-days:]
+
+        def get_cost_records(self, days: int = 31) -> List[Dict[str, Any]]:
+            self._upstream()
+            return fixtures['cost_records']
+
+        def export_line_items(self, start: date, end: date, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+            lo, hi = start.isoformat(), end.isoformat()
+            records = fixtures['cost_records']
+            for offset in range(0, len(records), page_size):
+                self._upstream()
+                for row in records[offset:offset + page_size]:
+                    if lo <= row['date'] < hi:
+                        yield {**row, 'sku': row['service'], 'currency': 'USD'}
+
+        def get_live_metrics(self) -> Dict[str, Any]:
+            self._upstream()
+            return fixtures['live_metrics']
+
+        def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
+            self._upstream()
+            data = fixtures['timeseries'].get(metric_type)
+            if data is None:
+                return {"error": "Unsupported metric type"}
+            return {key: values[-minutes:] for key, values in data.items()}
+
+    ReplayProvider.__name__ = f"Replay{provider.capitalize()}Provider"
+    return ReplayProvider
@@ -0,0 +1,220 @@
+# Offline benchmark: python -m bench.run --services 100000 --instances 5000 --latency-ms 80
+#
+# Registers replay providers for gcp/aws/azure, drives every route of app.py
+# through Flask's test client under concurrent load and reports p50/p99
+# latency, throughput and memory per route. No cloud credentials are used.
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+PROVIDERS = ('gcp', 'aws', 'azure')
+
+# Env that marks each provider as configured for AuthManager
+PROVIDER_ENV = {
+    'gcp': ('GCP_PROJECT_ID', 'bench-project'),
+    'aws': ('AWS_ACCOUNT_ID', '000000000000'),
+    'azure': ('AZURE_SUBSCRIPTION_ID', 'bench-subscription'),
+}
+
+CACHED_METHODS = ('get_mtd_costs', 'get_daily_costs', 'get_mtd_total', 'get_cost_records')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the dashboard API")
+    parser.add_argument('--providers', default=','.join(PROVIDERS), help="Comma-separated providers to register")
+    parser.add_argument('--fixtures', help="Recorded fixtures (python -m bench.fixtures); generated when omitted")
+    parser.add_argument('--services', type=int, default=10, help="Services per provider in generated fixtures")
+    parser.add_argument('--instances', type=int, default=50, help="Instances per provider in generated fixtures")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Simulated upstream latency")
+    parser.add_argument('--jitter-ms', type=float, default=20.0, help="Uniform jitter added to the latency")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per route")
+    parser.add_argument('--routes', help="Only run routes whose name contains one of these (comma-separated)")
+    parser.add_argument('--cold', action='store_true', help="Disable the result cache so every request goes upstream")
+    parser.add_argument('--collector', action='store_true', help="Serve live metrics/timeseries from the background collector")
+    parser.add_argument('--trace-memory', action='store_true', help="Report Python heap peak per route (slower)")
+    parser.add_argument('--json', dest='json_path', help="Write results as JSON")
+    parser.add_argument('--baseline', help="Earlier --json output; exit 1 if any route's p99 regresses")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed p99 growth over the baseline (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+def configure_environment(args, providers: List[str]):
+    """Must run before `app` is imported: AuthManager and the cache read env at import"""
+    os.environ['CLOUD_CONFIG_PATH'] = os.devnull
+    for provider in PROVIDERS:
+        var, value = PROVIDER_ENV[provider]
+        if provider in providers:
+            os.environ[var] = value
+        else:
+            os.environ.pop(var, None)
+    os.environ['METRICS_COLLECTOR'] = 'true' if args.collector else 'false'
+    os.environ['STREAM_INTERVAL_SECONDS'] = '1'
+    if args.cold:
+        os.environ['CACHE_STALE_SECONDS'] = '0'
+        for method in CACHED_METHODS:
+            os.environ[f"CACHE_TTL_{method.upper()}"] = '0'
+
+def register_providers(args, providers: List[str]):
+    from services.cloud_factory import CloudProviderFactory
+    from bench.fixtures import generate, load
+    from bench.replay_provider import replay_provider
+
+    recorded = load(args.fixtures) if args.fixtures else {}
+    for provider in providers:
+        fixtures = recorded.get(provider) or generate(provider, services=args.services, instances=args.instances)
+        CloudProviderFactory.register_provider(
+            provider, replay_provider(provider, fixtures, args.latency_ms, args.jitter_ms)
+        )
+
+def build_routes(providers: List[str]) -> List[Dict[str, Any]]:
+    """Every route of app.py: name, method, path, optional JSON body, stream flag"""
+    routes = [
+        {'name': 'health', 'path': '/api/health'},
+        {'name': 'providers', 'path': '/api/providers'},
+        {'name': 'summary', 'path': '/api/costs/summary'},
+        {'name': 'costs/query', 'path': '/api/costs/query?group_by=provider,service&limit=50'},
+        {'name': 'costs/query filtered', 'path': '/api/costs/query?group_by=account,day&filter=region:us-east1|europe-west1'},
+    ]
+    batch = []
+    for provider in providers:
+        routes.extend([
+            {'name': f'{provider}/costs/mtd', 'path': f'/api/{provider}/costs/mtd'},
+            {'name': f'{provider}/costs/mtd columnar+gzip', 'path': f'/api/{provider}/costs/mtd?format=columnar',
+             'headers': {'Accept-Encoding': 'gzip'}},
+            {'name': f'{provider}/costs/daily', 'path': f'/api/{provider}/costs/daily?days=30'},
+            {'name': f'{provider}/costs/forecast', 'path': f'/api/{provider}/costs/forecast'},
+            {'name': f'{provider}/costs/anomalies', 'path': f'/api/{provider}/costs/anomalies?days=30'},
+            {'name': f'{provider}/costs/export ndjson', 'path': f'/api/{provider}/costs/export?format=ndjson'},
+            {'name': f'{provider}/costs/export csv', 'path': f'/api/{provider}/costs/export?format=csv'},
+            {'name': f'{provider}/metrics/live', 'path': f'/api/{provider}/metrics/live'},
+            {'name': f'{provider}/metrics/timeseries', 'path': f'/api/{provider}/metrics/timeseries?type=cpu&minutes=360'},
+            {'name': f'{provider}/metrics/timeseries points', 'path': f'/api/{provider}/metrics/timeseries?type=traffic&minutes=360&points=60'},
+            {'name': f'{provider}/metrics/stream', 'path': f'/api/{provider}/metrics/stream', 'stream': True},
+        ])
+        batch.extend(
+            {'id': f'{provider}-{resource}', 'provider': provider, 'resource': resource}
+            for resource in ('costs/mtd', 'costs/total', 'costs/daily', 'metrics/live', 'metrics/timeseries')
+        )
+    routes.append({'name': 'batch', 'method': 'POST', 'path': '/api/batch', 'body': {'queries': batch}})
+    routes.append({'name': 'metrics', 'path': '/api/metrics'})
+    return routes
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def run_route(app, route: Dict[str, Any], requests: int, concurrency: int,
+              trace_memory: bool, warmup: bool = True) -> Dict[str, Any]:
+    local = threading.local()
+
+    def one_request() -> Optional[float]:
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        started = time.perf_counter()
+        if route.get('stream'):
+            # Time to the first event, then disconnect
+            response = client.get(route['path'], buffered=False)
+            next(iter(response.response), None)
+            response.close()
+        elif route.get('method') == 'POST':
+            response = client.post(route['path'], json=route['body'], headers=route.get('headers'))
+        else:
+            response = client.get(route['path'], headers=route.get('headers'))
+        elapsed = time.perf_counter() - started
+        return elapsed if response.status_code < 400 else None
+
+    if warmup:
+        one_request()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(), range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r for r in results if r is not None)
+    result = {
+        'route': route['name'],
+        'requests': requests,
+        'errors': requests - len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'throughput_rps': round(requests / wall, 1) if wall else 0.0,
+        'max_rss_mb': round(max_rss_mb(), 1),
+    }
+    if trace_memory:
+        result['heap_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+    return result
+
+def print_report(results: List[Dict[str, Any]]):
+    columns = ['route', 'requests', 'errors', 'p50_ms', 'p99_ms', 'throughput_rps', 'max_rss_mb']
+    if results and 'heap_peak_mb' in results[0]:
+        columns.append('heap_peak_mb')
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print('  '.join(str(r[c]).ljust(widths[c]) for c in columns))
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> List[str]:
+    """Routes whose p99 grew more than max_regression over the baseline run"""
+    with open(baseline_path) as f:
+        baseline = {r['route']: r for r in json.load(f)['results']}
+    regressions = []
+    for r in results:
+        before = baseline.get(r['route'])
+        if before and before['p99_ms'] > 0 and r['p99_ms'] > before['p99_ms'] * (1 + max_regression):
+            regressions.append(f"{r['route']}: p99 {before['p99_ms']}ms -> {r['p99_ms']}ms")
+    return regressions
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    providers = [p.strip().lower() for p in args.providers.split(',') if p.strip()]
+    configure_environment(args, providers)
+    register_providers(args, providers)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    from app import app
+
+    routes = build_routes(providers)
+    if args.routes:
+        wanted = [w.strip() for w in args.routes.split(',') if w.strip()]
+        routes = [r for r in routes if any(w in r['name'] for w in wanted)]
+
+    print(f"Benchmark: {len(providers)} providers, {args.services} services, {args.instances} instances, "
+          f"latency {args.latency_ms}+U(0,{args.jitter_ms})ms, concurrency {args.concurrency}, "
+          f"{'cold' if args.cold else 'warm'} cache\n")
+    results = [
+        run_route(app, route, args.requests, args.concurrency, args.trace_memory, warmup=not args.cold)
+        for route in routes
+    ]
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo p99 regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
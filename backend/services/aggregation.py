@@ -0,0 +1,142 @@
+from typing import List, Dict, Any, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+def _require_numpy():
+    if not NUMPY_AVAILABLE:
+        raise ImportError("NumPy not installed. Run: pip install numpy")
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """mean / p50 / p95 / max of a flat set of samples (NaNs ignored)"""
+    _require_numpy()
+    v = np.asarray(values, dtype=np.float64)
+    v = v[~np.isnan(v)]
+    if v.size == 0:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    p50, p95 = np.percentile(v, [50, 95])
+    return {'mean': float(v.mean()), 'p50': float(p50), 'p95': float(p95), 'max': float(v.max())}
+
+def bucket_stats(timestamps: Sequence[float], values: Sequence[float], bucket_seconds: float) -> Dict[str, List[float]]:
+    """
+    Group samples (from any number of instances) into fixed time buckets and
+    compute mean / p50 / p95 / max / sum per bucket without a Python-level loop.
+    Returns {'ts': bucket starts (epoch seconds), 'mean': [...], 'p50': [...], 'p95': [...], 'max': [...], 'sum': [...], 'count': [...]}.
+    """
+    _require_numpy()
+    ts = np.asarray(timestamps, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64)
+    keep = ~np.isnan(v)
+    ts, v = ts[keep], v[keep]
+    if v.size == 0:
+        return {'ts': [], 'mean': [], 'p50': [], 'p95': [], 'max': [], 'sum': [], 'count': []}
+
+    buckets = np.floor(ts / bucket_seconds).astype(np.int64)
+    # Sort by bucket, then value, so each bucket is a contiguous sorted run
+    order = np.lexsort((v, buckets))
+    buckets, v = buckets[order], v[order]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, v.size])
+
+    def percentile(q):
+        pos = starts + (counts - 1) * q
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, starts + counts - 1)
+        return v[lo] + (v[hi] - v[lo]) * (pos - lo)
+
+    sums = np.add.reduceat(v, starts)
+    return {
+        'ts': (buckets[starts] * bucket_seconds).tolist(),
+        'mean': (sums / counts).tolist(),
+        'p50': percentile(0.5).tolist(),
+        'p95': percentile(0.95).tolist(),
+        'max': v[starts + counts - 1].tolist(),
+        'sum': sums.tolist(),
+        'count': counts.tolist(),
+    }
+
+def top_n(instance_ids: Sequence[str], values: Sequence[float], n: int = 10) -> List[Dict[str, Any]]:
+    """Instances with the highest mean value, with their mean and max"""
+    _require_numpy()
+    ids = np.asarray(instance_ids)
+    v = np.asarray(values, dtype=np.float64)
+    keep = ~np.isnan(v)
+    ids, v = ids[keep], v[keep]
+    if v.size == 0:
+        return []
+
+    names, inverse = np.unique(ids, return_inverse=True)
+    means = np.bincount(inverse, weights=v) / np.bincount(inverse)
+    maxes = np.full(names.size, -np.inf)
+    np.maximum.at(maxes, inverse, v)
+
+    n = min(n, names.size)
+    top = np.argpartition(-means, n - 1)[:n]
+    top = top[np.argsort(-means[top])]
+    return [
+        {'instance': str(names[i]), 'mean': round(float(means[i]), 2), 'max': round(float(maxes[i]), 2)}
+        for i in top
+    ]
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> "np.ndarray":
+    """
+    Largest-Triangle-Three-Buckets: indices of at most `threshold` points that
+    keep the visual shape of the series. The last point is always kept, and
+    the first too for a threshold of 2 or more.
+    """
+    _require_numpy()
+    if threshold < 1:
+        raise ValueError("threshold must be at least 1")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    size = x.size
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 3:
+        # Too few points for a triangle: just the endpoints
+        return np.array([0, size - 1], dtype=np.int64)[-threshold:]
+
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < edges.size else size
+        # Average of the next bucket is the third triangle vertex
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def downsample_timeseries(data: Dict[str, Any], points: int) -> Dict[str, Any]:
+    """
+    Reduce a {'ts': [...], <metric>: [...], ...} payload to at most `points`
+    samples. LTTB picks indices on the first metric column and the same
+    indices are applied to every column so they stay aligned.
+    """
+    ts = data.get('ts')
+    if not ts or points is None or len(ts) <= points:
+        return data
+
+    columns = [k for k, v in data.items() if k != 'ts' and isinstance(v, list) and len(v) == len(ts)]
+    if not columns:
+        return data
+
+    _require_numpy()
+    primary = [float('nan') if v is None else v for v in data[columns[0]]]
+    indices = lttb_indices(np.arange(len(ts)), primary, points).tolist()
+
+    result = dict(data)
+    for key in ['ts'] + columns:
+        values = data[key]
+        result[key] = [values[i] for i in indices]
+    return result
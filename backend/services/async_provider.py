@@ -0,0 +1,93 @@
+import asyncio
+import os
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Any
+from services.base_provider import BaseCloudProvider
+
+# Threads available to sync providers running under the async backend. These
+# threads only block on cloud I/O, so the pool can be much larger than the CPU count.
+ASYNC_PROVIDER_WORKERS = int(os.getenv("ASYNC_PROVIDER_WORKERS", "128"))
+
+_executor = None
+
+def get_async_executor() -> ThreadPoolExecutor:
+    """Executor that sync provider calls are offloaded to"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ASYNC_PROVIDER_WORKERS, thread_name_prefix="async-provider")
+    return _executor
+
+class AsyncCloudProvider(ABC):
+    """Asyncio-native counterpart of BaseCloudProvider"""
+
+    name = 'base'
+
+    @abstractmethod
+    async def get_mtd_costs(self) -> List[Dict[str, Any]]:
+        """Get month-to-date costs by service/project"""
+        pass
+
+    @abstractmethod
+    async def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Get daily cost trend"""
+        pass
+
+    @abstractmethod
+    async def get_live_metrics(self) -> Dict[str, Any]:
+        """Get live metrics (CPU, memory, network, etc.)"""
+        pass
+
+    @abstractmethod
+    async def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
+        """Get time series data for charts"""
+        pass
+
+    async def get_mtd_total(self) -> float:
+        """Get total MTD cost (default implementation)"""
+        try:
+            costs = await self.get_mtd_costs()
+            return sum(item.get('cost', 0) for item in costs)
+        except:
+            return 0.0
+
+class SyncProviderAdapter(AsyncCloudProvider):
+    """Exposes a sync BaseCloudProvider through the async contract via an executor"""
+
+    def __init__(self, provider: BaseCloudProvider, executor: ThreadPoolExecutor = None):
+        self.provider = provider
+        self.name = provider.name
+        self.executor = executor or get_async_executor()
+
+    async def _run(self, method: str, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(getattr(self.provider, method), *args))
+
+    async def get_mtd_costs(self) -> List[Dict[str, Any]]:
+        return await self._run('get_mtd_costs')
+
+    async def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
+        return await self._run('get_daily_costs', days)
+
+    async def get_live_metrics(self) -> Dict[str, Any]:
+        return await self._run('get_live_metrics')
+
+    async def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
+        return await self._run('get_timeseries', metric_type, minutes)
+
+    async def get_mtd_total(self) -> float:
+        return await self._run('get_mtd_total')
+
+# One adapter per shared provider instance
+_adapters = weakref.WeakKeyDictionary()
+
+def as_async(provider) -> AsyncCloudProvider:
+    """Return provider as an AsyncCloudProvider, wrapping sync providers"""
+    if isinstance(provider, AsyncCloudProvider):
+        return provider
+    adapter = _adapters.get(provider)
+    if adapter is None:
+        adapter = _adapters[provider] = SyncProviderAdapter(provider)
+    return adapter
@@ -2,10 +2,55 @@ import os
 import json
 from typing import Dict, List, Optional
 
+# Config key identifying one account/project/subscription of each provider
+ACCOUNT_KEYS = {
+    'gcp': 'project_id',
+    'aws': 'account_id',
+    'azure': 'subscription_id',
+}
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+# Set on every account of a multi-account provider, so each one only reports its own costs
+ACCOUNT_SCOPE_KEYS = {
+    'gcp': 'billing_project_filter',
+    'aws': 'linked_account_filter',
+}
+
+# Settings that give an account credentials of its own when set in its entry
+ACCOUNT_CREDENTIAL_KEYS = ('use_profile', 'credentials_path')
+
+def account_configs(config: Dict, provider: str = None) -> List[Dict]:
+    """
+    Per-account configs: shared settings overlaid with each entry of
+    config['accounts']. With several accounts, each one is scoped to its own
+    costs and marked with whether it brings its own credentials.
+    """
+    accounts = config.get('accounts') or []
+    base = {k: v for k, v in config.items() if k != 'accounts'}
+    if len(accounts) <= 1:
+        return [{**base, **account} for account in accounts] or [base]
+    scope = ACCOUNT_SCOPE_KEYS.get(provider)
+    configs = []
+    for account in accounts:
+        merged = {**base, **account}
+        if scope:
+            merged.setdefault(scope, True)
+        merged['own_credentials'] = any(account.get(k) for k in ACCOUNT_CREDENTIAL_KEYS)
+        configs.append(merged)
+    return configs
+
+def _from_list(entries: List[Dict]) -> Dict:
+    """A provider listed as several config-file entries: first entry's settings plus all accounts"""
+    return {**entries[0], 'accounts': entries} if len(entries) > 1 else entries[0]
+
 class AuthManager:
     """
     Manages authentication for multiple cloud providers.
     Supports both environment variables and config files.
+    Each provider may list several accounts/projects/subscriptions, either as
+    comma-separated IDs in the environment or as a list in the config file.
     """
     
     def __init__(self):
@@ -21,34 +66,61 @@ class AuthManager:
             try:
                 with open(config_path, 'r') as f:
                     configs = json.load(f)
+                configs = {
+                    name: _from_list(config) if isinstance(config, list) else config
+                    for name, config in configs.items() if config
+                }
             except:
                 pass
         
         # GCP Configuration
-        if os.getenv("GCP_PROJECT_ID"):
+        project_ids = _split(os.getenv("GCP_PROJECT_IDS") or os.getenv("GCP_PROJECT_ID"))
+        if project_ids:
             configs['gcp'] = {
-                'project_id': os.getenv("GCP_PROJECT_ID"),
+                'project_id': project_ids[0],
+                # Project whose billing export holds every listed project's costs
+                'billing_project_id': os.getenv("GCP_BILLING_PROJECT_ID"),
                 'credentials_path': os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
                 'billing_dataset': os.getenv("BILLING_DATASET", "billing_export"),
-                'billing_table': os.getenv("BQ_BILLING_TABLE", "gcp_billing_export_v1_")
+                'billing_table': os.getenv("BQ_BILLING_TABLE", "gcp_billing_export_v1_"),
+                # Optional _TABLE_SUFFIX (billing account part of the export table name)
+                'billing_table_suffix': os.getenv("BQ_BILLING_TABLE_SUFFIX"),
+                # Refuse billing queries whose dry run exceeds this many bytes (0 = no limit)
+                'max_bytes_scanned': int(os.getenv("BQ_MAX_BYTES_SCANNED", "0"))
             }
+            if len(project_ids) > 1:
+                configs['gcp']['billing_project_id'] = configs['gcp']['billing_project_id'] or project_ids[0]
+                configs['gcp']['accounts'] = [{'project_id': p} for p in project_ids]
         
         # AWS Configuration
-        if os.getenv("AWS_ACCOUNT_ID"):
+        account_ids = _split(os.getenv("AWS_ACCOUNT_IDS") or os.getenv("AWS_ACCOUNT_ID"))
+        if account_ids:
+            region = os.getenv("AWS_REGION", "us-east-1")
             configs['aws'] = {
-                'account_id': os.getenv("AWS_ACCOUNT_ID"),
-                'region': os.getenv("AWS_REGION", "us-east-1"),
+                'account_id': account_ids[0],
+                'region': region,
+                # CloudWatch metrics are fanned out over these regions (comma-separated)
+                'regions': [r.strip() for r in os.getenv("AWS_REGIONS", region).split(',') if r.strip()],
                 'use_profile': os.getenv("AWS_PROFILE"),
-                'cost_explorer_enabled': os.getenv("AWS_COST_EXPLORER", "true").lower() == "true"
+                # Role assumed in each account from the profile's credentials (multi-account)
+                'role_name': os.getenv("AWS_ROLE_NAME"),
+                'cost_explorer_enabled': os.getenv("AWS_COST_EXPLORER", "true").lower() == "true",
+                # Breakdowns fetched together from Cost Explorer (service, account, region, tag:<key>)
+                'cost_breakdowns': [b.strip() for b in os.getenv("AWS_COST_BREAKDOWNS", "service,account").split(',') if b.strip()]
             }
+            if len(account_ids) > 1:
+                configs['aws']['accounts'] = [{'account_id': a} for a in account_ids]
         
         # Azure Configuration
-        if os.getenv("AZURE_SUBSCRIPTION_ID"):
+        subscription_ids = _split(os.getenv("AZURE_SUBSCRIPTION_IDS") or os.getenv("AZURE_SUBSCRIPTION_ID"))
+        if subscription_ids:
             configs['azure'] = {
-                'subscription_id': os.getenv("AZURE_SUBSCRIPTION_ID"),
+                'subscription_id': subscription_ids[0],
                 'tenant_id': os.getenv("AZURE_TENANT_ID"),
                 'use_cli_auth': os.getenv("AZURE_USE_CLI", "true").lower() == "true"
             }
+            if len(subscription_ids) > 1:
+                configs['azure']['accounts'] = [{'subscription_id': s} for s in subscription_ids]
         
         return configs
     
@@ -60,13 +132,19 @@ class AuthManager:
         """Get configuration for a specific provider"""
         return self.configs.get(provider.lower())
     
+    def get_account_configs(self, provider: str) -> List[Dict]:
+        """Get one configuration per account/project/subscription of a provider"""
+        config = self.get_config(provider)
+        return account_configs(config, provider.lower()) if config else []
+    
     def get_active_providers(self) -> List[Dict]:
         """Get list of all configured providers"""
         return [
             {
                 'name': provider,
                 'display_name': provider.upper(),
-                'configured': True
+                'configured': True,
+                'accounts': [c.get(ACCOUNT_KEYS.get(provider)) for c in self.get_account_configs(provider)]
             }
             for provider in self.configs.keys()
         ]
\ No newline at end of file
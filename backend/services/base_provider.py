@@ -1,11 +1,59 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator
+from datetime import date
+import hashlib
+import json
+import threading
+from services.cache import cached, is_error_result
+from services.instrumentation import client_build_seconds, timed
+from services.resilience import resilient
+import time
+
+def config_fingerprint(config: Dict) -> str:
+    """Stable short hash of a provider config, used to key shared instances"""
+    payload = json.dumps(config or {}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+# Credentials and clients shared by every instance (account) that builds them with the same key
+_shared_clients: Dict[tuple, Any] = {}
+_shared_lock = threading.Lock()
 
 class BaseCloudProvider(ABC):
     """Abstract base class for cloud providers"""
     
+    name = 'base'
+    
+    # Fields returned by get_timeseries for each metric type
+    timeseries_fields = {
+        'cpu': ('cpu_percent',),
+        'traffic': ('mbps_in', 'mbps_out'),
+        'disk': ('disk_read_mbps', 'disk_write_mbps'),
+    }
+    
+    # Cost methods are served through services.cache (TTL + stale-while-revalidate)
+    cached_methods = ('get_mtd_costs', 'get_daily_costs', 'get_mtd_total', 'get_cost_records')
+    
+    # Timed inside the cache, so latency histograms only see calls that reach the cloud;
+    # each call also gets a deadline, retries and the circuit breaker (services.resilience)
+    timed_methods = (
+        'get_mtd_costs', 'get_daily_costs', 'get_mtd_total', 'get_cost_records',
+        'get_live_metrics', 'get_timeseries'
+    )
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method in cls.timed_methods:
+            if method in cls.__dict__:
+                setattr(cls, method, resilient(timed(cls.__dict__[method])))
+        for method in cls.cached_methods:
+            if method in cls.__dict__:
+                setattr(cls, method, cached(cls.__dict__[method]))
+    
     def __init__(self, config: Dict):
         self.config = config
+        self.fingerprint = config_fingerprint(config)
+        self._clients: Dict[str, Any] = {}
+        self._client_lock = threading.RLock()
         self._validate_config()
     
     @abstractmethod
@@ -13,6 +61,37 @@ class BaseCloudProvider(ABC):
         """Validate provider-specific configuration"""
         pass
     
+    def _client(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Return a pooled SDK client/credential, building it once on first use"""
+        try:
+            return self._clients[key]
+        except KeyError:
+            pass
+        with self._client_lock:
+            if key not in self._clients:
+                started = time.perf_counter()
+                self._clients[key] = factory()
+                client_build_seconds.observe(time.perf_counter() - started, self.name, key)
+            return self._clients[key]
+    
+    def _shared_client(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        """Like _client, but shared across instances, e.g. one credential for many accounts"""
+        key = (self.name,) + tuple(key)
+        try:
+            return _shared_clients[key]
+        except KeyError:
+            pass
+        with _shared_lock:
+            if key not in _shared_clients:
+                started = time.perf_counter()
+                _shared_clients[key] = factory()
+                client_build_seconds.observe(time.perf_counter() - started, self.name, str(key[1]))
+            return _shared_clients[key]
+    
+    def refresh_credentials(self):
+        """Refresh credentials ahead of expiry (called from a background thread)"""
+        pass
+    
     @abstractmethod
     def get_mtd_costs(self) -> List[Dict[str, Any]]:
         """Get month-to-date costs by service/project"""
@@ -33,10 +112,24 @@ class BaseCloudProvider(ABC):
         """Get time series data for charts"""
         pass
     
+    def get_cost_records(self, days: int = 31) -> List[Dict[str, Any]]:
+        """
+        Get normalized daily cost records for the cost cube: one dict per
+        date/account/service/region/tag with keys 'date', 'cost' and any of
+        'account', 'service', 'region', 'tag'
+        """
+        raise NotImplementedError(f"{self.name} does not provide cost records")
+    
+    def export_line_items(self, start: date, end: date, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream billing line items with start <= date < end, one upstream page
+        at a time (see services.export.EXPORT_COLUMNS for the row keys)
+        """
+        raise NotImplementedError(f"{self.name} does not support cost exports")
+    
     def get_mtd_total(self) -> float:
-        """Get total MTD cost (default implementation)"""
-        try:
-            costs = self.get_mtd_costs()
-            return sum(item.get('cost', 0) for item in costs)
-        except:
-            return 0.0
+        """Get total MTD cost (default implementation); raises if the breakdown failed"""
+        costs = self.get_mtd_costs()
+        if is_error_result(costs):
+            raise RuntimeError(costs[0]['error'])
+        return sum(item.get('cost', 0) for item in costs)
@@ -0,0 +1,264 @@
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Default TTLs (seconds) per provider method; override with e.g. CACHE_TTL_GET_MTD_COSTS=600.
+# Billing exports only land a few times a day, so cost data can be cached aggressively.
+DEFAULT_TTLS = {
+    'get_mtd_costs': 900,
+    'get_mtd_total': 900,
+    'get_daily_costs': 3600,
+    'get_cost_records': 3600,
+}
+
+# How long past its TTL an entry may still be served while it is refreshed in the background
+STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", "21600"))
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+
+# Where entries live: "memory" (per process), "sqlite" (shared by the workers on one host) or "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "data/result_cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+# With a shared backend, one worker loads a key while the others wait up to CACHE_LOCK_WAIT_SECONDS for its result;
+# the lock expires after CACHE_LOCK_SECONDS in case its holder dies
+CACHE_LOCK_SECONDS = float(os.getenv("CACHE_LOCK_SECONDS", "60"))
+CACHE_LOCK_WAIT_SECONDS = float(os.getenv("CACHE_LOCK_WAIT_SECONDS", "30"))
+LOCK_POLL_SECONDS = 0.05
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'stored_at'])
+
+def method_ttl(method: str) -> int:
+    """TTL for a provider method, honouring CACHE_TTL_<METHOD> overrides"""
+    return int(os.getenv(f"CACHE_TTL_{method.upper()}", DEFAULT_TTLS.get(method, 300)))
+
+def is_error_result(value: Any) -> bool:
+    """Providers report failures as {'error': ...} or [{'error': ...}]; never cache those"""
+    if isinstance(value, dict):
+        return 'error' in value
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return 'error' in value[0]
+    return False
+
+class ServeStale(Exception):
+    """Raised by a loader that could not fetch: answer with `value` (last-known data) but do not store it"""
+
+    def __init__(self, value: Any):
+        super().__init__("serving last-known value")
+        self.value = value
+
+class MemoryBackend:
+    """Bounded in-process LRU store of CacheEntry values"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: CacheEntry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class ResultCache:
+    """
+    TTL cache with stale-while-revalidate and request coalescing.
+    Fresh entries are returned directly; entries past their TTL but within the
+    stale window are returned immediately while one background refresh runs;
+    on a miss, concurrent callers for the same key share a single upstream load.
+    Backends with acquire/release (the shared ones) extend that single load
+    across worker processes.
+    """
+
+    def __init__(self, backend=None, stale_seconds: int = STALE_SECONDS):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.stale_seconds = stale_seconds
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'shared': 0}
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: int) -> Any:
+        entry = self.backend.get(key)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age < ttl:
+                self._count('hits')
+                return entry.value
+            if age < ttl + self.stale_seconds:
+                self._count('stale')
+                self._refresh_in_background(key, loader)
+                return entry.value
+
+        self._count('misses')
+        return self._load(key, loader)
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the stored entry regardless of age (last-known value)"""
+        return self.backend.get(key)
+
+    def invalidate(self, key: Hashable):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        return self._fly(key, flight, loader, wait=True)
+
+    def _fly(self, key: Hashable, flight: _Flight, loader: Callable[[], Any], wait: bool) -> Any:
+        """Run the load for a flight registered in _flights, then release its waiters"""
+        try:
+            flight.value = self._load_once(key, loader, wait)
+            return flight.value
+        except ServeStale as e:
+            flight.value = e.value
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _store(self, key: Hashable, value: Any) -> Any:
+        if not is_error_result(value):
+            self.backend.set(key, CacheEntry(value, time.time()))
+        return value
+
+    def _load_once(self, key: Hashable, loader: Callable[[], Any], wait: bool) -> Any:
+        """
+        Run the loader, holding the backend's cross-process lock if it has one.
+        When another process holds it, wait for the value it stores (or, with
+        wait=False, return the current entry); load anyway if it never comes.
+        """
+        acquire = getattr(self.backend, 'acquire', None)
+        if acquire is None:
+            return self._store(key, loader())
+
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        started = time.time()
+        give_up = time.monotonic() + CACHE_LOCK_WAIT_SECONDS
+        while not acquire(key, owner, CACHE_LOCK_SECONDS):
+            entry = self.backend.get(key)
+            if entry is not None and (entry.stored_at >= started or not wait):
+                self._count('shared')
+                return entry.value
+            if time.monotonic() >= give_up:
+                return self._store(key, loader())
+            time.sleep(LOCK_POLL_SECONDS)
+
+        try:
+            # Another process may have stored it between our lookup and taking the lock
+            entry = self.backend.get(key)
+            if entry is not None and entry.stored_at >= started:
+                self._count('shared')
+                return entry.value
+            return self._store(key, loader())
+        finally:
+            self.backend.release(key, owner)
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any]):
+        # Registered before the thread starts, so concurrent stale readers start one refresh between them
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+
+        def run():
+            try:
+                self._fly(key, flight, loader, wait=False)
+            except Exception as e:
+                print(f"⚠ Background cache refresh failed for {key[:3]}: {e}")
+
+        threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+
+def make_backend(kind: str = CACHE_BACKEND):
+    """Build the configured cache backend"""
+    if kind == 'memory':
+        return MemoryBackend()
+    from services.shared_cache import RedisBackend, SQLiteBackend
+    if kind == 'sqlite':
+        return SQLiteBackend(CACHE_SQLITE_PATH)
+    if kind == 'redis':
+        # Entries only need to outlive the longest TTL plus the stale window
+        return RedisBackend.from_url(CACHE_REDIS_URL, expire_seconds=max(DEFAULT_TTLS.values()) + STALE_SECONDS)
+    raise ValueError(f"Unsupported CACHE_BACKEND: {kind}")
+
+result_cache = ResultCache(make_backend())
+
+def cache_key(provider, method: str, arguments: dict) -> tuple:
+    """Key a provider call by provider name, config, method and arguments"""
+    return (provider.name, provider.fingerprint, method, tuple(sorted(arguments.items())))
+
+def bound_cache_key(provider, method: str, signature: inspect.Signature, args: tuple, kwargs: dict) -> tuple:
+    """cache_key for a call, binding defaults so get_daily_costs() and get_daily_costs(30) match"""
+    bound = signature.bind(provider, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.pop('self', None)
+    return cache_key(provider, method, arguments)
+
+def cached(func: Callable) -> Callable:
+    """Serve a provider method through result_cache using its per-method TTL"""
+    if getattr(func, '__cached__', False):
+        return func
+
+    method = func.__name__
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        key = bound_cache_key(self, method, signature, args, kwargs)
+        return result_cache.get_or_load(key, lambda: func(self, *args, **kwargs), method_ttl(method))
+
+    wrapper.__cached__ = True
+    return wrapper
@@ -1,27 +1,165 @@
-from services.base_provider import BaseCloudProvider
-from services.providers.gcp_provider import GCPProvider
-from services.providers.aws_provider import AWSProvider
-from services.providers.azure_provider import AzureProvider
+import importlib
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple, Union
+from services.base_provider import BaseCloudProvider, config_fingerprint
+from services.async_provider import AsyncCloudProvider, as_async
+from services.auth_manager import account_configs
+from services.instrumentation import registry
+from services.multi_account import MultiAccountProvider
+
+CREDENTIAL_REFRESH_SECONDS = int(os.getenv("CREDENTIAL_REFRESH_SECONDS", "300"))
 
 class CloudProviderFactory:
     """Factory to create cloud provider instances"""
     
-    _providers = {
-        'gcp': GCPProvider,
-        'aws': AWSProvider,
-        'azure': AzureProvider
+    # Provider classes by name, as classes or "module:Class" paths. Paths are
+    # imported on first use, so only the SDKs of providers in use are loaded.
+    _providers: Dict[str, Union[type, str]] = {
+        'gcp': 'services.providers.gcp_provider:GCPProvider',
+        'aws': 'services.providers.aws_provider:AWSProvider',
+        'azure': 'services.providers.azure_provider:AzureProvider'
     }
+    # name -> {'module', 'seconds', 'error'} for every lazily imported provider
+    _imports: Dict[str, Dict[str, Any]] = {}
+    
+    # One long-lived instance per (provider, config) so SDK clients and
+    # credentials are reused across requests instead of rebuilt each time.
+    _instances: Dict[Tuple[str, str], BaseCloudProvider] = {}
+    # Re-entrant: a multi-account instance creates its per-account instances through get()
+    _lock = threading.RLock()
+    _refresher = None
     
     @classmethod
     def create(cls, provider: str, config: dict) -> BaseCloudProvider:
-        """Create a cloud provider instance"""
+        """Create a cloud provider instance (a MultiAccountProvider when several accounts are listed)"""
         provider = provider.lower()
-        if provider not in cls._providers:
+        provider_class = cls.resolve(provider)
+        
+        if len(config.get('accounts') or []) > 1:
+            children = [cls.get(provider, account) for account in account_configs(config, provider)]
+            return MultiAccountProvider(provider, config, children)
+        return provider_class(account_configs(config, provider)[0])
+    
+    @classmethod
+    def resolve(cls, provider: str) -> type:
+        """Get a provider class by name, importing its module (and SDKs) on first use"""
+        provider = provider.lower()
+        entry = cls._providers.get(provider)
+        if entry is None:
             raise ValueError(f"Unsupported provider: {provider}")
+        if not isinstance(entry, str):
+            return entry
+        
+        with cls._lock:
+            entry = cls._providers[provider]
+            if not isinstance(entry, str):
+                return entry
+            module_name, _, class_name = entry.partition(':')
+            started = time.perf_counter()
+            try:
+                provider_class = getattr(importlib.import_module(module_name), class_name)
+            except Exception as e:
+                cls._imports[provider] = {'module': module_name, 'seconds': time.perf_counter() - started, 'error': str(e)}
+                raise ValueError(f"Could not load provider {provider} from {entry}: {e}")
+            cls._imports[provider] = {'module': module_name, 'seconds': time.perf_counter() - started, 'error': None}
+            cls._providers[provider] = provider_class
+            return provider_class
+    
+    @classmethod
+    def preload(cls, providers: Iterable[str]) -> List[Dict[str, Any]]:
+        """Import the given (configured) providers now rather than on the first request"""
+        for provider in providers:
+            try:
+                cls.resolve(provider)
+            except ValueError as e:
+                print(f"⚠ {e}")
+        return cls.import_report()
+    
+    @classmethod
+    def import_report(cls) -> List[Dict[str, Any]]:
+        """Which providers have been imported and how long each import took"""
+        with cls._lock:
+            return [
+                {'provider': name, 'loaded': not isinstance(entry, str), **cls._imports.get(name, {})}
+                for name, entry in cls._providers.items()
+            ]
+    
+    @classmethod
+    def get(cls, provider: str, config: dict) -> BaseCloudProvider:
+        """Get the shared provider instance for a config, creating it on first use"""
+        provider = provider.lower()
+        key = (provider, config_fingerprint(config))
+        instance = cls._instances.get(key)
+        if instance is not None:
+            return instance
         
-        return cls._providers[provider](config)
+        with cls._lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = cls.create(provider, config)
+                cls._instances[key] = instance
+        cls._start_refresher()
+        return instance
+    
+    @classmethod
+    def get_async(cls, provider: str, config: dict) -> AsyncCloudProvider:
+        """Get the shared provider instance through the async contract"""
+        return as_async(cls.get(provider, config))
+    
+    @classmethod
+    def instances(cls) -> Dict[Tuple[str, str], BaseCloudProvider]:
+        """Snapshot of the shared provider instances"""
+        with cls._lock:
+            return dict(cls._instances)
+    
+    @classmethod
+    def clear(cls, provider: str = None):
+        """Drop shared instances (all, or only those of one provider)"""
+        with cls._lock:
+            for key in list(cls._instances):
+                if provider is None or key[0] == provider.lower():
+                    del cls._instances[key]
     
     @classmethod
-    def register_provider(cls, name: str, provider_class):
-        """Register a new provider (for extensibility)"""
-        cls._providers[name.lower()] = provider_class
\ No newline at end of file
+    def register_provider(cls, name: str, provider_class: Union[type, str]):
+        """Register a new provider (for extensibility): a class or a lazily imported "module:Class" path"""
+        cls._providers[name.lower()] = provider_class
+        cls.clear(name)
+    
+    @classmethod
+    def _start_refresher(cls):
+        """Start the background credential refresh thread once"""
+        if cls._refresher is not None or CREDENTIAL_REFRESH_SECONDS <= 0:
+            return
+        with cls._lock:
+            if cls._refresher is None:
+                cls._refresher = threading.Thread(
+                    target=cls._refresh_loop,
+                    name="credential-refresher",
+                    daemon=True
+                )
+                cls._refresher.start()
+    
+    @classmethod
+    def _refresh_loop(cls):
+        stop = threading.Event()
+        while not stop.wait(CREDENTIAL_REFRESH_SECONDS):
+            for (name, _), instance in cls.instances().items():
+                try:
+                    instance.refresh_credentials()
+                except Exception as e:
+                    print(f"⚠ Credential refresh failed for {name}: {e}")
+
+def _import_lines() -> List[str]:
+    lines = [
+        "# HELP dashboard_provider_import_seconds Time taken to import each provider module and its SDKs",
+        "# TYPE dashboard_provider_import_seconds gauge",
+    ]
+    for entry in CloudProviderFactory.import_report():
+        if 'seconds' in entry:
+            lines.append(f'dashboard_provider_import_seconds{{provider="{entry["provider"]}"}} {entry["seconds"]}')
+    return lines
+
+registry.collectors.append(_import_lines)
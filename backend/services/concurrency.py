@@ -0,0 +1,39 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict
+
+# Shared pool for fanning provider calls out concurrently
+PROVIDER_WORKERS = int(os.getenv("PROVIDER_WORKERS", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the process-wide worker pool used for provider fan-out"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix="provider")
+    return _executor
+
+def fan_out(calls: Dict[str, Callable[[], Any]], timeout: float = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run calls concurrently and collect whatever finishes within the timeout.
+    Returns {name: {'status': 'ok'|'error'|'timeout', 'value'|'error': ...}}.
+    Calls that time out keep running in the pool (and still warm any caches).
+    """
+    executor = get_executor()
+    futures = {name: executor.submit(call) for name, call in calls.items()}
+    wait(futures.values(), timeout=timeout)
+    
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            results[name] = {'status': 'timeout', 'error': f"timed out after {timeout}s"}
+        elif future.exception() is not None:
+            results[name] = {'status': 'error', 'error': str(future.exception())}
+        else:
+            results[name] = {'status': 'ok', 'value': future.result()}
+    return results
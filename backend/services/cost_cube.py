@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Sequence
+from services.cache import is_error_result
+from services.cloud_factory import CloudProviderFactory
+from services.concurrency import fan_out
+from services.instrumentation import registry
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Days of cost records loaded from every provider, and how often they are reloaded.
+# Billing data only lands a few times a day, and each reload can mean paid Cost Explorer
+# pages and BigQuery scans, so the default matches the forecaster's hourly refresh
+# (both read get_cost_records(90), so one cached load serves the two)
+COST_CUBE_DAYS = int(os.getenv("COST_CUBE_DAYS", "90"))
+COST_CUBE_REFRESH_SECONDS = float(os.getenv("COST_CUBE_REFRESH_SECONDS", "3600"))
+COST_CUBE_MAX_ROWS = 1000
+
+DIMENSIONS = ('provider', 'account', 'service', 'region', 'tag', 'day')
+
+def parse_filters(specs: Sequence[str]) -> Dict[str, List[str]]:
+    """'service:Compute Engine|BigQuery' strings -> {'service': ['Compute Engine', 'BigQuery']}"""
+    filters: Dict[str, List[str]] = {}
+    for spec in specs:
+        dimension, sep, values = spec.partition(':')
+        dimension = dimension.strip().lower()
+        if not sep or dimension not in DIMENSIONS:
+            raise ValueError(f"Invalid filter '{spec}', expected <dimension>:<value>[|<value>...] "
+                             f"with a dimension out of {', '.join(DIMENSIONS)}")
+        filters.setdefault(dimension, []).extend(values.split('|'))
+    return filters
+
+class _Column:
+    """
+    Dictionary-encoded dimension: sorted distinct values, an int32 code per
+    row and an inverted index (row ids grouped by code) so a filter on a few
+    values touches only their rows.
+    """
+
+    def __init__(self, raw: List[str]):
+        # Encode in first-seen order, then renumber so codes follow the sorted values
+        seen: Dict[str, int] = {}
+        codes = np.fromiter((seen.setdefault(v, len(seen)) for v in raw), dtype=np.int32, count=len(raw))
+        self.values: List[str] = sorted(seen)
+        rank = np.empty(len(seen), dtype=np.int32)
+        rank[[seen[v] for v in self.values]] = np.arange(len(seen), dtype=np.int32)
+        self.codes = rank[codes]
+        self.order = np.argsort(self.codes, kind='stable').astype(np.int32)
+        self.offsets = np.searchsorted(self.codes[self.order], np.arange(len(self.values) + 1))
+
+    def lookup(self, values: Sequence[str]) -> List[int]:
+        """Codes of the given values (unknown values are dropped)"""
+        positions = np.searchsorted(self.values, values) if self.values else []
+        return sorted({int(p) for p, v in zip(positions, values) if p < len(self.values) and self.values[p] == v})
+
+    def rows(self, codes: Sequence[int]):
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes] or [np.empty(0, np.int32)])
+
+    def row_range(self, lo: int, hi: int):
+        """Rows whose code is in [lo, hi); days sort chronologically, so this is a date range"""
+        return self.order[self.offsets[lo]:self.offsets[hi]]
+
+class CubeSnapshot:
+    """Immutable columnar cube: one int32 code column per dimension plus a float64 cost column"""
+
+    def __init__(self, records: Dict[str, List[Dict[str, Any]]]):
+        started = time.perf_counter()
+        raw: Dict[str, List[str]] = {d: [] for d in DIMENSIONS}
+        costs = []
+        for provider, rows in records.items():
+            for row in rows:
+                raw['provider'].append(provider)
+                raw['day'].append(str(row.get('date', '')))
+                for dimension in ('account', 'service', 'region', 'tag'):
+                    raw[dimension].append(str(row.get(dimension) or ''))
+                costs.append(row.get('cost') or 0.0)
+
+        self.columns = {d: _Column(raw[d]) for d in DIMENSIONS}
+        self.cost = np.array(costs, dtype=np.float64)
+        self.size = len(costs)
+        self.built_at = datetime.now(timezone.utc).isoformat()
+        self.build_seconds = time.perf_counter() - started
+
+    def select(self, filters: Dict[str, List[str]], start: str = None, end: str = None):
+        """Row ids matching every filter and start <= day < end"""
+        candidates = []
+        if start or end:
+            days = self.columns['day']
+            lo = int(np.searchsorted(days.values, start, 'left')) if start else 0
+            hi = int(np.searchsorted(days.values, end, 'left')) if end else len(days.values)
+            candidates.append(('day', None, days.row_range(lo, max(lo, hi))))
+        for dimension, values in filters.items():
+            codes = self.columns[dimension].lookup(values)
+            candidates.append((dimension, codes, self.columns[dimension].rows(codes)))
+        if not candidates:
+            return None
+
+        # Start from the most selective index, then check the rest on the codes
+        candidates.sort(key=lambda c: len(c[2]))
+        rows = candidates[0][2]
+        for dimension, codes, other in candidates[1:]:
+            if codes is None:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            else:
+                rows = rows[np.isin(self.columns[dimension].codes[rows], codes)]
+        return np.sort(rows)
+
+    def query(self, group_by: Sequence[str], filters: Dict[str, List[str]] = None,
+              start: str = None, end: str = None, limit: int = COST_CUBE_MAX_ROWS) -> Dict[str, Any]:
+        """Summed cost per distinct combination of the group_by dimensions over the selected rows"""
+        started = time.perf_counter()
+        rows = self.select(filters or {}, start, end)
+        cost = self.cost if rows is None else self.cost[rows]
+        scanned = self.size if rows is None else len(rows)
+
+        if group_by and scanned:
+            columns = [self.columns[d] for d in group_by]
+            codes = [c.codes if rows is None else c.codes[rows] for c in columns]
+            space = np.prod([float(len(c.values)) for c in columns])
+            if space < 2 ** 62:
+                # Fold the group's codes into one int64 key (mixed radix)
+                key = np.zeros(scanned, dtype=np.int64)
+                for column, column_codes in zip(columns, codes):
+                    key = key * len(column.values) + column_codes
+                if space <= max(scanned, 1 << 16):
+                    # Small key space: count straight into a dense array, no sort
+                    keys = np.flatnonzero(np.bincount(key, minlength=int(space)))
+                    dense = np.empty(int(space), dtype=np.int64)
+                    dense[keys] = np.arange(len(keys))
+                    inverse = dense[key]
+                else:
+                    keys, inverse = np.unique(key, return_inverse=True)
+                combos = np.empty((len(keys), len(columns)), dtype=np.int64)
+                for i in range(len(columns) - 1, -1, -1):
+                    keys, combos[:, i] = np.divmod(keys, len(columns[i].values))
+            else:
+                combos, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+            sums = np.bincount(inverse.ravel(), weights=cost, minlength=len(combos))
+            top = np.argpartition(-sums, limit - 1)[:limit] if 0 < limit < len(sums) else np.arange(len(sums))
+            top = top[np.argsort(-sums[top], kind='stable')]
+
+            results = [
+                {
+                    **{d: c.values[code] for d, c, code in zip(group_by, columns, combos[i].tolist())},
+                    'cost': round(float(sums[i]), 2)
+                }
+                for i in top
+            ]
+            groups = len(combos)
+        else:
+            results = [{'cost': round(float(cost.sum()), 2)}] if scanned else []
+            groups = len(results)
+
+        return {
+            'group_by': list(group_by),
+            'rows': results,
+            'groups': groups,
+            'total': round(float(cost.sum()), 2),
+            'rows_scanned': scanned,
+            'built_at': self.built_at,
+            'query_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+
+class CubeLoading(Exception):
+    """No snapshot has been built yet; the first one is loading in the background"""
+
+_cubes: List['CostCube'] = []
+
+class CostCube:
+    """
+    Normalized cost records of every configured provider, held as a
+    CubeSnapshot and rebuilt in the background, so group-by/filter queries
+    across providers are answered from memory without calling the clouds.
+    """
+
+    def __init__(self, auth_manager, days: int = COST_CUBE_DAYS, interval: float = COST_CUBE_REFRESH_SECONDS):
+        self.auth_manager = auth_manager
+        self.days = days
+        self.interval = interval
+        self.snapshot: Optional[CubeSnapshot] = None
+        # provider -> {'status', 'records', 'refreshed_at', 'error'?}
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._thread = None
+        self._loader = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        _cubes.append(self)
+
+    def ensure_started(self):
+        """Start the refresh thread once (no-op when disabled or already running)"""
+        if self._thread is not None or self.interval <= 0 or not NUMPY_AVAILABLE:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cost-cube", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠ Cost cube refresh failed: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def refresh(self) -> CubeSnapshot:
+        """Reload cost records from every provider and swap in a new snapshot"""
+        if not NUMPY_AVAILABLE:
+            raise ImportError("NumPy not installed. Run: pip install numpy")
+        with self._build_lock:
+            providers = [p['name'] for p in self.auth_manager.get_active_providers()]
+
+            def cost_records(provider):
+                config = self.auth_manager.get_config(provider)
+                return lambda: CloudProviderFactory.get(provider, config).get_cost_records(self.days)
+
+            results = fan_out({p: cost_records(p) for p in providers}, timeout=self.interval or None)
+            now = datetime.now(timezone.utc).isoformat()
+            for provider, result in results.items():
+                value = result.get('value')
+                if result['status'] == 'ok' and not is_error_result(value):
+                    self._records[provider] = value
+                    self.sources[provider] = {'status': 'ok', 'records': len(value), 'refreshed_at': now}
+                else:
+                    # Keep serving the provider's previous records, if any
+                    error = result.get('error') or (value[0] if isinstance(value, list) else value)['error']
+                    previous = self.sources.get(provider, {})
+                    self.sources[provider] = {**previous, 'status': result['status'], 'error': str(error)}
+            for provider in list(self._records):
+                if provider not in providers:
+                    del self._records[provider]
+                    self.sources.pop(provider, None)
+
+            self.snapshot = CubeSnapshot(self._records)
+            return self.snapshot
+
+    def _load_in_background(self):
+        """Build the first snapshot off the request thread (the refresh loop does it when running)"""
+        with self._lock:
+            if self._thread is not None or (self._loader is not None and self._loader.is_alive()):
+                return
+
+            def run():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠ Cost cube load failed: {e}")
+
+            self._loader = threading.Thread(target=run, name="cost-cube-load", daemon=True)
+            self._loader.start()
+
+    def query(self, group_by: Sequence[str], filters: Dict[str, List[str]] = None,
+              start: str = None, end: str = None, limit: int = COST_CUBE_MAX_ROWS) -> Dict[str, Any]:
+        """Query the current snapshot; raises CubeLoading while the first one is being built"""
+        for dimension in list(group_by) + list(filters or {}):
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dimension}', expected one of {', '.join(DIMENSIONS)}")
+        snapshot = self.snapshot
+        if snapshot is None:
+            self._load_in_background()
+            raise CubeLoading("Cost data is still loading, retry shortly")
+        result = snapshot.query(group_by, filters, start, end, limit)
+        result['sources'] = dict(self.sources)
+        return result
+
+def _cube_lines() -> List[str]:
+    lines = [
+        "# HELP dashboard_cost_cube_rows Cost records held in the in-memory cost cube",
+        "# TYPE dashboard_cost_cube_rows gauge",
+        "# HELP dashboard_cost_cube_build_seconds Time taken to build the latest cost cube snapshot",
+        "# TYPE dashboard_cost_cube_build_seconds gauge",
+    ]
+    snapshots = [cube.snapshot for cube in _cubes if cube.snapshot is not None]
+    if snapshots:
+        lines.append(f"dashboard_cost_cube_rows {sum(s.size for s in snapshots)}")
+        lines.append(f"dashboard_cost_cube_build_seconds {max(s.build_seconds for s in snapshots)}")
+    return lines
+
+registry.collectors.append(_cube_lines)
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Any
+
+# Local store of settled daily costs; set DAILY_COST_DB="" to disable
+DAILY_COST_DB = os.getenv("DAILY_COST_DB", "data/daily_costs.sqlite3")
+
+# Billing data for the most recent days keeps changing; older days are treated as final
+SETTLEMENT_DAYS = int(os.getenv("COST_SETTLEMENT_DAYS", "3"))
+
+# fetch_range(start, end) returns [{'date': 'YYYY-MM-DD', 'cost': float}, ...] for start <= date < end
+FetchRange = Callable[[date, date], List[Dict[str, Any]]]
+
+class DailyCostStore:
+    """
+    Persistent per-provider store of settled daily costs (SQLite).
+    Closed days are fetched once; each request only refetches the trailing
+    unsettled window plus any settled days the store has not fetched yet.
+    """
+
+    def __init__(self, path: str = DAILY_COST_DB, settlement_days: int = SETTLEMENT_DAYS):
+        self.path = path
+        self.settlement_days = settlement_days
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS daily_costs (
+                            provider_key TEXT NOT NULL,
+                            date TEXT NOT NULL,
+                            cost REAL NOT NULL,
+                            PRIMARY KEY (provider_key, date)
+                        )
+                    """)
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def get_daily_costs(self, provider, days: int, fetch_range: FetchRange) -> List[Dict[str, Any]]:
+        """Serve the last `days` days (including today) from the store, fetching only what is missing"""
+        # Provider billing days are UTC dates
+        today = datetime.now(timezone.utc).date()
+        start = today - timedelta(days=days)
+        end = today + timedelta(days=1)
+
+        if not self.path:
+            return fetch_range(start, end)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        key = f"{provider.name}:{provider.fingerprint}"
+        settled_end = max(start, today - timedelta(days=self.settlement_days))
+
+        conn = self._connect()
+        try:
+            stored = dict(conn.execute(
+                "SELECT date, cost FROM daily_costs WHERE provider_key = ? AND date >= ? AND date < ?",
+                (key, start.isoformat(), settled_end.isoformat())
+            ).fetchall())
+
+            # One upstream call covering the earliest missing settled day through today
+            fetch_start = settled_end
+            day = start
+            while day < settled_end:
+                if day.isoformat() not in stored:
+                    fetch_start = day
+                    break
+                day += timedelta(days=1)
+
+            fetched = {row['date']: float(row['cost']) for row in fetch_range(fetch_start, end)}
+
+            # Persist every newly settled day in the fetched range; billing sources leave out days
+            # with no cost, so a day the upstream did not return is recorded as a zero, not refetched
+            settled_rows = []
+            day = fetch_start
+            while day < settled_end:
+                settled_rows.append((key, day.isoformat(), fetched.setdefault(day.isoformat(), 0.0)))
+                day += timedelta(days=1)
+            if settled_rows:
+                conn.executemany("INSERT OR REPLACE INTO daily_costs VALUES (?, ?, ?)", settled_rows)
+                conn.commit()
+        finally:
+            conn.close()
+
+        costs = {**stored, **fetched}
+        return [{'date': d, 'cost': round(costs[d], 2)} for d in sorted(costs)]
+
+daily_store = DailyCostStore()
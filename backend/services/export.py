@@ -0,0 +1,109 @@
+import csv
+import io
+import itertools
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, Any, Iterable, Iterator
+from services.instrumentation import Counter, registry
+from services.responses import dumps
+
+# Rows requested per upstream page, and bytes buffered before a chunk is written to the client
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "10000"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+# Longest period one export may cover
+EXPORT_MAX_DAYS = int(os.getenv("EXPORT_MAX_DAYS", "366"))
+
+# Every provider's line items are mapped onto these columns (missing ones are left empty)
+EXPORT_COLUMNS = ('date', 'account', 'service', 'sku', 'region', 'usage_amount', 'usage_unit', 'cost', 'currency')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+export_rows_total = registry.register(Counter(
+    'dashboard_export_rows_total', 'Line items streamed by the cost export',
+    ('provider', 'format')
+))
+
+def export_period(start: str = None, end: str = None):
+    """Parse an export's [start, end) dates (default: month to date), raising ValueError when invalid"""
+    # Billing days are UTC dates
+    today = datetime.now(timezone.utc).date()
+    start_date = date.fromisoformat(start) if start else today.replace(day=1)
+    end_date = date.fromisoformat(end) if end else date.fromordinal(today.toordinal() + 1)
+    if start_date >= end_date:
+        raise ValueError("start must be before end")
+    if (end_date - start_date).days > EXPORT_MAX_DAYS:
+        raise ValueError(f"At most {EXPORT_MAX_DAYS} days per export")
+    return start_date, end_date
+
+def _chunked(pieces: Iterable[bytes], chunk_bytes: int) -> Iterator[bytes]:
+    """Join small pieces into chunks of about chunk_bytes"""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+def ndjson_lines(rows: Iterable[Dict[str, Any]], provider: str) -> Iterator[bytes]:
+    """One JSON object per line; an upstream failure ends the stream with an {"error": ...} line"""
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield dumps({column: row.get(column) for column in EXPORT_COLUMNS}) + b'\n'
+    except Exception as e:
+        print(f"⚠ {provider} export failed after {count} rows: {e}")
+        yield dumps({'error': str(e), 'rows': count}) + b'\n'
+    finally:
+        export_rows_total.inc(provider, 'ndjson', amount=count)
+
+def csv_lines(rows: Iterable[Dict[str, Any]], provider: str) -> Iterator[bytes]:
+    """Header plus one CSV line per row; an upstream failure ends the file with an '#error' row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take() -> bytes:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text.encode('utf-8')
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield take()
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            writer.writerow([row.get(column, '') for column in EXPORT_COLUMNS])
+            yield take()
+    except Exception as e:
+        print(f"⚠ {provider} export failed after {count} rows: {e}")
+        writer.writerow(['#error', str(e), count])
+        yield take()
+    finally:
+        export_rows_total.inc(provider, 'csv', amount=count)
+
+def prime(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Pull the first row now, so errors raised before any data (credentials,
+    invalid queries) surface while an error status can still be returned
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    return rows if first is None else itertools.chain([first], rows)
+
+def stream_export(rows: Iterable[Dict[str, Any]], provider: str, fmt: str,
+                  chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Encode line items lazily as NDJSON or CSV in chunks of about chunk_bytes.
+    Nothing is read ahead: the next upstream page is only requested once the
+    client has taken the previous chunks, so memory stays at one page.
+    """
+    encode = ndjson_lines if fmt == 'ndjson' else csv_lines
+    return _chunked(encode(rows, provider), chunk_bytes)
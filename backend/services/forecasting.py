@@ -0,0 +1,344 @@
+import calendar
+import os
+import threading
+import time
+import warnings
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from services.cache import is_error_result
+from services.cloud_factory import CloudProviderFactory
+from services.daily_store import SETTLEMENT_DAYS
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Days of history read from get_daily_costs / get_cost_records (90 matches the cost cube, so the cached records are shared)
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "90"))
+FORECAST_REFRESH_SECONDS = float(os.getenv("FORECAST_REFRESH_SECONDS", "3600"))
+# Services modelled per provider (largest by cost over the history); the rest only count in the total
+FORECAST_MAX_SERVICES = int(os.getenv("FORECAST_MAX_SERVICES", "200"))
+# Robust z-score above which a day is an anomaly, and the smallest cost change worth flagging
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.5"))
+ANOMALY_MIN_DELTA = float(os.getenv("ANOMALY_MIN_DELTA", "1.0"))
+
+# Smoothing for the level, the day-of-week factors and the residual variance
+LEVEL_ALPHA = 0.2
+SEASON_GAMMA = 0.1
+VARIANCE_BETA = 0.1
+# Residuals beyond this many robust deviations are clipped before updating the state (Huber)
+HUBER_K = 2.0
+# Trailing residuals used for the median / MAD of the robust z-score
+RESIDUAL_WINDOW = 28
+# Days a series needs before it is scored
+MIN_HISTORY_DAYS = 14
+# A weekday factor is only re-seeded within the first two scored weeks; later, a recurring
+# anomaly keeps being flagged rather than absorbed into the weekly shape
+RESEED_HISTORY_DAYS = MIN_HISTORY_DAYS + 14
+MAD_TO_SIGMA = 1.4826
+Z_95 = 1.96
+
+TOTAL = '*'
+
+class SeasonalModel:
+    """
+    Vectorized per-series state (one column per series; column 0 is the
+    provider total): an EWMA level, multiplicative day-of-week factors,
+    an EWMA residual variance and a ring buffer of recent residuals for the
+    robust z-score. commit() folds in one settled day in O(series), so the
+    model is updated incrementally instead of refitted on every refresh.
+    Series whose value for a day is NaN (no data) are left untouched.
+    """
+
+    def __init__(self):
+        self.names: List[str] = [TOTAL]
+        self.index: Dict[str, int] = {TOTAL: 0}
+        self.level = np.zeros(1)
+        self.season = np.ones((7, 1))
+        self.var = np.zeros(1)
+        self.seen = np.zeros(1, dtype=np.int64)
+        self.residuals = np.full((RESIDUAL_WINDOW, 1), np.nan)
+        # Direction of each weekday's last anomaly per series (0 when that day was normal)
+        self.weekday_anomaly = np.zeros((7, 1))
+        self._pos = 0
+        self.last_day: Optional[date] = None
+        self.anomalies: List[Dict[str, Any]] = []
+
+    def add_series(self, names: List[str]):
+        new = [n for n in names if n not in self.index]
+        if not new:
+            return
+        for name in new:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+        n = len(new)
+        self.level = np.concatenate([self.level, np.zeros(n)])
+        self.season = np.concatenate([self.season, np.ones((7, n))], axis=1)
+        self.var = np.concatenate([self.var, np.zeros(n)])
+        self.seen = np.concatenate([self.seen, np.zeros(n, dtype=np.int64)])
+        self.residuals = np.concatenate([self.residuals, np.full((RESIDUAL_WINDOW, n), np.nan)], axis=1)
+        self.weekday_anomaly = np.concatenate([self.weekday_anomaly, np.zeros((7, n))], axis=1)
+
+    def expected(self, day: date):
+        return self.level * self.season[day.weekday()]
+
+    def _spread(self):
+        """Median and robust scale (MAD, or the EWMA deviation while the MAD is 0) of recent residuals"""
+        with warnings.catch_warnings():
+            # Series with no residuals yet have all-NaN columns
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(self.residuals, axis=0)
+            mad = np.nanmedian(np.abs(self.residuals - median), axis=0)
+        return np.nan_to_num(median), np.where(mad > 0, MAD_TO_SIGMA * mad, np.sqrt(self.var))
+
+    def score(self, day: date, x) -> Tuple[Any, Any, Any]:
+        """Expected value, residual and robust z-score of every series for `day`"""
+        expected = self.expected(day)
+        residual = x - expected
+        median, scale = self._spread()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(scale > 0, (residual - median) / scale, 0.0)
+        z[self.seen < MIN_HISTORY_DAYS] = 0.0
+        return expected, residual, np.nan_to_num(z)
+
+    def anomalies_for(self, day: date, x, provisional: bool = False) -> List[Dict[str, Any]]:
+        return self._flag(day, x, *self.score(day, x), provisional)
+
+    def _flag(self, day: date, x, expected, residual, z, provisional: bool) -> List[Dict[str, Any]]:
+        flagged = np.flatnonzero((np.abs(z) > ANOMALY_Z_THRESHOLD) & (np.abs(residual) >= ANOMALY_MIN_DELTA))
+        return [
+            {
+                'date': day.isoformat(),
+                'service': None if i == 0 else self.names[i],
+                'cost': round(float(x[i]), 2),
+                'expected': round(float(expected[i]), 2),
+                'z': round(float(z[i]), 2),
+                'direction': 'spike' if residual[i] > 0 else 'drop',
+                'provisional': provisional,
+            }
+            for i in flagged
+        ]
+
+    def commit(self, day: date, x):
+        """Fold one settled day into the state, recording its anomalies first"""
+        observed = ~np.isnan(x)
+        x = np.where(observed, x, 0.0)
+        expected, residual, z = self.score(day, x)
+        z[~observed] = 0.0
+        residual[~observed] = 0.0
+        self.anomalies.extend(self._flag(day, x, expected, residual, z, False))
+
+        # Clip outliers so a spike does not drag the baseline along with it
+        _, scale = self._spread()
+        w = day.weekday()
+        limit = np.where((self.seen >= MIN_HISTORY_DAYS) & (scale > 0), HUBER_K * scale, np.inf)
+        bounded = expected + np.clip(residual, -limit, limit)
+        # The same weekday anomalous in the same direction in both of the first scored weeks
+        # means its factor was learnt wrong (e.g. from a spike during warm-up): re-seed it from today
+        outlier = np.where(np.abs(z) > ANOMALY_Z_THRESHOLD, np.sign(residual), 0.0)
+        reseed = (outlier != 0) & (outlier == self.weekday_anomaly[w]) & (self.seen < RESEED_HISTORY_DAYS)
+        self.weekday_anomaly[w] = np.where(observed, np.where(reseed, 0.0, outlier), self.weekday_anomaly[w])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deseasoned = bounded / self.season[w]
+            level = np.where(self.seen == 0, deseasoned, LEVEL_ALPHA * deseasoned + (1 - LEVEL_ALPHA) * self.level)
+            self.level = np.where(observed, level, self.level)
+            ratio = np.where(self.level > 0, np.where(reseed, x, bounded) / self.level, self.season[w])
+        # Plain running mean over the first few weeks, so the weekly shape is learnt quickly
+        gamma = np.where(reseed, 1.0, np.maximum(SEASON_GAMMA, 1.0 / (self.seen // 7 + 1)))
+        self.season[w] = np.where(observed, gamma * ratio + (1 - gamma) * self.season[w], self.season[w])
+        self.season /= self.season.mean(axis=0)
+
+        first = self.seen == 0
+        var = np.where(first, 0.0, VARIANCE_BETA * residual ** 2 + (1 - VARIANCE_BETA) * self.var)
+        self.var = np.where(observed, var, self.var)
+        self.residuals[self._pos] = np.where(observed & ~first, residual, np.nan)
+        self._pos = (self._pos + 1) % RESIDUAL_WINDOW
+        self.seen += observed
+        self.last_day = day
+
+def _daily_matrix(names: List[str], index: Dict[str, int], daily: List[Dict[str, Any]],
+                  records: List[Dict[str, Any]], start: date, days: int):
+    """
+    Costs as a (days, series) matrix: column 0 from the daily totals, the rest
+    from cost records. Days a source has no rows for are NaN (no data), not 0;
+    on a day that has records, a service without any costs 0.
+    """
+    matrix = np.full((days, len(names)), np.nan)
+    for row in daily:
+        offset = (date.fromisoformat(row['date']) - start).days
+        if 0 <= offset < days:
+            matrix[offset, 0] = row['cost']
+    for day in {row['date'] for row in records}:
+        offset = (date.fromisoformat(day) - start).days
+        if 0 <= offset < days:
+            matrix[offset, 1:] = 0.0
+    for row in records:
+        column = index.get(row.get('service'))
+        offset = (date.fromisoformat(row['date']) - start).days
+        if column is not None and 0 <= offset < days:
+            matrix[offset, column] += row.get('cost') or 0.0
+    return matrix
+
+class CostForecaster:
+    """
+    Per-provider SeasonalModel state kept up to date from get_daily_costs
+    (totals) and get_cost_records (per service). Settled days are committed
+    once; the unsettled trailing days are scored on every refresh without
+    being committed. Forecasts and anomalies are precomputed on a background
+    thread, so the routes only read them.
+    """
+
+    def __init__(self, auth_manager, history_days: int = FORECAST_HISTORY_DAYS,
+                 interval: float = FORECAST_REFRESH_SECONDS):
+        self.auth_manager = auth_manager
+        self.history_days = history_days
+        self.interval = interval
+        # (provider, fingerprint) -> SeasonalModel; provider -> precomputed results
+        self.models: Dict[Tuple[str, str], SeasonalModel] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._provider_locks: Dict[str, threading.Lock] = {}
+
+    def ensure_started(self):
+        """Start the refresh thread once (no-op when disabled or already running)"""
+        if self._thread is not None or self.interval <= 0 or not NUMPY_AVAILABLE:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cost-forecaster", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            for provider in [p['name'] for p in self.auth_manager.get_active_providers()]:
+                try:
+                    self.refresh(provider)
+                except Exception as e:
+                    print(f"⚠ Cost forecast refresh failed for {provider}: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _provider_lock(self, provider: str) -> threading.Lock:
+        with self._lock:
+            return self._provider_locks.setdefault(provider, threading.Lock())
+
+    def refresh(self, provider: str) -> Dict[str, Any]:
+        """Commit newly settled days, rescore the unsettled ones and precompute the results"""
+        if not NUMPY_AVAILABLE:
+            raise ImportError("NumPy not installed. Run: pip install numpy")
+        with self._provider_lock(provider):
+            cloud = CloudProviderFactory.get(provider, self.auth_manager.get_config(provider))
+            daily = cloud.get_daily_costs(self.history_days)
+            if is_error_result(daily):
+                raise RuntimeError(daily[0]['error'])
+            try:
+                records = cloud.get_cost_records(self.history_days)
+            except NotImplementedError:
+                records = []
+            if is_error_result(records):
+                print(f"⚠ {provider}: per-service forecast skipped ({records[0]['error']})")
+                records = []
+
+            model = self.models.setdefault((provider, cloud.fingerprint), SeasonalModel())
+            totals: Dict[str, float] = {}
+            for row in records:
+                totals[row.get('service')] = totals.get(row.get('service'), 0.0) + (row.get('cost') or 0.0)
+            totals.pop(None, None)
+            model.add_series(sorted(totals, key=totals.get, reverse=True)[:FORECAST_MAX_SERVICES])
+
+            # Provider billing days are UTC dates
+            today = datetime.now(timezone.utc).date()
+            start = today - timedelta(days=self.history_days)
+            days = self.history_days + 1
+            matrix = _daily_matrix(model.names, model.index, daily, records, start, days)
+            settled_end = today - timedelta(days=SETTLEMENT_DAYS)
+
+            day = max(start, model.last_day + timedelta(days=1)) if model.last_day else start
+            while day < settled_end:
+                model.commit(day, matrix[(day - start).days])
+                day += timedelta(days=1)
+            cutoff = (today - timedelta(days=self.history_days)).isoformat()
+            model.anomalies = [a for a in model.anomalies if a['date'] >= cutoff]
+
+            provisional = []
+            while day <= today:
+                provisional.extend(model.anomalies_for(day, matrix[(day - start).days], provisional=True))
+                day += timedelta(days=1)
+
+            result = {
+                'forecast': self._forecast(provider, model, matrix, start, today),
+                'anomalies': sorted(model.anomalies + provisional, key=lambda a: (a['date'], abs(a['z'])), reverse=True),
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+            }
+            self.results[provider] = result
+            return result
+
+    def _forecast(self, provider: str, model: SeasonalModel, matrix, start: date, today: date) -> Dict[str, Any]:
+        """Month-end projection: actual costs so far plus level x day-of-week factor for the remaining days"""
+        month_start = today.replace(day=1)
+        month_days = calendar.monthrange(today.year, today.month)[1]
+        remaining = [month_start + timedelta(days=d) for d in range(today.day, month_days)]
+
+        actual = np.nansum(matrix[max(0, (month_start - start).days):(today - start).days + 1], axis=0)
+        if remaining:
+            expected = np.stack([model.expected(day) for day in remaining])
+            projected_rest = expected.sum(axis=0)
+        else:
+            expected = np.zeros((0, len(model.names)))
+            projected_rest = np.zeros(len(model.names))
+        margin = Z_95 * np.sqrt(model.var * len(remaining))
+        projected = actual + projected_rest
+
+        services = [
+            {
+                'service': model.names[i],
+                'mtd_cost': round(float(actual[i]), 2),
+                'projected_month_end': round(float(projected[i]), 2),
+            }
+            for i in np.argsort(-projected)
+            if i != 0 and model.seen[i] > 0
+        ]
+        return {
+            'provider': provider,
+            'month': month_start.strftime('%Y-%m'),
+            'as_of': today.isoformat(),
+            'mtd_cost': round(float(actual[0]), 2),
+            'forecast_remaining': round(float(projected_rest[0]), 2),
+            'projected_month_end': round(float(projected[0]), 2),
+            'lower': round(float(max(actual[0], projected[0] - margin[0])), 2),
+            'upper': round(float(projected[0] + margin[0]), 2),
+            'daily': [
+                {'date': day.isoformat(), 'forecast': round(float(expected[i, 0]), 2)}
+                for i, day in enumerate(remaining)
+            ],
+            'services': services,
+            'history_days': int(model.seen[0]),
+        }
+
+    def _results(self, provider: str) -> Dict[str, Any]:
+        """Precomputed results, computed now if nothing was refreshed yet"""
+        provider = provider.lower()
+        result = self.results.get(provider)
+        if result is None:
+            result = self.refresh(provider)
+        return result
+
+    def forecast(self, provider: str) -> Dict[str, Any]:
+        result = self._results(provider)
+        return {**result['forecast'], 'updated_at': result['updated_at']}
+
+    def anomalies(self, provider: str, days: int = 30, service: str = None) -> List[Dict[str, Any]]:
+        """Anomalies of the last `days` days, newest first; service='*' selects the provider total"""
+        since = (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat()
+        rows = [a for a in self._results(provider)['anomalies'] if a['date'] >= since]
+        if service is not None:
+            wanted = None if service == TOTAL else service
+            rows = [a for a in rows if a['service'] == wanted]
+        return rows
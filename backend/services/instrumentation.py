@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+from services.cache import is_error_result, result_cache
+
+# Add a Server-Timing header (provider calls, encoding, total) to API responses
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Latency buckets (seconds) shared by every histogram
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with labels (Prometheus semantics)"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                    cumulative += int(count)
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+class Registry:
+    """Holds metrics plus callbacks that produce gauge lines at scrape time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+provider_call_seconds = registry.register(Histogram(
+    'dashboard_provider_call_seconds', 'Latency of provider method calls that reach the cloud APIs',
+    ('provider', 'method')
+))
+provider_calls_total = registry.register(Counter(
+    'dashboard_provider_calls_total', 'Provider method calls that reach the cloud APIs, by outcome',
+    ('provider', 'method', 'outcome')
+))
+client_build_seconds = registry.register(Histogram(
+    'dashboard_client_build_seconds', 'Time to build pooled SDK clients and resolve credentials',
+    ('provider', 'client')
+))
+http_request_seconds = registry.register(Histogram(
+    'dashboard_http_request_seconds', 'Latency of API requests',
+    ('route', 'method', 'status')
+))
+response_encode_seconds = registry.register(Histogram(
+    'dashboard_response_encode_seconds', 'Time spent serializing and compressing responses'
+))
+upstream_requests_total = registry.register(Counter(
+    'dashboard_upstream_requests_total', 'Requests sent to cloud APIs (each page counts)',
+    ('api',)
+))
+bytes_scanned_total = registry.register(Counter(
+    'dashboard_bigquery_bytes_processed_total', 'Bytes processed by BigQuery billing queries',
+    ('dataset',)
+))
+
+def count_upstream(api: str, requests: int = 1):
+    upstream_requests_total.inc(api, amount=requests)
+
+def _cache_lines() -> List[str]:
+    stats = dict(result_cache.stats)
+    lines = [
+        "# HELP dashboard_cache_events_total Result cache lookups by outcome",
+        "# TYPE dashboard_cache_events_total counter",
+    ]
+    lines.extend(f'dashboard_cache_events_total{{event="{event}"}} {count}' for event, count in sorted(stats.items()))
+    lookups = stats['hits'] + stats['stale'] + stats['misses']
+    served = stats['hits'] + stats['stale']
+    lines.extend([
+        "# HELP dashboard_cache_hit_ratio Share of result cache lookups answered from memory (fresh or stale)",
+        "# TYPE dashboard_cache_hit_ratio gauge",
+        f"dashboard_cache_hit_ratio {served / lookups if lookups else 0.0}",
+    ])
+    return lines
+
+registry.collectors.append(_cache_lines)
+
+# Per-request timings for the optional Server-Timing header (same thread only)
+_request_timings = threading.local()
+
+def start_request_timing():
+    _request_timings.entries = []
+
+def record_timing(name: str, seconds: float):
+    entries = getattr(_request_timings, 'entries', None)
+    if entries is not None:
+        entries.append((name, seconds))
+
+def server_timing_header(total_seconds: float) -> str:
+    """Server-Timing value: total plus every provider/encode span recorded on this thread"""
+    entries = getattr(_request_timings, 'entries', None) or []
+    parts = [f"{name.replace('.', '-')};dur={seconds * 1000:.1f}" for name, seconds in entries]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    _request_timings.entries = None
+    return ', '.join(parts)
+
+def timed(func: Callable) -> Callable:
+    """Record latency and outcome of a provider method"""
+    if getattr(func, '__timed__', False):
+        return func
+    method = func.__name__
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = func(self, *args, **kwargs)
+            outcome = 'error' if is_error_result(result) else 'ok'
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            provider_call_seconds.observe(elapsed, self.name, method)
+            provider_calls_total.inc(self.name, method, outcome)
+            record_timing(f"{self.name}.{method}", elapsed)
+
+    wrapper.__timed__ = True
+    return wrapper
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,198 @@
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+from services.cloud_factory import CloudProviderFactory
+from services.concurrency import fan_out
+
+METRICS_COLLECTOR_ENABLED = os.getenv("METRICS_COLLECTOR", "true").lower() == "true"
+METRICS_POLL_SECONDS = float(os.getenv("METRICS_POLL_SECONDS", "30"))
+# Samples kept per metric (720 x 30s = 6 hours)
+METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", "720"))
+# A provider's samples are ignored (and the provider queried directly) once the newest is this many intervals old
+METRICS_STALE_INTERVALS = float(os.getenv("METRICS_STALE_INTERVALS", "3"))
+
+# Timeseries buckets match the providers': multiples of 60s, at most MAX_CHART_POINTS per chart
+TIMESERIES_MIN_BUCKET_SECONDS = 60
+MAX_CHART_POINTS = 240
+
+# Live-metric fields that make up each timeseries type (providers may narrow this via timeseries_fields)
+TIMESERIES_FIELDS = {
+    'cpu': ('cpu_percent',),
+    'traffic': ('mbps_in', 'mbps_out'),
+    'disk': ('disk_read_mbps', 'disk_write_mbps'),
+}
+
+class RingBuffer:
+    """Fixed-capacity circular buffer of floats backed by array('d')"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array('d', [math.nan]) * capacity
+        self._head = 0
+        self._count = 0
+
+    def append(self, value: float):
+        self._data[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def values(self) -> List[float]:
+        """Contents from oldest to newest"""
+        if self._count < self.capacity:
+            return self._data[:self._count].tolist()
+        return (self._data[self._head:] + self._data[:self._head]).tolist()
+
+    def __len__(self):
+        return self._count
+
+class MetricSeries:
+    """Aligned ring buffers for one provider: a timestamp column plus one column per metric"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = RingBuffer(capacity)
+        self.columns: Dict[str, RingBuffer] = {}
+        self.latest: Optional[Dict[str, Any]] = None
+        self.latest_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, ts: float, sample: Dict[str, Any]):
+        numeric = {k: float(v) for k, v in sample.items()
+                   if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        with self._lock:
+            for name in numeric:
+                if name not in self.columns:
+                    # Back-fill so every column stays aligned with the timestamps
+                    column = RingBuffer(self.capacity)
+                    for _ in range(len(self.timestamps)):
+                        column.append(math.nan)
+                    self.columns[name] = column
+            self.timestamps.append(ts)
+            for name, column in self.columns.items():
+                column.append(numeric.get(name, math.nan))
+            self.latest = sample
+            self.latest_at = ts
+
+    def window(self, fields, since: float) -> Dict[str, List]:
+        """Timestamps and the requested columns for samples at or after `since`"""
+        with self._lock:
+            timestamps = self.timestamps.values()
+            start = bisect_left(timestamps, since)
+            result = {'ts': timestamps[start:]}
+            for name in fields:
+                column = self.columns.get(name)
+                values = column.values()[start:] if column is not None else [math.nan] * len(result['ts'])
+                result[name] = values
+        return result
+
+class MetricsCollector:
+    """
+    Polls get_live_metrics() for every configured provider on a fixed interval
+    and keeps the samples in memory, so live and timeseries routes never wait
+    on Cloud Monitoring / CloudWatch / Azure Monitor.
+    """
+
+    def __init__(self, auth_manager, interval: float = METRICS_POLL_SECONDS, capacity: int = METRICS_BUFFER_SIZE):
+        self.auth_manager = auth_manager
+        self.interval = interval
+        self.capacity = capacity
+        self.series: Dict[str, MetricSeries] = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start the polling thread once (no-op when disabled or already running)"""
+        if self._thread is not None or not METRICS_COLLECTOR_ENABLED:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="metrics-collector", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.collect()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def collect(self):
+        """Take one sample from every configured provider concurrently"""
+        providers = [p['name'] for p in self.auth_manager.get_active_providers()]
+
+        def live_metrics(provider):
+            return lambda: CloudProviderFactory.get(provider, self.auth_manager.get_config(provider)).get_live_metrics()
+
+        results = fan_out({p: live_metrics(p) for p in providers}, timeout=self.interval)
+        now = time.time()
+        for provider, result in results.items():
+            sample = result.get('value')
+            if result['status'] != 'ok' or not isinstance(sample, dict) or 'error' in sample:
+                continue
+            if provider not in self.series:
+                self.series[provider] = MetricSeries(self.capacity)
+            self.series[provider].record(now, sample)
+
+    def _fresh_series(self, provider: str) -> Optional[MetricSeries]:
+        """The provider's series, or None when it has no sample from the last METRICS_STALE_INTERVALS polls"""
+        series = self.series.get(provider.lower())
+        if series is None or series.latest_at is None:
+            return None
+        if time.time() - series.latest_at > self.interval * METRICS_STALE_INTERVALS:
+            return None
+        return series
+
+    def latest(self, provider: str) -> Optional[Dict[str, Any]]:
+        """Most recent live-metrics sample, or None if there is no recent one (stalled or failing collector)"""
+        series = self._fresh_series(provider)
+        return series.latest if series is not None else None
+
+    def timeseries(self, provider: str, metric_type: str, minutes: int) -> Optional[Dict[str, Any]]:
+        """
+        Timeseries for the last `minutes` from the ring buffers, in the
+        provider's shape: its fields for `metric_type`, samples averaged into
+        the same chart buckets, gaps as None. None when the buffers are stale
+        or do not reach back over the whole window.
+        """
+        provider = provider.lower()
+        series = self._fresh_series(provider)
+        if series is None:
+            return None
+        try:
+            fields = CloudProviderFactory.resolve(provider).timeseries_fields.get(metric_type)
+        except ValueError:
+            fields = TIMESERIES_FIELDS.get(metric_type)
+        if fields is None or not all(f in series.columns for f in fields):
+            return None
+
+        bucket = max(TIMESERIES_MIN_BUCKET_SECONDS, -(-minutes * 60 // MAX_CHART_POINTS // 60) * 60)
+        since = time.time() - minutes * 60
+        data = series.window(fields, since)
+        if not data['ts'] or data['ts'][0] > since + bucket:
+            return None
+
+        # Mean per bucket; a bucket where a field has no sample is a gap
+        sums: Dict[float, Dict[str, List[float]]] = {}
+        for i, ts in enumerate(data['ts']):
+            point = sums.setdefault(ts // bucket * bucket, {})
+            for name in fields:
+                value = data[name][i]
+                if not math.isnan(value):
+                    point.setdefault(name, []).append(value)
+        starts = sorted(sums)
+        result = {'ts': [datetime.fromtimestamp(t, timezone.utc).isoformat() for t in starts]}
+        for name in fields:
+            digits = 3 if 'mbps' in name else 2
+            result[name] = [
+                round(sum(sums[t][name]) / len(sums[t][name]), digits) if sums[t].get(name) else None
+                for t in starts
+            ]
+        return result
@@ -0,0 +1,212 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import List, Dict, Any, Iterator, Tuple
+from services.auth_manager import ACCOUNT_KEYS
+from services.base_provider import BaseCloudProvider
+from services.cache import is_error_result
+
+# Accounts queried at once across all multi-account providers
+ACCOUNT_WORKERS = int(os.getenv("ACCOUNT_WORKERS", "8"))
+TOP_INSTANCES = 5
+
+# Live metric fields averaged across accounts (weighted by instance count) or summed
+MEAN_FIELDS = ('cpu_percent', 'cpu_p50')
+SUMMED_FIELDS = ('instances_monitored',)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_account_executor() -> ThreadPoolExecutor:
+    """Bounded pool for per-account fan-out (separate from the request fan-out pool)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=ACCOUNT_WORKERS, thread_name_prefix="account")
+    return _executor
+
+def _is_rate_field(field: str) -> bool:
+    """Throughput columns add up across accounts; percentages are averaged"""
+    return 'mbps' in field
+
+class MultiAccountProvider(BaseCloudProvider):
+    """
+    One provider over several accounts/projects/subscriptions. Each account
+    is a regular shared provider instance (own cache entries, deadline and
+    circuit breaker, shared credentials); this class queries them through a
+    bounded pool and merges the results, keeping a per-account breakdown.
+    """
+
+    name = 'multi'
+
+    # The per-account instances already cache, time and guard their calls
+    cached_methods = ()
+    timed_methods = ()
+
+    def __init__(self, provider: str, config: Dict, children: List[BaseCloudProvider]):
+        self.name = provider
+        self.children = children
+        super().__init__(config)
+
+    def _validate_config(self):
+        if not self.children:
+            raise ValueError(f"{self.name}: no accounts configured")
+
+    def _account(self, child: BaseCloudProvider) -> str:
+        return str(child.config.get(ACCOUNT_KEYS.get(self.name), child.fingerprint))
+
+    def _each(self, method: str, *args, **kwargs) -> List[Tuple[str, Any, Exception]]:
+        """Call `method` on every account concurrently: [(account, value, error)]"""
+        executor = get_account_executor()
+        futures = [
+            (self._account(child), executor.submit(getattr(child, method), *args, **kwargs))
+            for child in self.children
+        ]
+        results = []
+        for account, future in futures:
+            try:
+                value = future.result()
+            except Exception as e:
+                results.append((account, None, e))
+                continue
+            if is_error_result(value):
+                message = value[0]['error'] if isinstance(value, list) else value['error']
+                results.append((account, None, RuntimeError(message)))
+            else:
+                results.append((account, value, None))
+        return results
+
+    def _warn(self, method: str, failures: List[Tuple[str, Any, Exception]]):
+        for account, _, error in failures:
+            print(f"⚠ {self.name} {method} failed for account {account}: {error}")
+
+    def get_mtd_costs(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        """MTD rows of every account, tagged with 'account'; accounts that fail are logged and left out"""
+        results = self._each('get_mtd_costs', *args, **kwargs)
+        failures = [r for r in results if r[2] is not None]
+        if len(failures) == len(results):
+            return [{'error': "; ".join(f"{account}: {error}" for account, _, error in failures)}]
+        self._warn('get_mtd_costs', failures)
+        rows = [{**row, 'account': account} for account, value, _ in results if value is not None for row in value]
+        return sorted(rows, key=lambda x: x.get('cost', 0), reverse=True)
+
+    def get_mtd_total(self) -> float:
+        """Sum of the accounts' MTD totals (accounts that fail are logged and left out)"""
+        results = self._each('get_mtd_total')
+        failures = [r for r in results if r[2] is not None]
+        if len(failures) == len(results):
+            raise failures[0][2]
+        self._warn('get_mtd_total', failures)
+        return round(sum(value for _, value, error in results if error is None), 2)
+
+    def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Daily totals across accounts, with each day's per-account costs under 'accounts'"""
+        results = self._each('get_daily_costs', days)
+        failures = [r for r in results if r[2] is not None]
+        if len(failures) == len(results):
+            return [{'error': "; ".join(f"{account}: {error}" for account, _, error in failures)}]
+        self._warn('get_daily_costs', failures)
+
+        by_day: Dict[str, Dict[str, float]] = {}
+        for account, value, error in results:
+            for row in value or []:
+                by_day.setdefault(row['date'], {})[account] = row['cost']
+        return [
+            {'date': day, 'cost': round(sum(accounts.values()), 2), 'accounts': accounts}
+            for day, accounts in sorted(by_day.items())
+        ]
+
+    def get_cost_records(self, days: int = 31) -> List[Dict[str, Any]]:
+        """Cost records of every account; accounts that fail are logged and left out"""
+        results = self._each('get_cost_records', days)
+        failures = [r for r in results if r[2] is not None]
+        if len(failures) == len(results):
+            raise failures[0][2]
+        self._warn('get_cost_records', failures)
+        return [
+            {**row, 'account': row.get('account') or account}
+            for account, value, _ in results if value is not None for row in value
+        ]
+
+    def export_line_items(self, start: date, end: date, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Line items of one account after another, so only one upstream page is held at a time"""
+        for child in self.children:
+            account = self._account(child)
+            for row in child.export_line_items(start, end, page_size):
+                row.setdefault('account', account)
+                yield row
+
+    def get_live_metrics(self) -> Dict[str, Any]:
+        """
+        Fleet-wide live metrics over the fields the accounts actually report:
+        CPU mean and p50 weighted by each account's instance count, other
+        percentiles and counts as the highest account value, throughput and
+        instances summed. Per-account figures are kept under 'accounts'.
+        """
+        results = self._each('get_live_metrics')
+        live = [(account, value) for account, value, error in results if error is None]
+        if not live:
+            return {'error': "; ".join(f"{account}: {error}" for account, _, error in results)}
+        self._warn('get_live_metrics', [r for r in results if r[2] is not None])
+
+        def weighted(field):
+            # Only accounts reporting the field count, so a missing value is not read as 0
+            reported = [(v[field], max(v.get('instances_monitored', 0), 0)) for _, v in live if v.get(field) is not None]
+            total = sum(w for _, w in reported)
+            if total == 0:
+                return round(sum(x for x, _ in reported) / len(reported), 1)
+            return round(sum(x * w for x, w in reported) / total, 1)
+
+        merged: Dict[str, Any] = {}
+        fields = dict.fromkeys(k for _, value in live for k in value if k not in ('top_instances', 'error'))
+        for field in fields:
+            values = [value[field] for _, value in live if value.get(field) is not None]
+            if not values:
+                merged[field] = None
+            elif field in MEAN_FIELDS:
+                merged[field] = weighted(field)
+            elif _is_rate_field(field):
+                merged[field] = round(sum(values), 3)
+            elif field in SUMMED_FIELDS:
+                merged[field] = sum(values)
+            else:
+                # Percentiles, maxima, region counts and timestamps: highest account value
+                merged[field] = max(values)
+
+        top = [{**row, 'account': account} for account, value in live for row in value.get('top_instances', [])]
+        top.sort(key=lambda row: row.get('mean', 0), reverse=True)
+        merged['top_instances'] = top[:TOP_INSTANCES]
+        merged['accounts'] = {
+            account: {k: v for k, v in value.items() if k != 'top_instances'}
+            for account, value in live
+        }
+        return merged
+
+    def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
+        """Timeseries merged on timestamps: throughput columns summed, percentages averaged"""
+        results = self._each('get_timeseries', metric_type, minutes)
+        series = [value for _, value, error in results if error is None]
+        if not series:
+            return {'error': "; ".join(f"{account}: {error}" for account, _, error in results)}
+
+        fields = list(dict.fromkeys(k for s in series for k in s if k != 'ts'))
+        merged: Dict[str, Dict[str, List[float]]] = {}
+        for s in series:
+            for i, ts in enumerate(s.get('ts', [])):
+                point = merged.setdefault(ts, {})
+                for field in fields:
+                    column = s.get(field)
+                    if column is not None and i < len(column) and column[i] is not None:
+                        point.setdefault(field, []).append(column[i])
+
+        timestamps = sorted(merged)
+        result: Dict[str, Any] = {'ts': timestamps}
+        for field in fields:
+            combine = sum if _is_rate_field(field) else (lambda v: sum(v) / len(v))
+            result[field] = [
+                round(combine(merged[ts][field]), 3) if merged[ts].get(field) else None
+                for ts in timestamps
+            ]
+        return result
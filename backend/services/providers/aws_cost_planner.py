@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Any, Optional, Sequence, Tuple
+from services.instrumentation import count_upstream
+
+# How long a fetched Cost Explorer result may answer later queries
+CE_MEMO_SECONDS = int(os.getenv("AWS_CE_MEMO_SECONDS", "900"))
+CE_MEMO_MAX_ENTRIES = 32
+
+# Cost Explorer accepts at most two GroupBy keys per request
+MAX_GROUP_BY = 2
+
+DIMENSIONS = {
+    'service': 'SERVICE',
+    'account': 'LINKED_ACCOUNT',
+    'region': 'REGION',
+    'usage_type': 'USAGE_TYPE',
+    'instance_type': 'INSTANCE_TYPE',
+}
+
+def group_by_clause(breakdown: str) -> Dict[str, str]:
+    """GroupBy entry for a breakdown name ('service', 'account', 'region', 'tag:<key>', ...)"""
+    if breakdown.startswith('tag:'):
+        return {'Type': 'TAG', 'Key': breakdown[4:]}
+    if breakdown not in DIMENSIONS:
+        raise ValueError(f"Unsupported AWS cost breakdown: {breakdown}")
+    return {'Type': 'DIMENSION', 'Key': DIMENSIONS[breakdown]}
+
+def plan(breakdowns: Sequence[str]) -> List[Tuple[str, ...]]:
+    """Pack breakdowns into the fewest GetCostAndUsage calls (two GroupBy keys each)"""
+    unique = list(dict.fromkeys(breakdowns))
+    return [tuple(unique[i:i + MAX_GROUP_BY]) for i in range(0, len(unique), MAX_GROUP_BY)] or [()]
+
+class _Fetch:
+    """Rows of one DAILY GetCostAndUsage call: (day, group values, cost)"""
+
+    def __init__(self, start: date, end: date, keys: Tuple[str, ...], rows: List[tuple]):
+        self.start = start
+        self.end = end
+        self.keys = keys
+        self.rows = rows
+        self.fetched_at = time.time()
+
+    def covers(self, start: date, end: date, breakdown: Optional[str]) -> bool:
+        return (
+            self.start <= start and end <= self.end
+            and (breakdown is None or breakdown in self.keys)
+            and time.time() - self.fetched_at < CE_MEMO_SECONDS
+        )
+
+class CostExplorerPlanner:
+    """
+    Plans and memoizes Cost Explorer queries for one account.
+
+    Every call is made at DAILY granularity and grouped by up to two of the
+    configured breakdowns, then memoized by time period. A later query for
+    any sub-period, any of those breakdowns, the per-day trend or the plain
+    total is answered from memory, so MTD, daily and summary views share one
+    paid request. NextPageToken pages are always followed. With
+    `linked_account`, every request is filtered to that member account, so
+    a payer's credentials report one account's costs rather than the whole
+    organization's.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], breakdowns: Sequence[str] = ('service',),
+                 linked_account: Optional[str] = None):
+        self.client_factory = client_factory
+        self.breakdowns = list(breakdowns) or ['service']
+        self.linked_account = linked_account
+        self._fetches: List[_Fetch] = []
+        self._lock = threading.Lock()
+        # Serializes misses so concurrent views wait for, then reuse, one request
+        self._fetch_lock = threading.Lock()
+
+    def costs(self, start: date, end: date, breakdown: Optional[str] = None, daily: bool = False) -> List[Dict[str, Any]]:
+        """
+        Costs for start <= day < end, summed by `breakdown` (or overall when None)
+        and, when daily=True, per day. Rows look like {'date'?, <breakdown>?, 'cost'}.
+        """
+        if start >= end:
+            return []
+        fetch = self._find(start, end, breakdown)
+        if fetch is None:
+            with self._fetch_lock:
+                fetch = self._find(start, end, breakdown) or self._fetch_for(start, end, breakdown)
+        index = fetch.keys.index(breakdown) if breakdown is not None else None
+
+        totals: Dict[tuple, float] = {}
+        lo, hi = start.isoformat(), end.isoformat()
+        for day, values, cost in fetch.rows:
+            if lo <= day < hi:
+                key = (day if daily else None, values[index] if index is not None else None)
+                totals[key] = totals.get(key, 0.0) + cost
+
+        results = []
+        for (day, value), cost in totals.items():
+            row = {}
+            if daily:
+                row['date'] = day
+            if breakdown is not None:
+                row[breakdown] = value
+            row['cost'] = cost
+            results.append(row)
+        return results
+
+    def records(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """
+        Daily rows for start <= day < end grouped by the first planned pair of
+        breakdowns: [{'date', <breakdown>: value, ..., 'cost'}]
+        """
+        if start >= end:
+            return []
+        keys = plan(self.breakdowns)[0]
+        fetch = self._find_keys(start, end, keys)
+        if fetch is None:
+            with self._fetch_lock:
+                fetch = self._find_keys(start, end, keys) or self._store(self._fetch(start, end, keys))
+
+        lo, hi = start.isoformat(), end.isoformat()
+        return [
+            {'date': day, **dict(zip(keys, values)), 'cost': cost}
+            for day, values, cost in fetch.rows
+            if lo <= day < hi
+        ]
+
+    def line_items(self, start: date, end: date) -> Iterator[Dict[str, Any]]:
+        """
+        Daily cost and usage by service and usage type, yielded page by page
+        as NextPageToken is followed (never memoized or held in full)
+        """
+        ce = self.client_factory()
+        request = {
+            'TimePeriod': {'Start': start.isoformat(), 'End': end.isoformat()},
+            'Granularity': 'DAILY',
+            'Metrics': ['UnblendedCost', 'UsageQuantity'],
+            'GroupBy': [group_by_clause('service'), group_by_clause('usage_type')],
+            **self._filter(),
+        }
+        while True:
+            response = ce.get_cost_and_usage(**request)
+            count_upstream('cost_explorer')
+            for result in response.get('ResultsByTime', []):
+                day = result['TimePeriod']['Start']
+                for group in result.get('Groups', []):
+                    cost, usage = group['Metrics']['UnblendedCost'], group['Metrics']['UsageQuantity']
+                    yield {
+                        'date': day,
+                        'service': group['Keys'][0],
+                        'sku': group['Keys'][1],
+                        'usage_amount': float(usage['Amount']),
+                        'usage_unit': usage.get('Unit'),
+                        'cost': float(cost['Amount']),
+                        'currency': cost.get('Unit'),
+                    }
+            token = response.get('NextPageToken')
+            if not token:
+                return
+            request['NextPageToken'] = token
+
+    def _filter(self) -> Dict[str, Any]:
+        """Filter argument scoping a request to the linked account (none when unscoped)"""
+        if not self.linked_account:
+            return {}
+        return {'Filter': {'Dimensions': {'Key': DIMENSIONS['account'], 'Values': [str(self.linked_account)]}}}
+
+    def prefetch(self, start: date, end: date, breakdowns: Sequence[str] = None):
+        """Fetch every planned call for a period up front"""
+        with self._fetch_lock:
+            for keys in plan(breakdowns or self.breakdowns):
+                if not all(self._find(start, end, k) for k in keys):
+                    self._store(self._fetch(start, end, keys))
+
+    def _find(self, start: date, end: date, breakdown: Optional[str]) -> Optional[_Fetch]:
+        with self._lock:
+            for fetch in reversed(self._fetches):
+                if fetch.covers(start, end, breakdown):
+                    return fetch
+        return None
+
+    def _find_keys(self, start: date, end: date, keys: Tuple[str, ...]) -> Optional[_Fetch]:
+        with self._lock:
+            for fetch in reversed(self._fetches):
+                if fetch.keys == keys and fetch.covers(start, end, None):
+                    return fetch
+        return None
+
+    def _fetch_for(self, start: date, end: date, breakdown: Optional[str]) -> _Fetch:
+        # Pair the requested breakdown with the next configured one so a single
+        # call also answers the breakdown most likely to be asked for next
+        wanted = ([breakdown] if breakdown else []) + self.breakdowns
+        keys = plan(wanted)[0]
+        return self._store(self._fetch(start, end, keys))
+
+    def _store(self, fetch: _Fetch) -> _Fetch:
+        with self._lock:
+            now = time.time()
+            self._fetches = [f for f in self._fetches if now - f.fetched_at < CE_MEMO_SECONDS]
+            self._fetches.append(fetch)
+            del self._fetches[:-CE_MEMO_MAX_ENTRIES]
+        return fetch
+
+    def _fetch(self, start: date, end: date, keys: Tuple[str, ...]) -> _Fetch:
+        ce = self.client_factory()
+        request = {
+            'TimePeriod': {'Start': start.isoformat(), 'End': end.isoformat()},
+            'Granularity': 'DAILY',
+            'Metrics': ['UnblendedCost'],
+            **self._filter(),
+        }
+        if keys:
+            request['GroupBy'] = [group_by_clause(k) for k in keys]
+
+        rows = []
+        while True:
+            response = ce.get_cost_and_usage(**request)
+            count_upstream('cost_explorer')
+            for result in response.get('ResultsByTime', []):
+                day = result['TimePeriod']['Start']
+                if keys:
+                    for group in result.get('Groups', []):
+                        rows.append((day, tuple(group['Keys']), float(group['Metrics']['UnblendedCost']['Amount'])))
+                else:
+                    rows.append((day, (), float(result['Total']['UnblendedCost']['Amount'])))
+            token = response.get('NextPageToken')
+            if not token:
+                return _Fetch(start, end, keys, rows)
+            request['NextPageToken'] = token
@@ -1,118 +1,330 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from services.base_provider import BaseCloudProvider
-from datetime import datetime, timedelta
+from services.daily_store import daily_store
+from services.aggregation import summarize, top_n
+from services.instrumentation import count_upstream
+from services.resilience import SDK_CONNECT_TIMEOUT_SECONDS, provider_deadline
+from services.providers.aws_cost_planner import CostExplorerPlanner
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 
 try:
     import boto3
+    from botocore.config import Config
+    from botocore.credentials import RefreshableCredentials
+    from botocore.session import get_session as get_botocore_session
     from botocore.exceptions import ClientError, NoCredentialsError
     AWS_AVAILABLE = True
 except ImportError:
     AWS_AVAILABLE = False
 
+# Shared HTTP connection pool per client; boto3 clients are thread-safe
+CLIENT_MAX_POOL_CONNECTIONS = 20
+
+# CloudWatch: live window period, max points per chart and busiest instances reported
+LIVE_PERIOD_SECONDS = 300
+MAX_CHART_POINTS = 240
+TOP_INSTANCES = 5
+BYTES_TO_MEGABITS = 8 / 1e6
+
+TIMESERIES_FIELDS = {
+    'cpu': ('cpu_percent',),
+    'traffic': ('mbps_in', 'mbps_out'),
+    'disk': ('disk_read_mbps', 'disk_write_mbps'),
+}
+
 class AWSProvider(BaseCloudProvider):
     
+    name = 'aws'
+    timeseries_fields = TIMESERIES_FIELDS
+    
     def _validate_config(self):
         if not AWS_AVAILABLE:
             raise ImportError("AWS SDK not installed. Run: pip install boto3")
         if 'account_id' not in self.config:
             raise ValueError("AWS account_id required")
     
-    def _get_session(self):
-        """Create boto3 session with optional profile"""
+    def _base_session(self):
+        """boto3 session for the configured profile, shared by every account"""
         profile = self.config.get('use_profile')
-        if profile:
-            return boto3.Session(profile_name=profile)
-        return boto3.Session()  # Use default credentials
+        def build():
+            if profile:
+                return boto3.Session(profile_name=profile)
+            return boto3.Session()  # Use default credentials
+        return self._shared_client(('session', profile), build)
     
-    def get_mtd_costs(self) -> List[Dict[str, Any]]:
-        """Get MTD costs using AWS Cost Explorer"""
-        try:
-            session = self._get_session()
-            ce = session.client('ce', region_name=self.config.get('region', 'us-east-1'))
+    def _get_session(self):
+        """Get the pooled boto3 session, assuming `role_name` in this account when configured"""
+        role_name = self.config.get('role_name')
+        if not role_name:
+            if self.config.get('linked_account_filter') and not self.config.get('own_credentials'):
+                # The shared session belongs to another account: its metrics would be reported here
+                raise ValueError(
+                    f"AWS account {self.config['account_id']} has no role_name to assume "
+                    f"and no use_profile of its own"
+                )
+            return self._base_session()
+        
+        def build():
+            role_arn = f"arn:aws:iam::{self.config['account_id']}:role/{role_name}"
+            sts = self._base_session().client('sts')
             
-            now = datetime.now()
-            start = now.replace(day=1).strftime('%Y-%m-%d')
-            end = now.strftime('%Y-%m-%d')
+            def assume():
+                credentials = sts.assume_role(RoleArn=role_arn, RoleSessionName="cloud-dashboard")['Credentials']
+                return {
+                    'access_key': credentials['AccessKeyId'],
+                    'secret_key': credentials['SecretAccessKey'],
+                    'token': credentials['SessionToken'],
+                    'expiry_time': credentials['Expiration'].isoformat(),
+                }
             
-            response = ce.get_cost_and_usage(
-                TimePeriod={'Start': start, 'End': end},
-                Granularity='MONTHLY',
-                Metrics=['UnblendedCost'],
-                GroupBy=[
-                    {'Type': 'DIMENSION', 'Key': 'SERVICE'},
-                ]
+            botocore_session = get_botocore_session()
+            botocore_session._credentials = RefreshableCredentials.create_from_metadata(
+                metadata=assume(), refresh_using=assume, method='sts-assume-role'
             )
-            
-            results = []
-            for result in response.get('ResultsByTime', []):
-                for group in result.get('Groups', []):
-                    results.append({
-                        'service': group['Keys'][0],
-                        'cost': float(group['Metrics']['UnblendedCost']['Amount'])
-                    })
-            
+            return boto3.Session(botocore_session=botocore_session)
+        return self._client('session', build)
+    
+    def _get_client(self, service: str, region: str = None):
+        """Get a pooled boto3 client for a service/region"""
+        region = region or self.config.get('region', 'us-east-1')
+        return self._client(
+            f'{service}:{region}',
+            lambda: self._get_session().client(
+                service,
+                region_name=region,
+                config=Config(
+                    max_pool_connections=CLIENT_MAX_POOL_CONNECTIONS,
+                    connect_timeout=SDK_CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=provider_deadline(self.name),
+                    # Throttling is retried with backoff inside the deadline by services.resilience
+                    retries={'mode': 'standard', 'total_max_attempts': 1}
+                )
+            )
+        )
+    
+    def refresh_credentials(self):
+        """Resolve credentials now so botocore refreshes them off the request path"""
+        credentials = self._get_session().get_credentials()
+        if credentials is not None:
+            credentials.get_frozen_credentials()
+    
+    def _cost_planner(self) -> CostExplorerPlanner:
+        """Pooled Cost Explorer planner shared by the MTD, daily and summary views"""
+        return self._client('ce_planner', lambda: CostExplorerPlanner(
+            lambda: self._get_client('ce'),
+            self.config.get('cost_breakdowns') or ['service'],
+            linked_account=self.config['account_id'] if self.config.get('linked_account_filter') else None
+        ))
+    
+    def _mtd_period(self):
+        """Month start through today in UTC, Cost Explorer's day boundary (End is exclusive, so today's partial costs are included)"""
+        today = datetime.now(timezone.utc).date()
+        return today.replace(day=1), today + timedelta(days=1)
+    
+    def get_mtd_costs(self, breakdown: str = 'service') -> List[Dict[str, Any]]:
+        """Get MTD costs using AWS Cost Explorer"""
+        try:
+            start, end = self._mtd_period()
+            results = self._cost_planner().costs(start, end, breakdown)
+            for row in results:
+                row['cost'] = round(row['cost'], 2)
             return sorted(results, key=lambda x: x['cost'], reverse=True)
         except Exception as e:
             return [{'error': str(e)}]
     
+    def get_mtd_total(self) -> float:
+        """Get the MTD total from the same Cost Explorer fetch as the breakdowns"""
+        start, end = self._mtd_period()
+        return sum(row['cost'] for row in self._cost_planner().costs(start, end))
+    
     def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
-        """Get daily cost trend"""
+        """Get daily cost trend, served from the local store for settled days"""
         try:
-            session = self._get_session()
-            ce = session.client('ce', region_name=self.config.get('region', 'us-east-1'))
-            
-            end = datetime.now()
-            start = end - timedelta(days=days)
-            
-            response = ce.get_cost_and_usage(
-                TimePeriod={
-                    'Start': start.strftime('%Y-%m-%d'),
-                    'End': end.strftime('%Y-%m-%d')
-                },
-                Granularity='DAILY',
-                Metrics=['UnblendedCost']
-            )
-            
-            return [
-                {
-                    'date': item['TimePeriod']['Start'],
-                    'cost': float(item['Total']['UnblendedCost']['Amount'])
-                }
-                for item in response.get('ResultsByTime', [])
-            ]
+            return daily_store.get_daily_costs(self, days, self._fetch_daily_range)
         except Exception as e:
             return [{'error': str(e)}]
     
+    def _fetch_daily_range(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """Get daily costs with start <= date < end via the Cost Explorer planner"""
+        planner = self._cost_planner()
+        # Widen to the month start so the same fetch also answers the MTD views
+        month_start, _ = self._mtd_period()
+        planner.prefetch(min(start, month_start), end, planner.breakdowns[:2])
+        rows = planner.costs(start, end, daily=True)
+        return sorted(rows, key=lambda x: x['date'])
+    
+    def get_cost_records(self, days: int = 31) -> List[Dict[str, Any]]:
+        """Daily cost records grouped by the first two configured breakdowns"""
+        end = datetime.now(timezone.utc).date() + timedelta(days=1)
+        records = []
+        for row in self._cost_planner().records(end - timedelta(days=days + 1), end):
+            record = {'date': row['date'], 'account': self.config['account_id'], 'cost': row['cost']}
+            for breakdown, value in row.items():
+                if breakdown in ('service', 'account', 'region'):
+                    record[breakdown] = value
+                elif breakdown.startswith('tag:'):
+                    # Cost Explorer reports tag groups as "<key>$<value>"
+                    record['tag'] = f"{breakdown[4:]}={value.partition('$')[2]}"
+            records.append(record)
+        return records
+    
+    def export_line_items(self, start: date, end: date, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Stream daily cost and usage by service and usage type, following NextPageToken"""
+        for row in self._cost_planner().line_items(start, end):
+            row['account'] = self.config['account_id']
+            yield row
+    
+    def _regions(self) -> List[str]:
+        return self.config.get('regions') or [self.config.get('region', 'us-east-1')]
+    
+    def _region_pool(self) -> ThreadPoolExecutor:
+        """Pooled executor for per-region fan-out (separate from the request pool)"""
+        return self._client('region_pool', lambda: ThreadPoolExecutor(
+            max_workers=max(1, min(len(self._regions()), 8)),
+            thread_name_prefix="aws-region"
+        ))
+    
+    def _for_each_region(self, fn) -> Dict[str, Any]:
+        """Run fn(region) for every configured region concurrently"""
+        regions = self._regions()
+        if len(regions) == 1:
+            return {regions[0]: fn(regions[0])}
+        futures = {region: self._region_pool().submit(fn, region) for region in regions}
+        return {region: future.result() for region, future in futures.items()}
+    
+    def _get_metric_data(self, region: str, queries: List[Dict], start: datetime, end: datetime) -> Dict[str, Dict]:
+        """
+        Run one batched GetMetricData request, following NextToken.
+        Returns {query id: {label: (timestamps, values)}} with points oldest first;
+        SEARCH expressions yield one label per matching instance.
+        """
+        cloudwatch = self._get_client('cloudwatch', region)
+        results: Dict[str, Dict] = {}
+        kwargs = {
+            'MetricDataQueries': queries,
+            'StartTime': start,
+            'EndTime': end,
+            'ScanBy': 'TimestampAscending',
+        }
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            count_upstream('cloudwatch')
+            for result in response.get('MetricDataResults', []):
+                timestamps, values = results.setdefault(result['Id'], {}).setdefault(result.get('Label', ''), ([], []))
+                timestamps.extend(t.timestamp() for t in result.get('Timestamps', []))
+                values.extend(result.get('Values', []))
+            token = response.get('NextToken')
+            if not token:
+                return results
+            kwargs['NextToken'] = token
+    
+    def _fleet_queries(self, period: int, per_instance_cpu: bool) -> List[Dict]:
+        """Metric math over every EC2 instance: CPU plus summed network and disk bytes"""
+        def search(metric, stat):
+            return f"SEARCH('{{AWS/EC2,InstanceId}} MetricName=\"{metric}\"', '{stat}', {period})"
+        
+        queries = [
+            {'Id': 'net_in', 'Expression': f"SUM({search('NetworkIn', 'Sum')})", 'Label': 'net_in'},
+            {'Id': 'net_out', 'Expression': f"SUM({search('NetworkOut', 'Sum')})", 'Label': 'net_out'},
+            {'Id': 'disk_read', 'Expression': f"SUM({search('EBSReadBytes', 'Sum')})", 'Label': 'disk_read'},
+            {'Id': 'disk_write', 'Expression': f"SUM({search('EBSWriteBytes', 'Sum')})", 'Label': 'disk_write'},
+        ]
+        if per_instance_cpu:
+            queries.append({
+                'Id': 'cpu',
+                'Expression': search('CPUUtilization', 'Average'),
+                'Label': "${PROP('Dim.InstanceId')}"  # one labelled series per instance
+            })
+        else:
+            queries.append({'Id': 'cpu_avg', 'Expression': f"AVG({search('CPUUtilization', 'Average')})", 'Label': 'cpu_avg'})
+            queries.append({'Id': 'cpu_sum', 'Expression': f"SUM({search('CPUUtilization', 'Average')})", 'Label': 'cpu_sum'})
+        return queries
+    
     def get_live_metrics(self) -> Dict[str, Any]:
-        """Get live EC2 metrics from CloudWatch"""
+        """Get live EC2 metrics from CloudWatch: one GetMetricData call per region"""
         try:
-            session = self._get_session()
-            cloudwatch = session.client('cloudwatch', region_name=self.config.get('region', 'us-east-1'))
-            
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(minutes=5)
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(seconds=LIVE_PERIOD_SECONDS * 2)
+            queries = self._fleet_queries(LIVE_PERIOD_SECONDS, per_instance_cpu=True)
+            by_region = self._for_each_region(lambda region: self._get_metric_data(region, queries, start, end))
             
-            response = cloudwatch.get_metric_statistics(
-                Namespace='AWS/EC2',
-                MetricName='CPUUtilization',
-                StartTime=start_time,
-                EndTime=end_time,
-                Period=300,
-                Statistics=['Average']
-            )
+            def latest(series):
+                return series[1][-1] if series[1] else 0.0
             
-            cpu_avg = 0.0
-            if response['Datapoints']:
-                cpu_avg = sum(p['Average'] for p in response['Datapoints']) / len(response['Datapoints'])
+            instances, cpu_vals = [], []
+            totals = {'net_in': 0.0, 'net_out': 0.0, 'disk_read': 0.0, 'disk_write': 0.0}
+            for region, data in by_region.items():
+                for label, series in data.get('cpu', {}).items():
+                    if series[1]:
+                        instances.append(label)
+                        cpu_vals.append(latest(series))
+                for key in totals:
+                    totals[key] += sum(latest(series) for series in data.get(key, {}).values())
             
+            cpu = summarize(cpu_vals)
+            to_mbps = BYTES_TO_MEGABITS / LIVE_PERIOD_SECONDS
             return {
                 'updated_at': datetime.utcnow().isoformat(),
-                'cpu_percent': round(cpu_avg, 1),
-                'instances_monitored': len(response['Datapoints'])
+                'cpu_percent': round(cpu['mean'], 1),
+                'cpu_p95': round(cpu['p95'], 1),
+                'cpu_max': round(cpu['max'], 1),
+                'mbps_in': round(totals['net_in'] * to_mbps, 3),
+                'mbps_out': round(totals['net_out'] * to_mbps, 3),
+                'disk_read_mbps': round(totals['disk_read'] * to_mbps, 3),
+                'disk_write_mbps': round(totals['disk_write'] * to_mbps, 3),
+                'instances_monitored': len(cpu_vals),
+                'regions': len(by_region),
+                'top_instances': top_n(instances, cpu_vals, TOP_INSTANCES)
             }
         except Exception as e:
             return {'error': str(e)}
     
     def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
-        """Get time series data for charts"""
-        return {"message": "AWS timeseries not yet fully implemented"}
\ No newline at end of file
+        """Get time series data for charts: one GetMetricData call per region"""
+        if metric_type not in TIMESERIES_FIELDS:
+            return {"error": "Unsupported metric type"}
+        try:
+            # Period is a multiple of 60s that keeps the chart at or under MAX_CHART_POINTS
+            period = max(60, -(-minutes * 60 // MAX_CHART_POINTS // 60) * 60)
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(minutes=minutes)
+            queries = self._fleet_queries(period, per_instance_cpu=False)
+            by_region = self._for_each_region(lambda region: self._get_metric_data(region, queries, start, end))
+            
+            # Merge regions per timestamp; CPU is weighted by each region's instance count (sum / avg)
+            buckets: Dict[float, Dict[str, float]] = {}
+            for data in by_region.values():
+                points = {key: self._points_by_time(data.get(key, {})) for key in (q['Id'] for q in queries)}
+                for key, series in points.items():
+                    for t, v in series.items():
+                        bucket = buckets.setdefault(t, {})
+                        if key == 'cpu_avg':
+                            if v:
+                                bucket['cpu_n'] = bucket.get('cpu_n', 0.0) + points['cpu_sum'].get(t, 0.0) / v
+                        else:
+                            bucket[key] = bucket.get(key, 0.0) + v
+            
+            to_mbps = BYTES_TO_MEGABITS / period
+            ts = sorted(buckets)
+            columns = {
+                'cpu_percent': [round(buckets[t].get('cpu_sum', 0.0) / buckets[t]['cpu_n'], 2) if buckets[t].get('cpu_n') else None for t in ts],
+                'mbps_in': [round(buckets[t].get('net_in', 0.0) * to_mbps, 3) for t in ts],
+                'mbps_out': [round(buckets[t].get('net_out', 0.0) * to_mbps, 3) for t in ts],
+                'disk_read_mbps': [round(buckets[t].get('disk_read', 0.0) * to_mbps, 3) for t in ts],
+                'disk_write_mbps': [round(buckets[t].get('disk_write', 0.0) * to_mbps, 3) for t in ts],
+            }
+            result = {'ts': [datetime.fromtimestamp(t, timezone.utc).isoformat() for t in ts]}
+            for field in TIMESERIES_FIELDS[metric_type]:
+                result[field] = columns[field]
+            return result
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def _points_by_time(self, series: Dict[str, tuple]) -> Dict[float, float]:
+        """Sum a query's series (one per label) into {timestamp: value}"""
+        points: Dict[float, float] = {}
+        for timestamps, values in series.values():
+            for t, v in zip(timestamps, values):
+                points[t] = points.get(t, 0.0) + v
+        return points
@@ -1,76 +1,450 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from services.base_provider import BaseCloudProvider
-from datetime import datetime, timedelta
+from services.daily_store import daily_store
+from services.aggregation import summarize, bucket_stats, top_n
+from services.instrumentation import count_upstream
+from services.resilience import SDK_CONNECT_TIMEOUT_SECONDS, provider_deadline
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+import os
+import threading
+import time
 
 try:
     from azure.identity import DefaultAzureCredential, AzureCliCredential
     from azure.mgmt.costmanagement import CostManagementClient
+    from azure.mgmt.monitor import MonitorManagementClient
+    from azure.mgmt.resource import ResourceManagementClient
+    from azure.core.rest import HttpRequest
     AZURE_AVAILABLE = True
 except ImportError:
     AZURE_AVAILABLE = False
 
+MANAGEMENT_SCOPE = "https://management.azure.com/.default"
+
+# Refresh tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 600
+
+VM_RESOURCE_TYPE = "Microsoft.Compute/virtualMachines"
+# All VM metrics of a region fetched in one subscription-scope (multi-resource) metrics call,
+# split into one series per VM by resource ID
+VM_METRICS = "Percentage CPU,Network In Total,Network Out Total,Disk Read Bytes,Disk Write Bytes"
+RESOURCE_ID_DIMENSION = "Microsoft.ResourceId"
+# VM inventory is re-listed at most this often
+VM_CACHE_SECONDS = int(os.getenv("AZURE_VM_CACHE_SECONDS", "600"))
+# Concurrent per-region metrics calls per subscription
+METRICS_CONCURRENCY = int(os.getenv("AZURE_METRICS_CONCURRENCY", "16"))
+
+LIVE_WINDOW_MINUTES = 5
+MAX_CHART_POINTS = 240
+TOP_INSTANCES = 5
+BYTES_TO_MEGABITS = 8 / 1e6
+
+# Time grains supported by Azure Monitor, in seconds
+TIME_GRAINS = [60, 300, 900, 1800, 3600, 21600, 86400]
+
+TIMESERIES_FIELDS = {
+    'cpu': ('cpu_percent',),
+    'traffic': ('mbps_in', 'mbps_out'),
+    'disk': ('disk_read_mbps', 'disk_write_mbps'),
+}
+
+class _CachedTokenCredential:
+    """
+    Wraps an azure-identity credential and caches its tokens per scope.
+    AzureCliCredential shells out to `az` on every get_token call, so the
+    cache is filled once and kept warm by refresh() from a background thread.
+    """
+    
+    def __init__(self, credential):
+        self._credential = credential
+        self._tokens = {}
+        self._lock = threading.Lock()
+    
+    def get_token(self, *scopes, **kwargs):
+        token = self._tokens.get(scopes)
+        if token is not None and token.expires_on - time.time() > TOKEN_REFRESH_MARGIN:
+            return token
+        with self._lock:
+            token = self._tokens.get(scopes)
+            if token is None or token.expires_on - time.time() <= TOKEN_REFRESH_MARGIN:
+                token = self._credential.get_token(*scopes, **kwargs)
+                self._tokens[scopes] = token
+            return token
+    
+    def refresh(self):
+        """Re-fetch any cached token that is close to expiry"""
+        for scopes in list(self._tokens) or [(MANAGEMENT_SCOPE,)]:
+            self.get_token(*scopes)
+    
+    def close(self):
+        close = getattr(self._credential, 'close', None)
+        if close:
+            close()
+
 class AzureProvider(BaseCloudProvider):
     
+    name = 'azure'
+    timeseries_fields = TIMESERIES_FIELDS
+    
+    # (listed_at, {region: VM resource ids})
+    _vm_cache = None
+    
     def _validate_config(self):
         if not AZURE_AVAILABLE:
-            raise ImportError("Azure SDK not installed. Run: pip install azure-identity azure-mgmt-costmanagement")
+            raise ImportError("Azure SDK not installed. Run: pip install azure-identity azure-mgmt-costmanagement azure-mgmt-monitor azure-mgmt-resource")
         if 'subscription_id' not in self.config:
             raise ValueError("Azure subscription_id required")
     
     def _get_credential(self):
-        """Get Azure credential using default chain or CLI"""
-        if self.config.get('use_cli_auth'):
-            return AzureCliCredential()
-        return DefaultAzureCredential()
+        """Get the pooled Azure credential (default chain or CLI)"""
+        def build():
+            if self.config.get('use_cli_auth'):
+                return _CachedTokenCredential(AzureCliCredential())
+            return _CachedTokenCredential(DefaultAzureCredential())
+        # One credential (and token cache) for every subscription in the tenant
+        return self._shared_client(('credential', self.config.get('tenant_id'), self.config.get('use_cli_auth')), build)
+    
+    def _transport_options(self) -> Dict[str, Any]:
+        """Timeouts for azure-core; throttling is retried with backoff inside the deadline by services.resilience"""
+        return {
+            'connection_timeout': SDK_CONNECT_TIMEOUT_SECONDS,
+            'read_timeout': provider_deadline(self.name),
+            'retry_total': 0,
+        }
+    
+    def _cost_client(self):
+        """Get the pooled Cost Management client"""
+        return self._client('costmanagement', lambda: CostManagementClient(
+            self._get_credential(), **self._transport_options()
+        ))
+    
+    def _monitor_client(self):
+        """Get the pooled Azure Monitor client"""
+        return self._client('monitor', lambda: MonitorManagementClient(
+            self._get_credential(), self.config['subscription_id'], **self._transport_options()
+        ))
+    
+    def _resource_client(self):
+        """Get the pooled Resource Manager client"""
+        return self._client('resource', lambda: ResourceManagementClient(
+            self._get_credential(), self.config['subscription_id'], **self._transport_options()
+        ))
+    
+    def _metrics_pool(self) -> ThreadPoolExecutor:
+        """Pooled executor bounding concurrent Azure Monitor calls"""
+        return self._client('metrics_pool', lambda: ThreadPoolExecutor(
+            max_workers=METRICS_CONCURRENCY, thread_name_prefix="azure-metrics"
+        ))
+    
+    def refresh_credentials(self):
+        """Keep the cached management token warm"""
+        self._get_credential().refresh()
+    
+    def _mtd_period(self):
+        """Month start through today (UTC, end exclusive)"""
+        today = datetime.now(timezone.utc).date()
+        return today.replace(day=1), today + timedelta(days=1)
+    
+    def _mtd_query(self, grouping: List[Dict[str, str]] = None) -> Dict[str, Any]:
+        start, end = self._mtd_period()
+        dataset = {
+            "granularity": "None",
+            "aggregation": {
+                "totalCost": {"name": "PreTaxCost", "function": "Sum"}
+            }
+        }
+        if grouping:
+            dataset["grouping"] = grouping
+        return {
+            "type": "Usage",
+            "timeframe": "Custom",
+            # Cost Management's range is inclusive
+            "time_period": {"from": start.strftime('%Y-%m-%d'), "to": (end - timedelta(days=1)).strftime('%Y-%m-%d')},
+            "dataset": dataset
+        }
     
     def get_mtd_costs(self) -> List[Dict[str, Any]]:
-        """Get MTD costs using Azure Cost Management"""
+        """Get MTD costs using Azure Cost Management (all pages of the query)"""
         try:
-            credential = self._get_credential()
-            client = CostManagementClient(credential)
-            
+            client = self._cost_client()
             scope = f"/subscriptions/{self.config['subscription_id']}"
+            query = self._mtd_query([{"type": "Dimension", "name": "ServiceName"}])
             
-            now = datetime.now()
-            start = now.replace(day=1).strftime('%Y-%m-%d')
-            end = now.strftime('%Y-%m-%d')
-            
-            query = {
-                "type": "Usage",
-                "timeframe": "Custom",
-                "time_period": {"from": start, "to": end},
-                "dataset": {
-                    "granularity": "None",
-                    "aggregation": {
-                        "totalCost": {"name": "PreTaxCost", "function": "Sum"}
-                    },
-                    "grouping": [
-                        {"type": "Dimension", "name": "ServiceName"}
-                    ]
-                }
-            }
-            
-            result = client.query.usage(scope, query)
-            costs = []
-            
-            for row in result.rows:
-                costs.append({
-                    'service': row[1],
-                    'cost': float(row[0])
-                })
+            totals: Dict[str, float] = {}
+            for columns, rows in self._query_pages(client, scope, query):
+                cost_idx = columns.index('PreTaxCost') if 'PreTaxCost' in columns else 0
+                service_idx = columns.index('ServiceName')
+                for row in rows:
+                    totals[row[service_idx]] = totals.get(row[service_idx], 0.0) + float(row[cost_idx])
             
+            costs = [{'service': service, 'cost': cost} for service, cost in totals.items()]
             return sorted(costs, key=lambda x: x['cost'], reverse=True)
         except Exception as e:
             return [{'error': str(e)}]
     
+    def get_mtd_total(self) -> float:
+        """Get the MTD total from Cost Management without grouping"""
+        client = self._cost_client()
+        scope = f"/subscriptions/{self.config['subscription_id']}"
+        
+        total = 0.0
+        for columns, rows in self._query_pages(client, scope, self._mtd_query()):
+            cost_idx = columns.index('PreTaxCost') if 'PreTaxCost' in columns else 0
+            total += sum(float(row[cost_idx]) for row in rows)
+        return total
+    
     def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
-        """Get daily cost trend"""
-        return [{'message': 'Azure daily costs not yet fully implemented'}]
+        """Get daily cost trend, served from the local store for settled days"""
+        try:
+            return daily_store.get_daily_costs(self, days, self._fetch_daily_range)
+        except Exception as e:
+            return [{'error': str(e)}]
+    
+    def _fetch_daily_range(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """Get daily costs with start <= date < end in one Daily-granularity query"""
+        client = self._cost_client()
+        scope = f"/subscriptions/{self.config['subscription_id']}"
+        
+        query = {
+            "type": "Usage",
+            "timeframe": "Custom",
+            # Cost Management's range is inclusive
+            "time_period": {"from": start.strftime('%Y-%m-%d'), "to": (end - timedelta(days=1)).strftime('%Y-%m-%d')},
+            "dataset": {
+                "granularity": "Daily",
+                "aggregation": {
+                    "totalCost": {"name": "PreTaxCost", "function": "Sum"}
+                }
+            }
+        }
+        
+        costs = []
+        for columns, rows in self._query_pages(client, scope, query):
+            cost_idx = columns.index('PreTaxCost') if 'PreTaxCost' in columns else 0
+            date_idx = columns.index('UsageDate')
+            for row in rows:
+                usage_date = str(row[date_idx])  # yyyymmdd
+                costs.append({
+                    'date': f"{usage_date[:4]}-{usage_date[4:6]}-{usage_date[6:8]}",
+                    'cost': float(row[cost_idx])
+                })
+        return costs
+    
+    def get_cost_records(self, days: int = 31) -> List[Dict[str, Any]]:
+        """Daily cost records by service and region from one Daily-granularity query (all of its pages)"""
+        client = self._cost_client()
+        scope = f"/subscriptions/{self.config['subscription_id']}"
+        end = datetime.now(timezone.utc).date()
+        
+        query = {
+            "type": "Usage",
+            "timeframe": "Custom",
+            "time_period": {"from": (end - timedelta(days=days)).strftime('%Y-%m-%d'), "to": end.strftime('%Y-%m-%d')},
+            "dataset": {
+                "granularity": "Daily",
+                "aggregation": {
+                    "totalCost": {"name": "PreTaxCost", "function": "Sum"}
+                },
+                "grouping": [
+                    {"type": "Dimension", "name": "ServiceName"},
+                    {"type": "Dimension", "name": "ResourceLocation"}
+                ]
+            }
+        }
+        
+        records = []
+        for columns, rows in self._query_pages(client, scope, query):
+            cost_idx = columns.index('PreTaxCost') if 'PreTaxCost' in columns else 0
+            date_idx = columns.index('UsageDate')
+            service_idx = columns.index('ServiceName')
+            region_idx = columns.index('ResourceLocation')
+            for row in rows:
+                usage_date = str(row[date_idx])  # yyyymmdd
+                records.append({
+                    'date': f"{usage_date[:4]}-{usage_date[4:6]}-{usage_date[6:8]}",
+                    'account': self.config['subscription_id'],
+                    'service': row[service_idx],
+                    'region': row[region_idx],
+                    'cost': float(row[cost_idx])
+                })
+        return records
+    
+    def _query_pages(self, client, scope: str, query: Dict[str, Any]) -> Iterator[tuple]:
+        """Run a Cost Management query and yield (column names, rows) per page, following nextLink"""
+        count_upstream('cost_management')
+        result = client.query.usage(scope, query)
+        columns = [column.name for column in result.columns]
+        rows, next_link = result.rows, result.next_link
+        while True:
+            yield columns, rows
+            if not next_link:
+                return
+            # The SDK does not follow nextLink for queries; request the next page directly
+            count_upstream('cost_management')
+            response = client._send_request(HttpRequest("POST", next_link, json=query))
+            response.raise_for_status()
+            page = response.json().get('properties', {})
+            columns = [column['name'] for column in page.get('columns', [])] or columns
+            rows, next_link = page.get('rows', []), page.get('nextLink')
+    
+    def export_line_items(self, start: date, end: date, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Stream daily cost and usage by service and meter, following the query's nextLink pages"""
+        client = self._cost_client()
+        scope = f"/subscriptions/{self.config['subscription_id']}"
+        
+        query = {
+            "type": "Usage",
+            "timeframe": "Custom",
+            # Cost Management's range is inclusive
+            "time_period": {"from": start.strftime('%Y-%m-%d'), "to": (end - timedelta(days=1)).strftime('%Y-%m-%d')},
+            "dataset": {
+                "granularity": "Daily",
+                "aggregation": {
+                    "totalCost": {"name": "PreTaxCost", "function": "Sum"},
+                    "totalUsage": {"name": "UsageQuantity", "function": "Sum"}
+                },
+                "grouping": [
+                    {"type": "Dimension", "name": "ServiceName"},
+                    {"type": "Dimension", "name": "Meter"}
+                ]
+            }
+        }
+        
+        for columns, rows in self._query_pages(client, scope, query):
+            for row in rows:
+                values = dict(zip(columns, row))
+                usage_date = str(values.get('UsageDate'))  # yyyymmdd
+                yield {
+                    'date': f"{usage_date[:4]}-{usage_date[4:6]}-{usage_date[6:8]}",
+                    'account': self.config['subscription_id'],
+                    'service': values.get('ServiceName'),
+                    'sku': values.get('Meter'),
+                    'usage_amount': values.get('UsageQuantity'),
+                    'cost': float(values.get('PreTaxCost') or 0.0),
+                    'currency': values.get('Currency'),
+                }
+    
+    def _list_vms(self) -> Dict[str, List[str]]:
+        """Resource IDs of all VMs in the subscription by region (cached for VM_CACHE_SECONDS)"""
+        cached = self._vm_cache
+        if cached is not None and time.time() - cached[0] < VM_CACHE_SECONDS:
+            return cached[1]
+        vms: Dict[str, List[str]] = {}
+        for resource in self._resource_client().resources.list(filter=f"resourceType eq '{VM_RESOURCE_TYPE}'"):
+            vms.setdefault(resource.location, []).append(resource.id)
+        self._vm_cache = (time.time(), vms)
+        return vms
+    
+    def _query_vm_metrics(self, minutes: int, grain_seconds: int) -> Dict[str, tuple]:
+        """
+        Fetch every VM metric with one multi-resource metrics call per region
+        (regions in parallel, bounded by METRICS_CONCURRENCY), split by resource
+        ID. Returns flat columns ready for NumPy, with missing points left out:
+        {metric name: (vm ids, epoch seconds, values)}.
+        """
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(minutes=minutes)
+        timespan = f"{start.strftime('%Y-%m-%dT%H:%M:%SZ')}/{end.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        monitor = self._monitor_client()
+        
+        def fetch(region_vms):
+            region, vm_ids = region_vms
+            count_upstream('azure_monitor')
+            return monitor.metrics.list_at_subscription_scope(
+                region=region,
+                timespan=timespan,
+                interval=timedelta(seconds=grain_seconds),
+                metricnames=VM_METRICS,
+                aggregation="Average,Total",
+                metricnamespace=VM_RESOURCE_TYPE,
+                filter=f"{RESOURCE_ID_DIMENSION} eq '*'",
+                # One series per VM and metric; the default top would keep only 10
+                top=len(vm_ids),
+            )
+        
+        columns: Dict[str, tuple] = {}
+        for response in self._metrics_pool().map(fetch, self._list_vms().items()):
+            for metric in response.value:
+                ids, times, values = columns.setdefault(metric.name.value, ([], [], []))
+                for series in metric.timeseries:
+                    resource_id = next(
+                        (m.value for m in series.metadatavalues or [] if m.name.value.lower() == RESOURCE_ID_DIMENSION.lower()),
+                        ''
+                    )
+                    vm_name = resource_id.rsplit('/', 1)[-1]
+                    for point in series.data:
+                        value = point.average if metric.name.value == "Percentage CPU" else point.total
+                        if value is None:
+                            continue
+                        ids.append(vm_name)
+                        times.append(point.time_stamp.timestamp())
+                        values.append(value)
+        return columns
     
     def get_live_metrics(self) -> Dict[str, Any]:
         """Get live VM metrics from Azure Monitor"""
-        return {'message': 'Azure live metrics not yet fully implemented'}
+        try:
+            window = LIVE_WINDOW_MINUTES * 60
+            columns = self._query_vm_metrics(LIVE_WINDOW_MINUTES, window)
+            empty = ([], [], [])
+            
+            vms, _, cpu_vals = columns.get("Percentage CPU", empty)
+            cpu = summarize(cpu_vals)
+            
+            # Metrics without a single data point are reported as missing, not as 0
+            def stat(name):
+                return round(cpu[name], 1) if cpu_vals else None
+            
+            def mbps(metric):
+                values = columns.get(metric, empty)[2]
+                return round(sum(values) * BYTES_TO_MEGABITS / window, 3) if values else None
+            
+            return {
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+                'cpu_percent': stat('mean'),
+                'cpu_p95': stat('p95'),
+                'cpu_max': stat('max'),
+                'mbps_in': mbps("Network In Total"),
+                'mbps_out': mbps("Network Out Total"),
+                'disk_read_mbps': mbps("Disk Read Bytes"),
+                'disk_write_mbps': mbps("Disk Write Bytes"),
+                'instances_monitored': len(set(vms)),
+                'top_instances': top_n(vms, cpu_vals, TOP_INSTANCES)
+            }
+        except Exception as e:
+            return {'error': str(e)}
     
     def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
-        """Get time series data"""
-        return {'message': 'Azure timeseries not yet fully implemented'}
\ No newline at end of file
+        """Get time series data across all VMs"""
+        if metric_type not in TIMESERIES_FIELDS:
+            return {"error": "Unsupported metric type"}
+        try:
+            grain_seconds = next(
+                (seconds for seconds in TIME_GRAINS if minutes * 60 / seconds <= MAX_CHART_POINTS),
+                TIME_GRAINS[-1]
+            )
+            columns = self._query_vm_metrics(minutes, grain_seconds)
+            empty = ([], [], [])
+            
+            def mbps(metric):
+                # Buckets without any data point are left out, so they read as gaps, not zeros
+                totals = bucket_stats(*columns.get(metric, empty)[1:], grain_seconds)
+                return {t: v * BYTES_TO_MEGABITS / grain_seconds for t, v in zip(totals['ts'], totals['sum'])}
+            
+            cpu = bucket_stats(*columns.get("Percentage CPU", empty)[1:], grain_seconds)
+            metrics = {
+                'cpu_percent': dict(zip(cpu['ts'], cpu['mean'])),
+                'mbps_in': mbps("Network In Total"),
+                'mbps_out': mbps("Network Out Total"),
+                'disk_read_mbps': mbps("Disk Read Bytes"),
+                'disk_write_mbps': mbps("Disk Write Bytes"),
+            }
+            
+            ts = sorted(set().union(*(metrics[field] for field in TIMESERIES_FIELDS[metric_type])))
+            result = {'ts': [datetime.fromtimestamp(t, timezone.utc).isoformat() for t in ts]}
+            for field in TIMESERIES_FIELDS[metric_type]:
+                result[field] = [round(metrics[field][t], 3) if t in metrics[field] else None for t in ts]
+            return result
+        except Exception as e:
+            return {'error': str(e)}
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+from services.instrumentation import bytes_scanned_total, count_upstream
+
+try:
+    from google.cloud import bigquery
+except ImportError:
+    bigquery = None
+
+# How long a rollup fetched from BigQuery may answer later queries
+ROLLUP_MEMO_SECONDS = int(os.getenv("BQ_ROLLUP_MEMO_SECONDS", "900"))
+ROLLUP_MEMO_MAX_ENTRIES = 8
+
+class BytesScannedLimitExceeded(RuntimeError):
+    """A billing query would scan more bytes than the configured ceiling"""
+    pass
+
+class _Rollup:
+    """Rows of one daily-by-service query: (day, project name, service, cost, project id, region)"""
+
+    def __init__(self, start: date, end: date, rows: List[Tuple[str, str, str, float, str, str]], bytes_processed: int):
+        self.start = start
+        self.end = end
+        self.rows = rows
+        self.bytes_processed = bytes_processed
+        self.fetched_at = time.time()
+
+    def covers(self, start: date, end: date) -> bool:
+        return self.start <= start and end <= self.end and time.time() - self.fetched_at < ROLLUP_MEMO_SECONDS
+
+class BillingRollup:
+    """
+    Daily-by-project-and-service rollup of the BigQuery billing export.
+
+    One parameterized query per period fills the rollup; MTD breakdowns, the
+    MTD total and daily trends are all summed from it in memory. Queries are
+    pruned by _PARTITIONTIME (rows are exported on or after their usage day)
+    and, when configured, _TABLE_SUFFIX. With `max_bytes_scanned` set, each
+    query is dry-run first and refused if it would scan more than that.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], config: Dict, timeout: float = None):
+        self.client_factory = client_factory
+        self.timeout = timeout or None
+        self.dataset = config.get('billing_dataset', 'billing_export')
+        self.table = config.get('billing_table', 'gcp_billing_export_v1_')
+        self.table_suffix = config.get('billing_table_suffix')
+        self.partition_pruning = config.get('partition_pruning', True)
+        self.max_bytes_scanned = int(config.get('max_bytes_scanned') or 0)
+        self.last_bytes_processed = 0
+        self._rollups: List[_Rollup] = []
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def rows(self, start: date, end: date, project_id: str = None) -> List[Tuple[str, str, str, float]]:
+        """
+        (day, project, service, cost) rows with start <= day < end, optionally
+        only for one project id, querying BigQuery only if no memoized rollup
+        covers the period. One rollup can serve every project in the export.
+        """
+        return [row[:4] for row in self.full_rows(start, end, project_id)]
+
+    def full_rows(self, start: date, end: date, project_id: str = None) -> List[Tuple[str, str, str, float, str, str]]:
+        """Like rows, but with project id and region: (day, project, service, cost, project id, region)"""
+        rollup = self._find(start, end)
+        if rollup is None:
+            with self._fetch_lock:
+                rollup = self._find(start, end) or self._store(self._query(start, end))
+        lo, hi = start.isoformat(), end.isoformat()
+        return [
+            row for row in rollup.rows
+            if lo <= row[0] < hi and (project_id is None or row[4] == project_id)
+        ]
+
+    def prefetch(self, start: date, end: date):
+        """Make sure a rollup covering the period is memoized"""
+        self.rows(start, end)
+
+    def line_items(self, start: date, end: date, project_id: str = None, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """
+        Raw billing export rows with start <= usage day < end, streamed page by
+        page from the query's result set (never memoized or held in full)
+        """
+        client = self.client_factory()
+        sql = self._line_items_sql(project_id)
+        job_kwargs = self._check_bytes(client, sql, start, end, project_id)
+        job = client.query(sql, job_config=self._job_config(start, end, project_id, **job_kwargs))
+        count_upstream('bigquery')
+        result = job.result(page_size=page_size, timeout=self.timeout)
+        bytes_scanned_total.inc(self.dataset, amount=job.total_bytes_processed or 0)
+        for page in result.pages:
+            for row in page:
+                yield {
+                    'date': row['date'].isoformat() if hasattr(row['date'], 'isoformat') else str(row['date']),
+                    'account': row['project_id'],
+                    'service': row['service'],
+                    'sku': row['sku'],
+                    'region': row['region'] or '',
+                    'usage_amount': row['usage_amount'],
+                    'usage_unit': row['usage_unit'],
+                    'cost': float(row['cost'] or 0.0),
+                    'currency': row['currency'],
+                }
+
+    def _find(self, start: date, end: date) -> Optional[_Rollup]:
+        with self._lock:
+            for rollup in reversed(self._rollups):
+                if rollup.covers(start, end):
+                    return rollup
+        return None
+
+    def _store(self, rollup: _Rollup) -> _Rollup:
+        with self._lock:
+            now = time.time()
+            self._rollups = [r for r in self._rollups if now - r.fetched_at < ROLLUP_MEMO_SECONDS]
+            self._rollups.append(rollup)
+            del self._rollups[:-ROLLUP_MEMO_MAX_ENTRIES]
+        return rollup
+
+    def _where(self, project_id: str = None) -> str:
+        filters = [
+            "usage_start_time >= TIMESTAMP(@start_date)",
+            "usage_start_time < TIMESTAMP(@end_date)",
+        ]
+        if self.partition_pruning:
+            filters.append("_PARTITIONTIME >= TIMESTAMP(@start_date)")
+        if self.table_suffix:
+            filters.append("_TABLE_SUFFIX = @table_suffix")
+        if project_id:
+            filters.append("project.id = @project_id")
+        return "\n          AND ".join(filters)
+
+    def _sql(self) -> str:
+        where = self._where()
+        return f"""
+        SELECT
+          DATE(usage_start_time) AS date,
+          project.name AS project,
+          service.description AS service,
+          SUM(cost) AS cost,
+          project.id AS project_id,
+          location.region AS region
+        FROM `{self.dataset}.{self.table}*`
+        WHERE {where}
+        GROUP BY 1, 2, 3, 5, 6
+        """
+
+    def _line_items_sql(self, project_id: str = None) -> str:
+        where = self._where(project_id)
+        return f"""
+        SELECT
+          DATE(usage_start_time) AS date,
+          project.id AS project_id,
+          service.description AS service,
+          sku.description AS sku,
+          location.region AS region,
+          usage.amount AS usage_amount,
+          usage.unit AS usage_unit,
+          cost,
+          currency
+        FROM `{self.dataset}.{self.table}*`
+        WHERE {where}
+        """
+
+    def _job_config(self, start: date, end: date, project_id: str = None, **kwargs):
+        params = [
+            bigquery.ScalarQueryParameter('start_date', 'DATE', start),
+            bigquery.ScalarQueryParameter('end_date', 'DATE', end),
+        ]
+        if self.table_suffix:
+            params.append(bigquery.ScalarQueryParameter('table_suffix', 'STRING', self.table_suffix))
+        if project_id:
+            params.append(bigquery.ScalarQueryParameter('project_id', 'STRING', project_id))
+        return bigquery.QueryJobConfig(query_parameters=params, **kwargs)
+
+    def _check_bytes(self, client, sql: str, start: date, end: date, project_id: str = None) -> Dict[str, Any]:
+        """Dry-run against max_bytes_scanned; returns the job kwargs that enforce it"""
+        if not self.max_bytes_scanned:
+            return {}
+        dry_run = client.query(sql, job_config=self._job_config(start, end, project_id, dry_run=True, use_query_cache=False))
+        count_upstream('bigquery')
+        if dry_run.total_bytes_processed > self.max_bytes_scanned:
+            raise BytesScannedLimitExceeded(
+                f"Billing query would scan {dry_run.total_bytes_processed:,} bytes "
+                f"(limit {self.max_bytes_scanned:,}); narrow the date range or raise BQ_MAX_BYTES_SCANNED"
+            )
+        return {'maximum_bytes_billed': self.max_bytes_scanned}
+
+    def _query(self, start: date, end: date) -> _Rollup:
+        client = self.client_factory()
+        sql = self._sql()
+        job_kwargs = self._check_bytes(client, sql, start, end)
+        job = client.query(sql, job_config=self._job_config(start, end, **job_kwargs))
+        count_upstream('bigquery')
+        rows = []
+        for row in job.result(timeout=self.timeout):
+            day = row['date'].isoformat() if hasattr(row['date'], 'isoformat') else str(row['date'])
+            rows.append((
+                day, row['project'], row['service'], float(row['cost'] or 0.0),
+                row['project_id'], row['region'] or ''
+            ))
+        self.last_bytes_processed = job.total_bytes_processed or 0
+        bytes_scanned_total.inc(self.dataset, amount=self.last_bytes_processed)
+        return _Rollup(start, end, rows, self.last_bytes_processed)
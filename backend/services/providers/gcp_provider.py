@@ -1,81 +1,167 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from services.base_provider import BaseCloudProvider
+from services.daily_store import daily_store
+from services.aggregation import summarize, top_n
+from services.instrumentation import count_upstream
+from services.resilience import provider_deadline
+from services.providers.gcp_billing import BillingRollup
 
 try:
+    import google.auth
+    from google.auth.transport.requests import Request
     from google.cloud import bigquery, monitoring_v3
     from google.oauth2 import service_account
+    import numpy as np
     GCP_AVAILABLE = True
 except ImportError:
     GCP_AVAILABLE = False
 
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 import os
 
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+# Refresh access tokens this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=10)
+
+CPU_METRIC = "compute.googleapis.com/instance/cpu/utilization"
+NETWORK_IN_METRIC = "compute.googleapis.com/instance/network/received_bytes_count"
+NETWORK_OUT_METRIC = "compute.googleapis.com/instance/network/sent_bytes_count"
+BYTES_PER_SECOND_TO_MBPS = 8 / 1e6
+
+# Live metrics window, minimum chart bucket, max buckets per chart and busiest instances reported
+LIVE_WINDOW_MINUTES = 5
+TIMESERIES_BUCKET_SECONDS = 60
+MAX_CHART_POINTS = 240
+TOP_INSTANCES = 5
+MONITORING_PAGE_SIZE = int(os.getenv("GCP_MONITORING_PAGE_SIZE", "1000"))
+
+TIMESERIES_FIELDS = {
+    'cpu': ('cpu_percent', 'cpu_p95'),
+    'traffic': ('mbps_in', 'mbps_out'),
+}
+
 class GCPProvider(BaseCloudProvider):
     
+    name = 'gcp'
+    timeseries_fields = TIMESERIES_FIELDS
+    
     def _validate_config(self):
         if not GCP_AVAILABLE:
-            raise ImportError("Google Cloud libraries not installed. Run: pip install google-cloud-bigquery google-cloud-monitoring")
+            raise ImportError("Google Cloud libraries not installed. Run: pip install google-cloud-bigquery google-cloud-monitoring numpy")
         if 'project_id' not in self.config:
             raise ValueError("GCP project_id required")
     
     def _get_credentials(self):
-        creds_path = self.config.get('credentials_path')
-        if creds_path and os.path.exists(creds_path):
-            return service_account.Credentials.from_service_account_file(creds_path)
-        return None  # Use ADC
+        """Get the pooled credentials shared by the BigQuery and Monitoring clients"""
+        def build():
+            creds_path = self.config.get('credentials_path')
+            if creds_path and os.path.exists(creds_path):
+                return service_account.Credentials.from_service_account_file(
+                    creds_path, scopes=[CLOUD_PLATFORM_SCOPE]
+                )
+            credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])  # Use ADC
+            return credentials
+        return self._shared_client(('credentials', self.config.get('credentials_path')), build)
+    
+    def _billing_project(self) -> str:
+        """Project that runs the billing export queries"""
+        return self.config.get('billing_project_id') or self.config['project_id']
     
     def _bq_client(self):
-        return bigquery.Client(
-            project=self.config['project_id'],
+        return self._shared_client(('bigquery', self._billing_project()), lambda: bigquery.Client(
+            project=self._billing_project(),
             credentials=self._get_credentials()
-        )
+        ))
     
     def _monitoring_client(self):
-        return monitoring_v3.MetricServiceClient(credentials=self._get_credentials())
+        return self._client('monitoring', lambda: monitoring_v3.MetricServiceClient(
+            credentials=self._get_credentials()
+        ))
     
-    def get_mtd_costs(self) -> List[Dict[str, Any]]:
-        """Query BigQuery for MTD costs"""
-        dataset = self.config.get('billing_dataset', 'billing_export')
-        table = self.config.get('billing_table', 'gcp_billing_export_v1_')
-        
-        sql = f"""
-        SELECT
-          project.name AS project,
-          service.description AS service,
-          ROUND(SUM(cost), 2) AS cost
-        FROM `{dataset}.{table}*`
-        WHERE usage_start_time >= TIMESTAMP_TRUNC(CURRENT_TIMESTAMP(), MONTH)
-        GROUP BY 1,2
-        ORDER BY cost DESC
+    def refresh_credentials(self):
+        """Refresh the access token before it expires so requests never block on it"""
+        credentials = self._get_credentials()
+        expiry = getattr(credentials, 'expiry', None)
+        if not credentials.valid or expiry is None or expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN:
+            credentials.refresh(Request())
+    
+    def _billing_rollup(self) -> BillingRollup:
+        """
+        Pooled daily-by-service rollup shared by the MTD, total and daily views,
+        and by every project whose costs come from the same billing export
         """
+        key = (
+            'billing_rollup', self._billing_project(), self.config.get('billing_dataset'),
+            self.config.get('billing_table'), self.config.get('billing_table_suffix')
+        )
+        return self._shared_client(key, lambda: BillingRollup(
+            self._bq_client, self.config, timeout=provider_deadline(self.name)
+        ))
+    
+    def _project_filter(self):
+        """In multi-project setups each project reports only its own rows of the shared export"""
+        return self.config['project_id'] if self.config.get('billing_project_filter') else None
+    
+    def _mtd_period(self):
+        """Month start through today (UTC, end exclusive)"""
+        today = datetime.now(timezone.utc).date()
+        return today.replace(day=1), today + timedelta(days=1)
+    
+    def get_mtd_costs(self) -> List[Dict[str, Any]]:
+        """MTD costs by project/service, summed from the billing rollup"""
+        start, end = self._mtd_period()
+        totals: Dict[tuple, float] = {}
+        for _, project, service, cost in self._billing_rollup().rows(start, end, self._project_filter()):
+            totals[(project, service)] = totals.get((project, service), 0.0) + cost
         
-        client = self._bq_client()
-        return [dict(row) for row in client.query(sql).result()]
+        results = [
+            {'project': project, 'service': service, 'cost': round(cost, 2)}
+            for (project, service), cost in totals.items()
+        ]
+        return sorted(results, key=lambda x: x['cost'], reverse=True)
+    
+    def get_mtd_total(self) -> float:
+        """MTD total from the same billing rollup as the breakdown"""
+        start, end = self._mtd_period()
+        return round(sum(row[3] for row in self._billing_rollup().rows(start, end, self._project_filter())), 2)
     
     def get_daily_costs(self, days: int = 30) -> List[Dict[str, Any]]:
-        """Query BigQuery for daily costs"""
-        dataset = self.config.get('billing_dataset', 'billing_export')
-        table = self.config.get('billing_table', 'gcp_billing_export_v1_')
+        """Get daily costs, served from the local store for settled days"""
+        return daily_store.get_daily_costs(self, days, self._fetch_daily_range)
+    
+    def _fetch_daily_range(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """Daily costs with start <= date < end, summed from the billing rollup"""
+        rollup = self._billing_rollup()
+        # Widen to the month start so the same query also answers the MTD views
+        month_start, _ = self._mtd_period()
+        rollup.prefetch(min(start, month_start), end)
         
-        sql = f"""
-        SELECT
-          DATE(usage_start_time) AS date,
-          ROUND(SUM(cost), 2) AS cost
-        FROM `{dataset}.{table}*`
-        WHERE usage_start_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {days} DAY)
-        GROUP BY date
-        ORDER BY date
-        """
+        totals: Dict[str, float] = {}
+        for day, _, _, cost in rollup.rows(start, end, self._project_filter()):
+            totals[day] = totals.get(day, 0.0) + cost
+        return [{'date': day, 'cost': round(totals[day], 2)} for day in sorted(totals)]
+    
+    def get_cost_records(self, days: int = 31) -> List[Dict[str, Any]]:
+        """Daily cost records by project, service and region from the billing rollup"""
+        end = datetime.now(timezone.utc).date() + timedelta(days=1)
+        start = end - timedelta(days=days + 1)
+        rollup = self._billing_rollup()
+        month_start, _ = self._mtd_period()
+        rollup.prefetch(min(start, month_start), end)
         
-        client = self._bq_client()
-        results = []
-        for row in client.query(sql).result():
-            results.append({
-                'date': row['date'].isoformat() if hasattr(row['date'], 'isoformat') else str(row['date']),
-                'cost': float(row['cost'])
-            })
-        return results
+        totals: Dict[tuple, float] = {}
+        for day, _, service, cost, project_id, region in rollup.full_rows(start, end, self._project_filter()):
+            key = (day, project_id, service, region)
+            totals[key] = totals.get(key, 0.0) + cost
+        return [
+            {'date': day, 'account': project_id, 'service': service, 'region': region, 'cost': cost}
+            for (day, project_id, service, region), cost in totals.items()
+        ]
+    
+    def export_line_items(self, start: date, end: date, page_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Stream raw billing export rows, paging through the BigQuery result set"""
+        return self._billing_rollup().line_items(start, end, self._project_filter(), page_size)
     
     def get_live_metrics(self) -> Dict[str, Any]:
         """Get live VM metrics from Cloud Monitoring"""
@@ -88,42 +174,107 @@ class GCPProvider(BaseCloudProvider):
             }
     
     def _fetch_live_metrics(self) -> Dict[str, Any]:
-        """Fetch metrics from Cloud Monitoring"""
-        project_name = f"projects/{self.config['project_id']}"
-        client = self._monitoring_client()
+        """Fetch metrics from Cloud Monitoring, aligned server-side to one point per instance"""
+        Aligner = monitoring_v3.Aggregation.Aligner
+        Reducer = monitoring_v3.Aggregation.Reducer
+        window = LIVE_WINDOW_MINUTES * 60
         
-        end = datetime.now(timezone.utc)
-        start = end - timedelta(minutes=5)
-        interval = monitoring_v3.TimeInterval(
-            end_time={"seconds": int(end.timestamp())},
-            start_time={"seconds": int(start.timestamp())},
-        )
-        
-        # CPU utilization
-        cpu_filter = 'metric.type="compute.googleapis.com/instance/cpu/utilization"'
-        cpu_series = list(client.list_time_series(
-            request={
-                "name": project_name,
-                "filter": cpu_filter,
-                "interval": interval,
-                "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
-            }
-        ))
+        # CPU: one mean point per instance over the window; stats and top-N computed locally
+        cpu_series = self._list_aligned(CPU_METRIC, LIVE_WINDOW_MINUTES, window, Aligner.ALIGN_MEAN)
+        instances, _, cpu_vals = self._series_arrays(cpu_series, scale=100.0)
+        cpu = summarize(cpu_vals)
         
-        cpu_vals = []
-        for ts in cpu_series:
-            for p in ts.points:
-                if p.value.double_value is not None:
-                    cpu_vals.append(p.value.double_value * 100)
-        
-        cpu_avg = round(sum(cpu_vals) / len(cpu_vals), 1) if cpu_vals else 0.0
+        # Traffic: per-instance byte rates summed across the project by Monitoring
+        mbps_in = self._latest_value(self._list_aligned(
+            NETWORK_IN_METRIC, LIVE_WINDOW_MINUTES, window, Aligner.ALIGN_RATE, Reducer.REDUCE_SUM
+        )) * BYTES_PER_SECOND_TO_MBPS
+        mbps_out = self._latest_value(self._list_aligned(
+            NETWORK_OUT_METRIC, LIVE_WINDOW_MINUTES, window, Aligner.ALIGN_RATE, Reducer.REDUCE_SUM
+        )) * BYTES_PER_SECOND_TO_MBPS
         
         return {
             'updated_at': datetime.now(timezone.utc).isoformat(),
-            'cpu_percent': cpu_avg,
-            'instances_monitored': len(cpu_series)
+            'cpu_percent': round(cpu['mean'], 1),
+            'cpu_p50': round(cpu['p50'], 1),
+            'cpu_p95': round(cpu['p95'], 1),
+            'cpu_max': round(cpu['max'], 1),
+            'mbps_in': round(mbps_in, 3),
+            'mbps_out': round(mbps_out, 3),
+            'instances_monitored': len(cpu_series),
+            'top_instances': top_n(instances, cpu_vals, TOP_INSTANCES)
         }
     
+    def _series_arrays(self, series, scale: float = 1.0):
+        """Flatten Monitoring time series into (instance ids, epoch seconds, values) arrays"""
+        counts = [len(ts.points) for ts in series]
+        total = sum(counts)
+        instances = np.repeat(
+            np.array([ts.resource.labels.get('instance_id', '') for ts in series], dtype=object),
+            counts
+        )
+        times = np.fromiter(
+            (p.interval.end_time.timestamp() for ts in series for p in ts.points),
+            dtype=np.float64, count=total
+        )
+        values = np.fromiter(
+            (p.value.double_value for ts in series for p in ts.points),
+            dtype=np.float64, count=total
+        ) * scale
+        return instances, times, values
+    
+    def _latest_value(self, series) -> float:
+        """Newest point of a single reduced series (0.0 when there is no data)"""
+        if not series or not series[0].points:
+            return 0.0
+        return series[0].points[0].value.double_value
+    
+    def _list_aligned(self, metric_type: str, minutes: int, alignment_seconds: int,
+                      aligner, reducer=None):
+        """
+        List time series with alignment (and optionally a cross-series reducer)
+        applied by Cloud Monitoring, so the response holds one point per bucket
+        rather than every raw sample of every instance.
+        """
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(minutes=minutes)
+        aggregation = {
+            "alignment_period": {"seconds": alignment_seconds},
+            "per_series_aligner": aligner,
+        }
+        if reducer is not None:
+            aggregation["cross_series_reducer"] = reducer
+        
+        count_upstream('cloud_monitoring')
+        return list(self._monitoring_client().list_time_series(
+            request={
+                "name": f"projects/{self.config['project_id']}",
+                "filter": f'metric.type="{metric_type}"',
+                "interval": monitoring_v3.TimeInterval(
+                    end_time={"seconds": int(end.timestamp())},
+                    start_time={"seconds": int(start.timestamp())},
+                ),
+                "aggregation": monitoring_v3.Aggregation(aggregation),
+                "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
+                "page_size": MONITORING_PAGE_SIZE,
+            },
+            timeout=provider_deadline(self.name)
+        ))
+    
+    def _alignment_seconds(self, minutes: int) -> int:
+        """Bucket width that keeps a chart at or under MAX_CHART_POINTS"""
+        return max(TIMESERIES_BUCKET_SECONDS, -(-minutes * 60 // MAX_CHART_POINTS))
+    
+    def _reduced_series(self, metric_type: str, minutes: int, aligner, reducer):
+        """One project-wide series as (epoch seconds, values), oldest first"""
+        series = self._list_aligned(metric_type, minutes, self._alignment_seconds(minutes), aligner, reducer)
+        if not series:
+            return [], []
+        points = list(reversed(series[0].points))  # Monitoring returns newest first
+        return (
+            [p.interval.end_time.timestamp() for p in points],
+            [p.value.double_value for p in points]
+        )
+    
     def get_timeseries(self, metric_type: str, minutes: int) -> Dict[str, Any]:
         """Get time series data for charts"""
         if metric_type == 'cpu':
@@ -134,17 +285,27 @@ class GCPProvider(BaseCloudProvider):
             return {"error": "Unsupported metric type"}
     
     def _cpu_timeseries(self, minutes: int) -> Dict[str, Any]:
-        """CPU time series"""
-        # Simplified implementation
+        """CPU time series: mean and p95 across instances per bucket"""
+        Aligner = monitoring_v3.Aggregation.Aligner
+        Reducer = monitoring_v3.Aggregation.Reducer
+        ts, mean = self._reduced_series(CPU_METRIC, minutes, Aligner.ALIGN_MEAN, Reducer.REDUCE_MEAN)
+        p95_ts, p95 = self._reduced_series(CPU_METRIC, minutes, Aligner.ALIGN_MEAN, Reducer.REDUCE_PERCENTILE_95)
+        p95_by_ts = dict(zip(p95_ts, p95))
         return {
-            "ts": [],
-            "cpu_percent": []
+            "ts": [datetime.fromtimestamp(t, timezone.utc).isoformat() for t in ts],
+            "cpu_percent": [round(v * 100, 2) for v in mean],
+            "cpu_p95": [round(p95_by_ts.get(t, 0.0) * 100, 2) for t in ts]
         }
     
     def _traffic_timeseries(self, minutes: int) -> Dict[str, Any]:
-        """Network traffic time series"""
+        """Network traffic time series: total Mbps across instances per bucket"""
+        Aligner = monitoring_v3.Aggregation.Aligner
+        Reducer = monitoring_v3.Aggregation.Reducer
+        ts, rate_in = self._reduced_series(NETWORK_IN_METRIC, minutes, Aligner.ALIGN_RATE, Reducer.REDUCE_SUM)
+        out_ts, rate_out = self._reduced_series(NETWORK_OUT_METRIC, minutes, Aligner.ALIGN_RATE, Reducer.REDUCE_SUM)
+        out_by_ts = dict(zip(out_ts, rate_out))
         return {
-            "ts": [],
-            "mbps_in": [],
-            "mbps_out": []
-        }
\ No newline at end of file
+            "ts": [datetime.fromtimestamp(t, timezone.utc).isoformat() for t in ts],
+            "mbps_in": [round(v * BYTES_PER_SECOND_TO_MBPS, 3) for v in rate_in],
+            "mbps_out": [round(out_by_ts.get(t, 0.0) * BYTES_PER_SECOND_TO_MBPS, 3) for t in ts]
+        }
@@ -0,0 +1,296 @@
+import inspect
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import wraps
+from typing import Any, Callable, Dict, Tuple
+from services.cache import CacheEntry, MemoryBackend, ServeStale, bound_cache_key, is_error_result, result_cache
+from services.instrumentation import Counter, record_timing, registry
+
+# Overall deadline for one provider call, retries included (PROVIDER_DEADLINE_<NAME> overrides per provider)
+PROVIDER_DEADLINE_SECONDS = float(os.getenv("PROVIDER_DEADLINE_SECONDS", "20"))
+# Consecutive failures that open a provider's circuit, and how long it stays open before a trial call
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Exponential backoff with full jitter for throttling / transient errors
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "8"))
+# Send a second live-metrics request when the first has not answered within HEDGE_DELAY_SECONDS
+HEDGE_LIVE_METRICS = os.getenv("HEDGE_LIVE_METRICS", "false").lower() == "true"
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "1.5"))
+RESILIENCE_WORKERS = int(os.getenv("RESILIENCE_WORKERS", "32"))
+# Last-known results of uncached methods (live metrics, timeseries) kept for fallbacks, apart from the cost cache
+LAST_KNOWN_ENTRIES = int(os.getenv("LAST_KNOWN_ENTRIES", "64"))
+# Connect timeout handed to the SDKs; their read timeouts follow the provider deadline
+SDK_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SDK_CONNECT_TIMEOUT_SECONDS", "5"))
+
+HEDGED_METHODS = ('get_live_metrics',)
+
+# Throttling and transient-failure markers across botocore, google-api-core and azure-core
+RETRYABLE_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'TooManyRequestsException', 'RequestLimitExceeded',
+    'LimitExceededException', 'ServiceUnavailable', 'RequestTimeout', 'InternalError',
+}
+RETRYABLE_EXCEPTIONS = {'TooManyRequests', 'ResourceExhausted', 'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError'}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_MESSAGE = re.compile(r'\b(429|503|throttl\w*|rate exceeded|too many requests|quota exceeded|resource exhausted)\b', re.I)
+
+# Error payloads caused by the request itself, which say nothing about the provider's health
+CALLER_ERRORS = ('Unsupported',)
+
+# Small LRU of its own, so argument-keyed live results never evict cached costs
+last_known = MemoryBackend(LAST_KNOWN_ENTRIES)
+
+class CircuitOpenError(RuntimeError):
+    """Calls to a failing provider are being short-circuited"""
+    pass
+
+class DeadlineExceeded(TimeoutError):
+    """A provider call did not finish within its deadline"""
+    pass
+
+fallbacks_total = registry.register(Counter(
+    'dashboard_provider_fallbacks_total', 'Provider calls answered with last-known data, by reason',
+    ('provider', 'method', 'reason')
+))
+retries_total = registry.register(Counter(
+    'dashboard_provider_retries_total', 'Provider calls retried after throttling or transient errors',
+    ('provider', 'method')
+))
+hedges_total = registry.register(Counter(
+    'dashboard_provider_hedged_requests_total', 'Second requests sent for slow latency-critical calls',
+    ('provider', 'method')
+))
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open trial after a cool-down"""
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream; in half-open state only one trial call is let through"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+            self._trial_running = False
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider) -> CircuitBreaker:
+    """Circuit breaker shared by every method of one provider account"""
+    key = (provider.name, provider.fingerprint)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker())
+    return breaker
+
+def _breaker_lines():
+    lines = [
+        "# HELP dashboard_circuit_open Whether a provider's circuit breaker is open (1) or half-open (0.5)",
+        "# TYPE dashboard_circuit_open gauge",
+    ]
+    states = {'closed': 0, 'half_open': 0.5, 'open': 1}
+    for (name, fingerprint), breaker in sorted(_breakers.items()):
+        lines.append(f'dashboard_circuit_open{{provider="{name}",account="{fingerprint}"}} {states[breaker.state]}')
+    return lines
+
+registry.collectors.append(_breaker_lines)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_call_executor() -> ThreadPoolExecutor:
+    """Pool that runs provider calls so callers can stop waiting at the deadline"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=RESILIENCE_WORKERS, thread_name_prefix="provider-call")
+    return _executor
+
+def provider_deadline(provider_name: str) -> float:
+    return float(os.getenv(f"PROVIDER_DEADLINE_{provider_name.upper()}", PROVIDER_DEADLINE_SECONDS))
+
+def is_retryable(error) -> bool:
+    """Throttling or transient failure, given an exception or an {'error': message} payload"""
+    if isinstance(error, str):
+        return bool(RETRYABLE_MESSAGE.search(error))
+    if isinstance(error, DeadlineExceeded):
+        return False
+    code = getattr(error, 'response', None)
+    if isinstance(code, dict):
+        code = code.get('Error', {}).get('Code')
+        if code in RETRYABLE_ERROR_CODES:
+            return True
+    if type(error).__name__ in RETRYABLE_EXCEPTIONS:
+        return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if status in RETRYABLE_STATUS:
+        return True
+    return bool(RETRYABLE_MESSAGE.search(str(error)))
+
+def _error_message(result) -> str:
+    if isinstance(result, list):
+        result = result[0]
+    return str(result.get('error', ''))
+
+def is_caller_error(result) -> bool:
+    return _error_message(result).startswith(CALLER_ERRORS)
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)"""
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** (attempt - 1))))
+
+def run_with_deadline(call: Callable[[], Any], timeout: float, hedge_after: float = None,
+                      on_hedge: Callable[[], None] = None) -> Any:
+    """
+    Run `call` on the call pool and wait at most `timeout` seconds. With
+    hedge_after set, a second identical call is started if the first has
+    not finished by then, and whichever succeeds first is returned. Calls
+    that overrun keep running in the pool; SDK-level timeouts bound them.
+    """
+    executor = get_call_executor()
+    deadline = time.monotonic() + timeout
+    futures = [executor.submit(call)]
+    if hedge_after is not None and hedge_after < timeout:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            futures.append(executor.submit(call))
+            if on_hedge is not None:
+                on_hedge()
+
+    pending = set(futures)
+    failed = None
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is not None:
+                failed = future.exception()
+            elif is_error_result(future.result()) and pending:
+                # An error payload only wins if the other request fails too
+                failed = future.result()
+            else:
+                return future.result()
+    if failed is not None and not pending:
+        if isinstance(failed, Exception):
+            raise failed
+        return failed
+    raise DeadlineExceeded(f"no response within {timeout:g}s")
+
+def resilient(func: Callable) -> Callable:
+    """
+    Guard a provider method with a deadline, throttling retries, the
+    provider's circuit breaker and, for HEDGED_METHODS, hedged requests.
+    When the call fails or the circuit is open, the last-known result for
+    the same arguments is returned if there is one (for cached methods via
+    ServeStale, so the cache does not store it as fresh; for the others from
+    the bounded last_known store).
+    """
+    if getattr(func, '__resilient__', False):
+        return func
+
+    method = func.__name__
+    signature = inspect.signature(func)
+    hedged = method in HEDGED_METHODS
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        key = bound_cache_key(self, method, signature, args, kwargs)
+        breaker = get_breaker(self)
+
+        def fallback(reason: str, error):
+            entry = result_cache.peek(key) if method in self.cached_methods else last_known.get(key)
+            if entry is not None:
+                fallbacks_total.inc(self.name, method, reason)
+                if method in self.cached_methods:
+                    raise ServeStale(entry.value)
+                return entry.value
+            if isinstance(error, Exception):
+                raise error
+            return error
+
+        if not breaker.allow():
+            return fallback('circuit_open', CircuitOpenError(
+                f"{self.name} is failing; retrying in up to {breaker.reset_seconds:g}s"
+            ))
+
+        timeout = provider_deadline(self.name)
+        started = time.monotonic()
+        hedge_after = HEDGE_DELAY_SECONDS if hedged and HEDGE_LIVE_METRICS else None
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = timeout - (time.monotonic() - started)
+            try:
+                if timeout <= 0:
+                    result = func(self, *args, **kwargs)
+                else:
+                    result = run_with_deadline(
+                        lambda: func(self, *args, **kwargs), remaining, hedge_after,
+                        on_hedge=lambda: hedges_total.inc(self.name, method)
+                    )
+                error = result if is_error_result(result) else None
+                retryable = error is not None and is_retryable(_error_message(result))
+            except Exception as e:
+                result, error, retryable = None, e, is_retryable(e)
+
+            if error is None or (not isinstance(error, Exception) and is_caller_error(error)):
+                breaker.record_success()
+                if timeout > 0:
+                    # The attempt itself ran on a pool thread, out of reach of Server-Timing
+                    record_timing(f"{self.name}.{method}", time.monotonic() - started)
+                if method not in self.cached_methods:
+                    last_known.set(key, CacheEntry(result, time.time()))
+                return result
+
+            delay = backoff_delay(attempt)
+            if retryable and attempt < RETRY_ATTEMPTS and (timeout <= 0 or time.monotonic() - started + delay < timeout):
+                retries_total.inc(self.name, method)
+                time.sleep(delay)
+                continue
+
+            breaker.record_failure()
+            reason = 'deadline' if isinstance(error, DeadlineExceeded) else 'error'
+            return fallback(reason, error)
+
+    wrapper.__resilient__ = True
+    return wrapper
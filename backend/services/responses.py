@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from flask import Response, request
+from services.instrumentation import record_timing, response_encode_seconds
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+# Compressed bodies kept per ETag so unchanged payloads are not recompressed every poll
+COMPRESSED_CACHE_SIZE = 128
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact JSON bytes (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+
+def to_columnar(data: Any) -> Any:
+    """
+    Turn a list of flat dicts into one list per key:
+    [{'date': d1, 'cost': c1}, {'date': d2, 'cost': c2}] -> {'date': [d1, d2], 'cost': [c1, c2]}.
+    Anything else (already-columnar timeseries, error dicts) is returned unchanged.
+    """
+    if not isinstance(data, list) or not data or not all(isinstance(row, dict) for row in data):
+        return data
+    keys: List[str] = list(dict.fromkeys(key for row in data for key in row))
+    return {key: [row.get(key) for row in data] for key in keys}
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').lower().split(',')}
+    if BROTLI_AVAILABLE and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+_compressed: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+_compressed_lock = threading.Lock()
+
+def compress(body: bytes, encoding: str, etag: str) -> bytes:
+    key = (etag, encoding)
+    with _compressed_lock:
+        if key in _compressed:
+            _compressed.move_to_end(key)
+            return _compressed[key]
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=5)
+    else:
+        compressed = gzip.compress(body, compresslevel=6)
+    with _compressed_lock:
+        _compressed[key] = compressed
+        while len(_compressed) > COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return compressed
+
+def encode_json(data: Any, status: int = 200, accept_encoding: str = None,
+                if_none_match: str = None, columnar: bool = False) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    Encode a JSON payload for the wire: optional columnar layout, ETag with
+    304 on If-None-Match, and gzip/brotli when the client accepts it.
+    Returns (status, headers, body).
+    """
+    started = time.perf_counter()
+    try:
+        return _encode_json(data, status, accept_encoding, if_none_match, columnar)
+    finally:
+        elapsed = time.perf_counter() - started
+        response_encode_seconds.observe(elapsed)
+        record_timing('encode', elapsed)
+
+def _encode_json(data: Any, status: int, accept_encoding: Optional[str],
+                 if_none_match: Optional[str], columnar: bool) -> Tuple[int, Dict[str, str], bytes]:
+    if columnar:
+        data = to_columnar(data)
+    body = dumps(data)
+    headers = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding'}
+
+    if status != 200:
+        return status, headers, body
+
+    etag = make_etag(body)
+    headers['ETag'] = etag
+    headers['Cache-Control'] = 'no-cache'  # always revalidate; a match costs only a 304
+    if etag_matches(if_none_match, etag):
+        return 304, headers, b''
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding and len(body) >= MIN_COMPRESS_BYTES:
+        body = compress(body, encoding, etag)
+        headers['Content-Encoding'] = encoding
+    return status, headers, body
+
+def json_response(data: Any, status: int = 200):
+    """Flask response for `data` using the current request's headers and ?format="""
+    status, headers, body = encode_json(
+        data, status,
+        accept_encoding=request.headers.get('Accept-Encoding'),
+        if_none_match=request.headers.get('If-None-Match'),
+        columnar=request.args.get('format') == 'columnar'
+    )
+    mimetype = headers.pop('Content-Type')
+    return Response(body, status=status, headers=headers, mimetype=mimetype)
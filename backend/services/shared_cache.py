@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Hashable, Optional, Tuple
+from services.cache import CacheEntry, MAX_ENTRIES
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Serialized payloads at least this large are zlib-compressed
+COMPRESS_MIN_BYTES = 1024
+# Decoded values kept per process, so an unchanged entry is not unpacked on every hit
+DECODED_ENTRIES = int(os.getenv("CACHE_DECODED_ENTRIES", "64"))
+# Entries are trimmed to max_entries after this many writes
+EVICT_EVERY = 64
+
+# Deletes a lock only while it still belongs to the caller (atomic on the server)
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+# First byte of every payload: codec, plus _ZLIB when compressed
+_JSON, _ZLIB = 3, 0x80
+
+def _encode(value: Any) -> Any:
+    """Tag the values JSON cannot round-trip, so every process decodes the same types"""
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {'__items__': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v) for v in value]}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if hasattr(value, 'item'):
+        # NumPy scalars from the aggregation helpers
+        return _encode(value.item())
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+def _decode(obj: dict) -> Any:
+    if len(obj) == 1:
+        tag, body = next(iter(obj.items()))
+        if tag == '__datetime__':
+            return datetime.fromisoformat(body)
+        if tag == '__date__':
+            return date.fromisoformat(body)
+        if tag == '__tuple__':
+            return tuple(body)
+        if tag == '__items__':
+            return {k: v for k, v in body}
+    return obj
+
+def pack(value: Any) -> bytes:
+    """JSON with tagged dates, datetimes and tuples; zlib above COMPRESS_MIN_BYTES"""
+    codec, body = _JSON, json.dumps(_encode(value), separators=(',', ':')).encode('utf-8')
+    if len(body) >= COMPRESS_MIN_BYTES:
+        codec, body = codec | _ZLIB, zlib.compress(body, 1)
+    return bytes([codec]) + body
+
+def unpack(data: bytes) -> Any:
+    codec, body = data[0], data[1:]
+    if codec & ~_ZLIB != _JSON:
+        raise ValueError(f"unknown cache payload codec {codec & ~_ZLIB}")
+    if codec & _ZLIB:
+        body = zlib.decompress(body)
+    return json.loads(body, object_hook=_decode)
+
+def key_string(key: Hashable) -> str:
+    """Cache keys are tuples of plain values, so their repr is stable across processes"""
+    return repr(key)
+
+class SQLiteBackend:
+    """
+    CacheEntry store shared by every worker process on the host: one SQLite
+    file in WAL mode (concurrent readers, one writer), values packed with
+    pack(). A lock table gives cross-process single-flight: only the worker
+    holding a key's lock loads it, the others wait for the stored result.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._decoded: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._decoded_lock = threading.Lock()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    stored_at REAL NOT NULL,
+                    value BLOB NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_stored_at ON cache_entries (stored_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_locks (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One autocommit connection per thread, reopened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        name = key_string(key)
+        with self._decoded_lock:
+            known = self._decoded.get(name)
+        # The blob is only read when it differs from the copy already decoded here
+        row = self._connect().execute(
+            "SELECT stored_at, CASE WHEN stored_at = ? THEN NULL ELSE value END FROM cache_entries WHERE key = ?",
+            (known[0] if known else -1.0, name)
+        ).fetchone()
+        if row is None:
+            return None
+        stored_at, data = row
+        if data is None:
+            return CacheEntry(known[1], stored_at)
+        try:
+            value = unpack(data)
+        except ValueError:
+            # Written in an older encoding: treat as a miss, the next load replaces it
+            return None
+        self._remember(name, stored_at, value)
+        return CacheEntry(value, stored_at)
+
+    def set(self, key: Hashable, entry: CacheEntry):
+        name = key_string(key)
+        try:
+            data = pack(entry.value)
+        except (TypeError, ValueError) as e:
+            print(f"⚠ Not caching {name[:80]}: {e}")
+            return
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?)", (name, entry.stored_at, data))
+        self._remember(name, entry.stored_at, entry.value)
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key NOT IN "
+                "(SELECT key FROM cache_entries ORDER BY stored_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key: Hashable):
+        self._connect().execute("DELETE FROM cache_entries WHERE key = ?", (key_string(key),))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entries")
+        conn.execute("DELETE FROM cache_locks")
+        with self._decoded_lock:
+            self._decoded.clear()
+
+    def acquire(self, key: Hashable, owner: str, seconds: float) -> bool:
+        """Take the key's cross-process load lock (or an expired one); False if another owner holds it"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO cache_locks VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE cache_locks.expires_at < ?",
+            (key_string(key), owner, now + seconds, now)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key: Hashable, owner: str):
+        self._connect().execute("DELETE FROM cache_locks WHERE key = ? AND owner = ?", (key_string(key), owner))
+
+    def _remember(self, name: str, stored_at: float, value: Any):
+        with self._decoded_lock:
+            self._decoded[name] = (stored_at, value)
+            self._decoded.move_to_end(name)
+            while len(self._decoded) > DECODED_ENTRIES:
+                self._decoded.popitem(last=False)
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+class RedisBackend:
+    """
+    CacheEntry store on any Redis-compatible server (Redis, Valkey, KeyDB,
+    Dragonfly, or a local stand-in). `client` needs the redis-py methods
+    get/set/delete/scan_iter/eval. Values are stored as an 8-byte stored_at
+    followed by pack(value); locks use SET NX with an expiry and are
+    released with a compare-and-delete script.
+    """
+
+    def __init__(self, client, prefix: str = "dashboard:cache:", expire_seconds: int = None):
+        self.client = client
+        self.prefix = prefix
+        self.expire_seconds = expire_seconds
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisBackend':
+        if not REDIS_AVAILABLE:
+            raise ImportError("redis not installed. Run: pip install redis")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _name(self, key: Hashable) -> str:
+        return self.prefix + hashlib.sha1(key_string(key).encode('utf-8')).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        data = self.client.get(self._name(key))
+        if data is None:
+            return None
+        (stored_at,) = struct.unpack_from('>d', data)
+        try:
+            return CacheEntry(unpack(data[8:]), stored_at)
+        except ValueError:
+            # Written in an older encoding: treat as a miss, the next load replaces it
+            return None
+
+    def set(self, key: Hashable, entry: CacheEntry):
+        try:
+            data = struct.pack('>d', entry.stored_at) + pack(entry.value)
+        except (TypeError, ValueError) as e:
+            print(f"⚠ Not caching {key_string(key)[:80]}: {e}")
+            return
+        self.client.set(self._name(key), data, ex=self.expire_seconds)
+
+    def delete(self, key: Hashable):
+        self.client.delete(self._name(key))
+
+    def clear(self):
+        for name in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(name)
+
+    def acquire(self, key: Hashable, owner: str, seconds: float) -> bool:
+        return bool(self.client.set(self._name(key) + ':lock', owner, nx=True, px=int(seconds * 1000)))
+
+    def release(self, key: Hashable, owner: str):
+        # Compare-and-delete in one step, so a lock that expired and was taken over is left alone
+        self.client.eval(RELEASE_SCRIPT, 1, self._name(key) + ':lock', owner)
+
+    def __len__(self):
+        return sum(1 for name in self.client.scan_iter(match=self.prefix + '*')
+                   if not (name.decode('utf-8') if isinstance(name, bytes) else name).endswith(':lock'))
@@ -0,0 +1,122 @@
+import json
+import os
+import queue
+import threading
+from typing import Dict, Any, Iterator, List
+from services.cloud_factory import CloudProviderFactory
+
+STREAM_INTERVAL_SECONDS = float(os.getenv("STREAM_INTERVAL_SECONDS", "5"))
+# Comment lines sent on idle streams so proxies do not close them
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+# Events buffered per subscriber; slow clients drop their oldest events
+SUBSCRIBER_QUEUE_SIZE = 32
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class _Channel:
+    """Subscribers and shared producer state for one provider"""
+
+    def __init__(self):
+        self.subscribers: List[queue.Queue] = []
+        self.snapshot: Dict[str, Any] = {}
+        self.thread = None
+
+class Broadcaster:
+    """
+    One producer thread per provider reads live metrics and the MTD total,
+    diffs them against the previous snapshot and pushes only the changed
+    fields to every subscriber. Upstream load is therefore the same for one
+    viewer or a hundred; the producer stops when the last subscriber leaves.
+    """
+
+    def __init__(self, auth_manager, metrics_collector, interval: float = STREAM_INTERVAL_SECONDS):
+        self.auth_manager = auth_manager
+        self.metrics_collector = metrics_collector
+        self.interval = interval
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, provider: str) -> queue.Queue:
+        provider = provider.lower()
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            channel = self._channels.setdefault(provider, _Channel())
+            channel.subscribers.append(q)
+            if channel.snapshot:
+                q.put(('snapshot', channel.snapshot))
+            if channel.thread is None:
+                channel.thread = threading.Thread(
+                    target=self._produce, args=(provider, channel),
+                    name=f"stream-{provider}", daemon=True
+                )
+                channel.thread.start()
+        return q
+
+    def unsubscribe(self, provider: str, q: queue.Queue):
+        with self._lock:
+            channel = self._channels.get(provider.lower())
+            if channel is not None and q in channel.subscribers:
+                channel.subscribers.remove(q)
+
+    def stream(self, provider: str) -> Iterator[str]:
+        """SSE generator for one client"""
+        q = self.subscribe(provider)
+        try:
+            while True:
+                try:
+                    event, data = q.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(provider, q)
+
+    def _read(self, provider: str) -> Dict[str, Any]:
+        cloud = CloudProviderFactory.get(provider, self.auth_manager.get_config(provider))
+        metrics = self.metrics_collector.latest(provider)
+        if metrics is None:
+            metrics = cloud.get_live_metrics()
+        try:
+            mtd_cost = cloud.get_mtd_total()  # served from the result cache between refreshes
+        except Exception as e:
+            mtd_cost = None
+            metrics = {**metrics, 'cost_error': str(e)}
+        return {**metrics, 'mtd_cost': mtd_cost}
+
+    def _publish(self, channel: _Channel, event: str, data: Dict[str, Any]):
+        for q in list(channel.subscribers):
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait((event, data))
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _produce(self, provider: str, channel: _Channel):
+        stop = threading.Event()
+        while True:
+            with self._lock:
+                if not channel.subscribers:
+                    channel.thread = None
+                    return
+            try:
+                current = self._read(provider)
+            except Exception as e:
+                current = {'error': str(e)}
+
+            previous = channel.snapshot
+            if not previous:
+                channel.snapshot = current
+                self._publish(channel, 'snapshot', current)
+            else:
+                delta = {k: v for k, v in current.items() if previous.get(k) != v}
+                delta.update({k: None for k in previous if k not in current})
+                if delta:
+                    channel.snapshot = current
+                    self._publish(channel, 'delta', delta)
+            stop.wait(self.interval)
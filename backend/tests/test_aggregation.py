@@ -0,0 +1,56 @@
+import math
+
+import numpy as np
+import pytest
+
+from services.aggregation import downsample_timeseries, lttb_indices
+
+
+def test_lttb_keeps_endpoints_and_requested_size():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_a_single_spike():
+    y = np.zeros(500)
+    y[237] = 100.0
+    assert 237 in lttb_indices(np.arange(500), y, 20)
+
+
+def test_lttb_returns_everything_below_threshold():
+    assert list(lttb_indices(range(5), [1, 2, 3, 4, 5], 10)) == [0, 1, 2, 3, 4]
+
+
+def test_downsample_keeps_columns_aligned():
+    data = {
+        'ts': [f"t{i}" for i in range(300)],
+        'mbps_in': [float(i % 17) for i in range(300)],
+        'mbps_out': [float(i) for i in range(300)],
+    }
+    result = downsample_timeseries(data, 50)
+    assert len(result['ts']) == len(result['mbps_in']) == len(result['mbps_out']) == 50
+    for ts, value in zip(result['ts'], result['mbps_out']):
+        assert value == float(ts[1:])
+
+
+def test_downsample_tolerates_gaps():
+    data = {'ts': list(range(100)), 'cpu_percent': [None if i % 10 == 0 else float(i) for i in range(100)]}
+    result = downsample_timeseries(data, 10)
+    assert len(result['ts']) == 10
+    assert all(v is None or not math.isnan(v) for v in result['cpu_percent'])
+
+
+def test_small_thresholds_keep_the_endpoints():
+    assert list(lttb_indices(range(10), range(10), 2)) == [0, 9]
+    assert list(lttb_indices(range(10), range(10), 1)) == [9]
+    with pytest.raises(ValueError):
+        lttb_indices(range(10), range(10), 0)
+
+
+def test_downsample_returns_at_most_points():
+    data = {'ts': list(range(10)), 'cpu_percent': [float(i) for i in range(10)]}
+    assert downsample_timeseries(data, 2) == {'ts': [0, 9], 'cpu_percent': [0.0, 9.0]}
@@ -0,0 +1,32 @@
+import pytest
+
+import app as backend
+
+
+@pytest.fixture
+def client():
+    return backend.app.test_client()
+
+
+@pytest.mark.parametrize('url, message', [
+    ('/api/gcp/costs/daily?days=abc', 'days must be a positive integer'),
+    ('/api/gcp/costs/anomalies?days=-1', 'days must be a positive integer'),
+    ('/api/gcp/metrics/timeseries?minutes=x', 'minutes must be a positive integer'),
+    ('/api/gcp/metrics/timeseries?points=1.5', 'points must be a positive integer'),
+    ('/api/gcp/metrics/timeseries?type=memory', 'Unsupported metric type: memory'),
+    ('/api/costs/query?limit=z', 'limit must be a positive integer'),
+])
+def test_invalid_query_params_are_rejected(client, url, message):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': message}
+
+
+def test_batch_rejects_invalid_params_per_item(client, monkeypatch):
+    monkeypatch.setattr(backend.auth_manager, 'is_provider_configured', lambda provider: True)
+    response = client.post('/api/batch', json={'queries': [
+        {'id': 'a', 'provider': 'gcp', 'resource': 'costs/daily', 'params': {'days': 'abc'}},
+        {'id': 'b', 'provider': 'gcp', 'resource': 'metrics/timeseries', 'params': 'minutes=5'},
+    ]})
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['results']] == [400, 400]
@@ -0,0 +1,37 @@
+import asyncio
+
+import asgi
+
+
+def call(path, method='GET', query=b'', send_error=False):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        if send_error and message['type'] == 'http.response.body':
+            raise ConnectionResetError("client went away")
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': []}
+    asyncio.run(asgi.app(scope, receive, send))
+    return messages
+
+
+def test_head_gets_headers_without_body():
+    start, body = call('/api/health', method='HEAD')
+    assert start['status'] == 200
+    assert int(dict(start['headers'])[b'content-length']) > 0
+    assert body['body'] == b''
+
+
+def test_invalid_params_answer_400():
+    for path, query in (('/api/gcp/costs/daily', b'days=abc'), ('/api/gcp/metrics/timeseries', b'type=memory'),
+                        ('/api/gcp/metrics/timeseries', b'minutes=0'), ('/api/costs/summary', b'timeout=x')):
+        assert call(path, query=query)[0]['status'] == 400
+
+
+def test_failure_after_headers_does_not_start_a_second_response():
+    messages = call('/api/health', send_error=True)
+    assert [m['type'] for m in messages] == ['http.response.start']
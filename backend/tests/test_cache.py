@@ -0,0 +1,121 @@
+import threading
+import time
+
+from services.cache import CacheEntry, MemoryBackend, ResultCache, ServeStale
+
+
+def test_fresh_entry_is_served_without_loading():
+    cache = ResultCache(MemoryBackend())
+    calls = []
+    assert cache.get_or_load('k', lambda: calls.append(1) or 'v1', ttl=60) == 'v1'
+    assert cache.get_or_load('k', lambda: calls.append(1) or 'v2', ttl=60) == 'v1'
+    assert len(calls) == 1
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+
+def test_expired_entry_is_reloaded_after_stale_window():
+    backend = MemoryBackend()
+    cache = ResultCache(backend, stale_seconds=0)
+    backend.set('k', CacheEntry('old', time.time() - 120))
+    assert cache.get_or_load('k', lambda: 'new', ttl=60) == 'new'
+    assert backend.get('k').value == 'new'
+
+
+def test_stale_entry_is_served_while_refreshing_in_background():
+    backend = MemoryBackend()
+    cache = ResultCache(backend, stale_seconds=3600)
+    backend.set('k', CacheEntry('old', time.time() - 120))
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.set()
+        return 'new'
+
+    assert cache.get_or_load('k', loader, ttl=60) == 'old'
+    assert cache.stats['stale'] == 1
+    assert refreshed.wait(2)
+    for _ in range(100):
+        if backend.get('k').value == 'new':
+            break
+        time.sleep(0.01)
+    assert backend.get('k').value == 'new'
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ResultCache(MemoryBackend())
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return 'v'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader, ttl=60)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert results == ['v'] * 8
+    assert len(calls) == 1
+    assert cache.stats['coalesced'] == 7
+
+
+def test_error_results_are_not_stored():
+    backend = MemoryBackend()
+    cache = ResultCache(backend)
+    assert cache.get_or_load('k', lambda: [{'error': 'boom'}], ttl=60) == [{'error': 'boom'}]
+    assert backend.get('k') is None
+
+
+def test_serve_stale_returns_value_without_storing_it():
+    backend = MemoryBackend()
+    cache = ResultCache(backend)
+
+    def loader():
+        raise ServeStale('last-known')
+
+    assert cache.get_or_load('k', loader, ttl=60) == 'last-known'
+    assert backend.get('k') is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', CacheEntry(1, 0))
+    backend.set('b', CacheEntry(2, 0))
+    backend.get('a')
+    backend.set('c', CacheEntry(3, 0))
+    assert backend.get('b') is None
+    assert backend.get('a').value == 1 and backend.get('c').value == 3
+
+
+def test_concurrent_stale_readers_start_one_refresh():
+    backend = MemoryBackend()
+    cache = ResultCache(backend, stale_seconds=3600)
+    backend.set('k', CacheEntry('old', time.time() - 120))
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return 'new'
+
+    barrier = threading.Barrier(16)
+
+    def read():
+        barrier.wait()
+        assert cache.get_or_load('k', loader, ttl=60) == 'old'
+
+    readers = [threading.Thread(target=read) for _ in range(16)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    release.set()
+    assert len(calls) == 1
+    assert cache.stats['stale'] == 16
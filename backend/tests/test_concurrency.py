@@ -0,0 +1,33 @@
+from services.base_provider import BaseCloudProvider
+from services.concurrency import fan_out
+
+
+class BillingProvider(BaseCloudProvider):
+    name = 'billing'
+    error = None
+
+    def _validate_config(self):
+        pass
+
+    def get_mtd_costs(self):
+        if self.error:
+            return [{'error': self.error}]
+        return [{'service': 'Compute', 'cost': 2.5}, {'service': 'Storage', 'cost': 1.0}]
+
+    def get_daily_costs(self, days: int = 30):
+        return []
+
+    def get_live_metrics(self):
+        return {}
+
+    def get_timeseries(self, metric_type: str, minutes: int):
+        return {}
+
+
+def test_fan_out_reports_each_call_status():
+    ok, failing = BillingProvider({'account': 'ok'}), BillingProvider({'account': 'failing'})
+    failing.error = "billing export unavailable"
+    results = fan_out({'ok': ok.get_mtd_total, 'failing': failing.get_mtd_total}, timeout=5)
+    assert results['ok'] == {'status': 'ok', 'value': 3.5}
+    assert results['failing']['status'] == 'error'
+    assert 'billing export unavailable' in results['failing']['error']
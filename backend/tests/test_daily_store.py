@@ -0,0 +1,35 @@
+from datetime import date, datetime, timedelta, timezone
+
+from services.daily_store import DailyCostStore
+
+
+class Provider:
+    name = 'gcp'
+    fingerprint = 'test'
+
+
+def test_settled_days_are_fetched_once_including_empty_days(tmp_path):
+    store = DailyCostStore(str(tmp_path / 'daily.sqlite3'), settlement_days=3)
+    today = datetime.now(timezone.utc).date()
+    calls = []
+
+    def fetch_range(start: date, end: date):
+        calls.append((start, end))
+        # A sparse account: only every other day has a cost row
+        day, rows = start, []
+        while day < end:
+            if day.toordinal() % 2 == 0:
+                rows.append({'date': day.isoformat(), 'cost': 1.0})
+            day += timedelta(days=1)
+        return rows
+
+    first = store.get_daily_costs(Provider(), 30, fetch_range)
+    second = store.get_daily_costs(Provider(), 30, fetch_range)
+
+    assert calls[0][0] == today - timedelta(days=30)
+    # The second request only refetches the unsettled window
+    assert calls[1][0] == today - timedelta(days=3)
+    settled = [row for row in second if row['date'] < (today - timedelta(days=3)).isoformat()]
+    assert len(settled) == 27
+    assert {row['cost'] for row in settled} == {0.0, 1.0}
+    assert first == second
@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from services import forecasting
+from services.forecasting import CostForecaster, SeasonalModel
+
+START = date(2026, 1, 5)  # a Monday
+WEEKLY = [100.0, 105.0, 98.0, 102.0, 100.0, 40.0, 35.0]
+
+
+def train(model, days, spikes=()):
+    flagged = []
+    for d in range(days):
+        day = START + timedelta(days=d)
+        x = WEEKLY[day.weekday()] + (1.0 if d % 3 else -1.0)
+        if d in spikes:
+            x *= 3
+        before = len(model.anomalies)
+        model.commit(day, np.array([x]))
+        flagged.extend(a['date'] for a in model.anomalies[before:])
+    return flagged
+
+
+def test_weekly_pattern_raises_no_anomalies():
+    assert train(SeasonalModel(), 84) == []
+
+
+def test_spike_is_flagged_once_history_is_long_enough():
+    model = SeasonalModel()
+    assert train(model, 84, spikes=(60,)) == [(START + timedelta(days=60)).isoformat()]
+    anomaly = model.anomalies[0]
+    assert anomaly['direction'] == 'spike' and anomaly['service'] is None
+
+
+def test_model_recovers_from_a_spike_during_warm_up():
+    # Day 5 is inside the warm-up (MIN_HISTORY_DAYS), so it is neither scored nor clipped
+    flagged = train(SeasonalModel(), 84, spikes=(5, 60))
+    later = [d for d in flagged if d >= (START + timedelta(days=35)).isoformat()]
+    assert later == [(START + timedelta(days=60)).isoformat()]
+    assert len(flagged) <= 3
+
+
+def test_spike_does_not_drag_the_baseline():
+    clean, spiked = SeasonalModel(), SeasonalModel()
+    train(clean, 70)
+    train(spiked, 70, spikes=(60,))
+    assert abs(spiked.level[0] - clean.level[0]) / clean.level[0] < 0.15
+
+
+def test_expected_follows_day_of_week():
+    model = SeasonalModel()
+    train(model, 84)
+    monday, saturday = START + timedelta(days=84), START + timedelta(days=89)
+    assert model.expected(monday)[0] > 2 * model.expected(saturday)[0]
+
+
+class FakeProvider:
+    fingerprint = 'fp'
+
+    def __init__(self, today):
+        self.today = today
+
+    def get_daily_costs(self, days):
+        return [
+            {'date': (self.today - timedelta(days=d)).isoformat(), 'cost': 70.0}
+            for d in range(days, -1, -1)
+        ]
+
+    def get_cost_records(self, days):
+        return [
+            {'date': (self.today - timedelta(days=d)).isoformat(), 'service': service, 'cost': 35.0}
+            for d in range(days, -1, -1) for service in ('Compute', 'Storage')
+        ]
+
+
+class FakeAuth:
+    def get_config(self, provider):
+        return {}
+
+    def get_active_providers(self):
+        return [{'name': 'fake'}]
+
+
+def test_refresh_projects_month_end_and_commits_each_day_once(monkeypatch):
+    today = datetime.now(timezone.utc).date()
+    monkeypatch.setattr(forecasting.CloudProviderFactory, 'get', lambda provider, config: FakeProvider(today))
+    forecaster = CostForecaster(FakeAuth(), history_days=60, interval=0)
+
+    forecast = forecaster.refresh('fake')['forecast']
+    seen = int(forecaster.models[('fake', 'fp')].seen[0])
+    forecaster.refresh('fake')
+    assert int(forecaster.models[('fake', 'fp')].seen[0]) == seen
+
+    assert forecast['mtd_cost'] == 70.0 * today.day
+    month_days = (today.replace(day=28) + timedelta(days=4)).replace(day=1) - today.replace(day=1)
+    assert abs(forecast['projected_month_end'] - 70.0 * month_days.days) < 1.0
+    assert {s['service'] for s in forecast['services']} == {'Compute', 'Storage'}
+    assert forecaster.anomalies('fake') == []
+
+
+def test_recurring_spike_after_warm_up_keeps_being_flagged():
+    # Every Wednesday from week 6 on: a real recurring cost, still reported each week
+    spikes = tuple(d for d in range(35, 84) if d % 7 == 2)
+    flagged = train(SeasonalModel(), 84, spikes=spikes)
+    assert flagged == [(START + timedelta(days=d)).isoformat() for d in spikes]
+
+
+def test_days_without_data_are_skipped():
+    model = SeasonalModel()
+    train(model, 28)
+    level, seen = model.level.copy(), model.seen.copy()
+    model.commit(START + timedelta(days=28), np.array([np.nan]))
+    assert model.anomalies == []
+    assert np.array_equal(model.level, level) and np.array_equal(model.seen, seen)
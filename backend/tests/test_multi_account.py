@@ -0,0 +1,40 @@
+from services.base_provider import BaseCloudProvider
+from services.multi_account import MultiAccountProvider
+
+
+class Account(BaseCloudProvider):
+    name = 'aws'
+    cached_methods = ()
+    timed_methods = ()
+
+    def _validate_config(self):
+        pass
+
+    def get_mtd_costs(self):
+        if self.config.get('failing'):
+            return [{'error': 'AccessDenied'}]
+        return [{'service': 'EC2', 'cost': self.config['cost']}]
+
+    def get_daily_costs(self, days: int = 30):
+        return []
+
+    def get_live_metrics(self):
+        return {}
+
+    def get_timeseries(self, metric_type: str, minutes: int):
+        return {}
+
+
+def make_provider(*configs):
+    return MultiAccountProvider('aws', {}, [Account(config) for config in configs])
+
+
+def test_failed_accounts_are_left_out_of_the_cost_rows():
+    provider = make_provider({'account_id': '1', 'cost': 2.0}, {'account_id': '2', 'failing': True})
+    assert provider.get_mtd_costs() == [{'service': 'EC2', 'cost': 2.0, 'account': '1'}]
+    assert provider.get_mtd_total() == 2.0
+
+
+def test_all_accounts_failing_is_an_error_result():
+    provider = make_provider({'account_id': '1', 'failing': True}, {'account_id': '2', 'failing': True})
+    assert provider.get_mtd_costs() == [{'error': '1: AccessDenied; 2: AccessDenied'}]
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from services import resilience
+from services.base_provider import BaseCloudProvider
+from services.cache import result_cache
+from services.resilience import CircuitBreaker, CircuitOpenError, is_retryable
+
+
+def test_breaker_opens_after_threshold_and_blocks_calls():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    breaker.opened_at = time.time() - 61
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_failed_trial_reopens_and_success_closes():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=60)
+    breaker.opened_at = time.time() - 61
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    breaker.opened_at = time.time() - 61
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_retryable_errors():
+    assert is_retryable("Rate exceeded")
+    assert is_retryable("429 Too Many Requests")
+    assert not is_retryable("AccessDenied")
+
+
+class FlakyProvider(BaseCloudProvider):
+    name = 'flaky'
+    failing = False
+    calls = 0
+
+    def _validate_config(self):
+        pass
+
+    def get_mtd_costs(self):
+        return [{'service': 'x', 'cost': 1.0}]
+
+    def get_daily_costs(self, days: int = 30):
+        return []
+
+    def get_live_metrics(self):
+        return {}
+
+    def get_timeseries(self, metric_type: str, minutes: int):
+        type(self).calls += 1
+        if self.failing:
+            raise RuntimeError("upstream down")
+        return {'ts': [minutes], 'cpu_percent': [1.0]}
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setenv('PROVIDER_DEADLINE_FLAKY', '0')
+    FlakyProvider.failing = False
+    FlakyProvider.calls = 0
+    resilience._breakers.clear()
+    resilience.last_known.clear()
+    return FlakyProvider({'account': 'test'})
+
+
+def test_failure_falls_back_to_last_known_result(provider):
+    assert provider.get_timeseries('cpu', 30) == {'ts': [30], 'cpu_percent': [1.0]}
+    FlakyProvider.failing = True
+    assert provider.get_timeseries('cpu', 30) == {'ts': [30], 'cpu_percent': [1.0]}
+
+
+def test_failure_without_last_known_result_raises(provider):
+    FlakyProvider.failing = True
+    with pytest.raises(RuntimeError):
+        provider.get_timeseries('cpu', 30)
+
+
+def test_open_circuit_short_circuits_calls(provider):
+    FlakyProvider.failing = True
+    for _ in range(resilience.CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(RuntimeError):
+            provider.get_timeseries('cpu', 30)
+    calls = FlakyProvider.calls
+    with pytest.raises(CircuitOpenError):
+        provider.get_timeseries('cpu', 30)
+    assert FlakyProvider.calls == calls
+
+
+def test_live_results_do_not_fill_the_cost_cache(provider):
+    before = len(result_cache.backend)
+    for minutes in range(resilience.LAST_KNOWN_ENTRIES * 2):
+        provider.get_timeseries('cpu', minutes)
+    assert len(result_cache.backend) == before
+    assert len(resilience.last_known) == resilience.LAST_KNOWN_ENTRIES
@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+from services.cache import CacheEntry, ResultCache
+from services.shared_cache import RELEASE_SCRIPT, RedisBackend, SQLiteBackend, pack, unpack
+
+
+def test_pack_round_trips_provider_values():
+    value = [{
+        'date': date(2026, 1, 1),
+        'updated_at': datetime(2026, 1, 1, 12, 30, tzinfo=timezone.utc),
+        'pair': ('a', 1),
+        'by_id': {1: 'one', ('x', 2): 'tuple'},
+        'cost': 1.25,
+        'flag': True,
+        'missing': None,
+        'text': 'x' * 4000,
+    }]
+    assert unpack(pack(value)) == value
+    assert len(pack(value)) < 4000
+
+
+def test_pack_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        pack({'value': object()})
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / 'cache.sqlite3'))
+
+
+def test_sqlite_backend_shares_entries_between_instances(sqlite_backend):
+    other = SQLiteBackend(sqlite_backend.path)
+    sqlite_backend.set(('k', 1), CacheEntry([{'date': date(2026, 1, 2)}], 123.0))
+    entry = other.get(('k', 1))
+    assert entry.stored_at == 123.0
+    assert entry.value == [{'date': date(2026, 1, 2)}]
+
+
+def test_sqlite_lock_has_one_owner_until_released_or_expired(sqlite_backend):
+    assert sqlite_backend.acquire('k', 'a', 60)
+    assert not sqlite_backend.acquire('k', 'b', 60)
+    sqlite_backend.release('k', 'b')  # not the owner: no effect
+    assert not sqlite_backend.acquire('k', 'b', 60)
+    sqlite_backend.release('k', 'a')
+    assert sqlite_backend.acquire('k', 'b', 0.05)
+    time.sleep(0.1)
+    assert sqlite_backend.acquire('k', 'c', 60)
+
+
+def _load_in_process(path, calls_path, results):
+    cache = ResultCache(SQLiteBackend(path))
+
+    def loader():
+        with open(calls_path, 'a') as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.5)
+        return {'value': 42}
+
+    results.put(cache.get_or_load(('shared', 'key'), loader, ttl=60))
+
+
+def test_one_process_loads_while_the_others_wait(tmp_path):
+    path, calls_path = str(tmp_path / 'cache.sqlite3'), str(tmp_path / 'calls')
+    SQLiteBackend(path)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_load_in_process, args=(path, calls_path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [results.get(timeout=5) for _ in workers] == [{'value': 42}] * 4
+    with open(calls_path) as f:
+        assert len(f.read().split()) == 1
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py calls RedisBackend makes"""
+
+    def __init__(self):
+        self.data = {}
+        self.scripts = []
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None, px=None, nx=False):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+    def scan_iter(self, match):
+        return [name for name in list(self.data) if name.startswith(match.rstrip('*'))]
+
+    def eval(self, script, numkeys, key, owner):
+        self.scripts.append(script)
+        if self.data.get(key) == owner.encode():
+            del self.data[key]
+            return 1
+        return 0
+
+
+def test_redis_release_is_a_single_compare_and_delete():
+    client = FakeRedis()
+    backend = RedisBackend(client)
+    assert backend.acquire('k', 'a', 60)
+    assert not backend.acquire('k', 'b', 60)
+    backend.release('k', 'b')
+    assert not backend.acquire('k', 'b', 60)
+    backend.release('k', 'a')
+    assert backend.acquire('k', 'b', 60)
+    assert client.scripts == [RELEASE_SCRIPT, RELEASE_SCRIPT]
+
+
+def test_redis_backend_round_trips_entries():
+    backend = RedisBackend(FakeRedis())
+    backend.set('k', CacheEntry({'day': date(2026, 1, 3)}, 5.0))
+    assert backend.get('k') == CacheEntry({'day': date(2026, 1, 3)}, 5.0)
+    assert len(backend) == 1
+    backend.clear()
+    assert backend.get('k') is None
@@ -1,12 +1,12 @@
 import React from 'react';
-import { useMTDCosts, useLiveMetrics } from '../hooks/useCloudData';
+import { useMTDCosts, useLiveMetricsStream } from '../hooks/useCloudData';
 import MetricsCard from './MetricsCard';
 import CostsTable from './CostsTable';
 
 export default function ProviderTab({ provider }) {
   // Fetch data for THIS provider
   const { data: mtdCosts, loading: costsLoading } = useMTDCosts(provider);
-  const { data: liveMetrics, loading: metricsLoading } = useLiveMetrics(provider, 30000);
+  const { data: liveMetrics, loading: metricsLoading } = useLiveMetricsStream(provider);
 
   return (
     <div className="provider-tab">
@@ -88,4 +88,56 @@ export function useLiveMetrics(provider, refreshInterval = 30000) {
   }, [provider, refreshInterval]);
 
   return { data, loading, error };
-}
\ No newline at end of file
+}
+
+// Hook #4: Live metrics pushed from the server (no polling)
+// Usage: const { data, loading, error } = useLiveMetricsStream('gcp');
+// Falls back to useLiveMetrics-style polling if the browser has no EventSource
+export function useLiveMetricsStream(provider, fallbackInterval = 30000) {
+  const [data, setData] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState(null);
+
+  useEffect(() => {
+    if (!provider) return;
+
+    if (typeof EventSource === 'undefined') {
+      const fetchData = async () => {
+        try {
+          setData(await api.getLiveMetrics(provider));
+          setError(null);
+        } catch (err) {
+          setError(err.message);
+        } finally {
+          setLoading(false);
+        }
+      };
+      fetchData();
+      const interval = setInterval(fetchData, fallbackInterval);
+      return () => clearInterval(interval);
+    }
+
+    const source = api.streamLiveMetrics(provider);
+
+    // Full state on connect
+    source.addEventListener('snapshot', (event) => {
+      setData(JSON.parse(event.data));
+      setError(null);
+      setLoading(false);
+    });
+
+    // Only the fields that changed since the last event
+    source.addEventListener('delta', (event) => {
+      const changes = JSON.parse(event.data);
+      setData((prev) => ({ ...prev, ...changes }));
+      setError(null);
+    });
+
+    // EventSource reconnects on its own; just surface the state
+    source.onerror = () => setError('Live metrics stream disconnected');
+
+    return () => source.close();
+  }, [provider, fallbackInterval]);
+
+  return { data, loading, error };
+}
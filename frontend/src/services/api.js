@@ -37,6 +37,12 @@ class CloudAPI {
     const response = await fetch(`${API_BASE_URL}/${provider}/metrics/live`);
     return response.json();
   }
+
+  // Open a Server-Sent Events stream of live metric changes
+  // The server sends one "snapshot" event, then "delta" events with only changed fields
+  streamLiveMetrics(provider) {
+    return new EventSource(`${API_BASE_URL}/${provider}/metrics/stream`);
+  }
 }
 
 // Export a single instance (singleton pattern)